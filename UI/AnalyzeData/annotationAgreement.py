@@ -0,0 +1,296 @@
+import json
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from data_preprocessing.exportStream import csv_delimiter
+
+
+def _annotator_name(completed_by: Any) -> str:
+    """Label Studio JSON stores a user dict, the CSV export just the email."""
+    if isinstance(completed_by, dict):
+        return str(completed_by.get("email") or completed_by.get("id", ""))
+    return str(completed_by)
+
+
+def _first(values: Any) -> str:
+    if isinstance(values, list):
+        return str(values[0]) if values else ""
+    return "" if values is None else str(values)
+
+
+def _sorted_regions(regions: List[Tuple[float, float, str]]):
+    """Return (starts, ends, labels) sorted by start time."""
+    regions.sort(key=lambda r: (r[0], r[1]))
+    starts = np.array([r[0] for r in regions], dtype=float)
+    ends = np.array([r[1] for r in regions], dtype=float)
+    labels = [r[2] for r in regions]
+    return starts, ends, labels
+
+
+def group_annotations_by_task(
+    tasks: List[Dict[str, Any]],
+    region_name: str = "SentenceLabel",
+    label_name: str = "SentenceSelect",
+) -> Dict[Any, List[Tuple[str, np.ndarray, np.ndarray, List[str]]]]:
+    """
+    Group every annotation of every task in a single pass over a JSON export.
+
+    Regions come from *region_name* results; each region's label is taken from
+    the *label_name* result sharing its result id (or from the region's own
+    ``labels`` when both names are the same, e.g. ``WordAnnotation``).
+    Returns {task_id: [(annotator, starts, ends, labels), ...]}.
+    """
+    grouped: Dict[Any, List[Tuple[str, np.ndarray, np.ndarray, List[str]]]] = defaultdict(list)
+
+    for task in tasks:
+        for annot in task.get("annotations", []):
+            if annot.get("was_cancelled"):
+                continue
+
+            regions: Dict[str, List[Any]] = {}
+            labels: Dict[str, str] = {}
+            for r in annot.get("result", []):
+                value = r.get("value", {})
+                if r.get("from_name") == region_name and "start" in value and "end" in value:
+                    regions[r.get("id")] = [value["start"], value["end"], ""]
+                    if region_name == label_name:
+                        labels[r.get("id")] = _first(value.get("labels"))
+                elif r.get("from_name") == label_name:
+                    labels[r.get("id")] = _first(
+                        value.get("choices") or value.get("labels") or value.get("text")
+                    )
+
+            for rid, region in regions.items():
+                region[2] = labels.get(rid, "")
+
+            grouped[task.get("id")].append(
+                (_annotator_name(annot.get("completed_by", "")),)
+                + _sorted_regions([tuple(r) for r in regions.values()])
+            )
+
+    return grouped
+
+
+def group_csv_annotations_by_task(
+    df: pd.DataFrame,
+    region_column: str = "SentenceLabel",
+    label_column: str = "SentenceSelect",
+) -> Dict[Any, List[Tuple[str, np.ndarray, np.ndarray, List[str]]]]:
+    """
+    Same as group_annotations_by_task for the CSV export, where each row is one
+    annotation and region/label columns hold JSON lists aligned by position.
+    """
+    grouped: Dict[Any, List[Tuple[str, np.ndarray, np.ndarray, List[str]]]] = defaultdict(list)
+
+    for task_id, annotator, region_json, label_json in zip(
+        df["id"], df["annotator"], df[region_column], df[label_column]
+    ):
+        if pd.isna(region_json):
+            continue
+        region_list = json.loads(region_json)
+        if region_column == label_column:
+            label_list = [_first(r.get("labels")) for r in region_list]
+        else:
+            if pd.isna(label_json):
+                label_list = []
+            else:
+                try:
+                    label_list = json.loads(label_json)
+                except ValueError:
+                    label_list = label_json  # a single choice is exported as the bare value
+            if isinstance(label_list, str):
+                label_list = [label_list]
+
+        regions = [
+            (r["start"], r["end"], str(label_list[i]) if i < len(label_list) else "")
+            for i, r in enumerate(region_list)
+            if "start" in r and "end" in r
+        ]
+        grouped[task_id].append((_annotator_name(annotator),) + _sorted_regions(regions))
+
+    return grouped
+
+
+def match_segments(
+    starts_a: np.ndarray,
+    ends_a: np.ndarray,
+    starts_b: np.ndarray,
+    ends_b: np.ndarray,
+    tolerance: float = 0.5,
+) -> List[Tuple[int, int]]:
+    """
+    Sweep two start-sorted region lists and pair regions whose start and end
+    both lie within *tolerance* seconds. Each region is used at most once.
+    """
+    pairs = []
+    i = j = 0
+    while i < len(starts_a) and j < len(starts_b):
+        if abs(starts_a[i] - starts_b[j]) <= tolerance and abs(ends_a[i] - ends_b[j]) <= tolerance:
+            pairs.append((i, j))
+            i += 1
+            j += 1
+        elif starts_a[i] < starts_b[j]:
+            i += 1
+        else:
+            j += 1
+    return pairs
+
+
+def cohen_kappa(labels_a: np.ndarray, labels_b: np.ndarray) -> float:
+    """Cohen's kappa for two aligned arrays of integer category codes."""
+    if len(labels_a) == 0:
+        return float("nan")
+    k = int(max(labels_a.max(), labels_b.max())) + 1
+    confusion = np.bincount(labels_a * k + labels_b, minlength=k * k).reshape(k, k).astype(float)
+    total = confusion.sum()
+    observed = np.trace(confusion) / total
+    expected = (confusion.sum(axis=0) @ confusion.sum(axis=1)) / (total * total)
+    if expected == 1.0:
+        return 1.0 if observed == 1.0 else float("nan")
+    return float((observed - expected) / (1.0 - expected))
+
+
+def fleiss_kappa(counts: np.ndarray) -> float:
+    """Fleiss' kappa for an (items × categories) matrix with a constant number of raters per item."""
+    if counts.shape[0] == 0:
+        return float("nan")
+    counts = counts.astype(float)
+    n = counts[0].sum()
+    if n < 2:
+        return float("nan")
+    p_items = ((counts * counts).sum(axis=1) - n) / (n * (n - 1))
+    p_categories = counts.sum(axis=0) / counts.sum()
+    observed = p_items.mean()
+    expected = (p_categories * p_categories).sum()
+    if expected == 1.0:
+        return 1.0 if observed == 1.0 else float("nan")
+    return float((observed - expected) / (1.0 - expected))
+
+
+def compute_agreement(
+    grouped: Dict[Any, List[Tuple[str, np.ndarray, np.ndarray, List[str]]]],
+    tolerance: float = 0.5,
+) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """
+    Compute boundary agreement, label agreement and kappas over every task that
+    has at least two annotations.
+
+    Returns a per-(task, annotator pair) DataFrame and a summary dict.
+    """
+    pair_rows = []
+    matched_a: List[str] = []
+    matched_b: List[str] = []
+    matched_pair: List[Tuple[str, str]] = []
+    fleiss_items: Dict[int, List[List[str]]] = defaultdict(list)
+
+    for task_id, annotations in grouped.items():
+        if len(annotations) < 2:
+            continue
+
+        # ── pairwise boundary/label agreement ───────────────────────────
+        anchor_matches = []
+        for x in range(len(annotations)):
+            for y in range(x + 1, len(annotations)):
+                ann_x, starts_x, ends_x, labels_x = annotations[x]
+                ann_y, starts_y, ends_y, labels_y = annotations[y]
+                pairs = match_segments(starts_x, ends_x, starts_y, ends_y, tolerance)
+                if x == 0:
+                    anchor_matches.append(dict(pairs))
+
+                same = [labels_x[i] == labels_y[j] for i, j in pairs]
+                total = len(starts_x) + len(starts_y)
+                pair_rows.append({
+                    "task_id": task_id,
+                    "annotator_a": ann_x,
+                    "annotator_b": ann_y,
+                    "n_segments_a": len(starts_x),
+                    "n_segments_b": len(starts_y),
+                    "matched": len(pairs),
+                    "boundary_f1": 2 * len(pairs) / total if total else 1.0,
+                    "label_agreement": float(np.mean(same)) if same else float("nan"),
+                })
+                # order each pair by annotator so a|b kappas pool the same rater on each side
+                swap = ann_y < ann_x
+                for i, j in pairs:
+                    label_x, label_y = labels_x[i], labels_y[j]
+                    matched_a.append(label_y if swap else label_x)
+                    matched_b.append(label_x if swap else label_y)
+                    matched_pair.append((ann_y, ann_x) if swap else (ann_x, ann_y))
+
+        # ── items labelled by every annotator, anchored on the first ────
+        anchor_labels = annotations[0][3]
+        for i in range(len(anchor_labels)):
+            if all(i in m for m in anchor_matches):
+                fleiss_items[len(annotations)].append(
+                    [anchor_labels[i]]
+                    + [annotations[k + 1][3][m[i]] for k, m in enumerate(anchor_matches)]
+                )
+
+    per_task = pd.DataFrame(pair_rows, columns=[
+        "task_id", "annotator_a", "annotator_b", "n_segments_a", "n_segments_b",
+        "matched", "boundary_f1", "label_agreement",
+    ])
+
+    codes, categories = pd.factorize(pd.Series(matched_a + matched_b, dtype=object))
+    codes_a, codes_b = codes[:len(matched_a)], codes[len(matched_a):]
+
+    pair_kappa = {}
+    if matched_pair:
+        pair_keys = pd.Series([f"{a} | {b}" for a, b in matched_pair])
+        for key, idx in pair_keys.groupby(pair_keys).indices.items():
+            pair_kappa[key] = cohen_kappa(codes_a[idx], codes_b[idx])
+
+    fleiss = {}
+    for n_raters, items in fleiss_items.items():
+        item_codes = pd.Categorical(np.ravel(items), categories=categories).codes.reshape(len(items), n_raters)
+        counts = np.zeros((len(items), len(categories)), dtype=int)
+        np.add.at(counts, (np.repeat(np.arange(len(items)), n_raters), item_codes.ravel()), 1)
+        fleiss[n_raters] = {"items": len(items), "kappa": fleiss_kappa(counts)}
+
+    total_segments = (per_task["n_segments_a"] + per_task["n_segments_b"]).sum()
+    summary = {
+        "tasks_compared": int(per_task["task_id"].nunique()),
+        "annotator_pairs": len(per_task),
+        "boundary_f1": float(2 * per_task["matched"].sum() / total_segments) if total_segments else float("nan"),
+        "label_agreement": float(np.mean(codes_a == codes_b)) if len(codes_a) else float("nan"),
+        "cohen_kappa": cohen_kappa(codes_a, codes_b),
+        "cohen_kappa_by_pair": pair_kappa,
+        "fleiss_kappa": fleiss,
+    }
+    return per_task, summary
+
+
+def read_csv_export(input_file: str) -> pd.DataFrame:
+    """Read a Label Studio CSV export; re-saved exports may be tab-separated despite the .csv name."""
+    return pd.read_csv(input_file, sep=csv_delimiter(input_file))
+
+
+def agreement_from_export(
+    input_file: str,
+    output_file: Optional[str] = None,
+    region_name: str = "SentenceLabel",
+    label_name: str = "SentenceSelect",
+    tolerance: float = 0.5,
+) -> Dict[str, Any]:
+    """Load a JSON or CSV export, compute agreement and optionally save the per-task table."""
+    if input_file.endswith(".csv"):
+        grouped = group_csv_annotations_by_task(read_csv_export(input_file), region_name, label_name)
+    else:
+        with open(input_file, "r", encoding="utf-8") as f:
+            grouped = group_annotations_by_task(json.load(f), region_name, label_name)
+
+    per_task, summary = compute_agreement(grouped, tolerance)
+    if output_file:
+        per_task.to_csv(output_file, sep="\t", index=False)
+    return summary
+
+
+if __name__ == "__main__":
+    summary = agreement_from_export(
+        "../annotationData/sentences/export_157513_project-157513-at-2025-06-29-23-28-82ec7a90.csv",
+        "sentence_agreement.tsv",
+    )
+    print(json.dumps(summary, indent=2))
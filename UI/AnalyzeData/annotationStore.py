@@ -0,0 +1,215 @@
+import csv
+import os
+import sqlite3
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import pandas as pd
+
+from data_preprocessing.exportStream import iter_export_tasks, iter_json_array
+from data_preprocessing.flattenWordExport import WORD_COLUMNS, WORD_DTYPES, flatten_task
+from data_preprocessing.sentenceTables import iter_sentence_records
+
+SENTENCE_COLUMNS = {
+    "sentence_level_id": "TEXT", "audio": "TEXT", "start_time": "REAL", "end_time": "REAL",
+    "goldStandard": "TEXT", "actual": "TEXT", "repeated": "TEXT", "runon": "TEXT", "nonchild": "TEXT",
+    "annotator_id": "TEXT", "grade": "TEXT", "sound": "TEXT", "title": "TEXT", "topic": "TEXT",
+    "words": "TEXT", "__id__": "TEXT", "story_id": "TEXT", "content": "TEXT", "time": "TEXT",
+    "picture": "TEXT", "userId": "TEXT", "segment_time": "REAL",
+}
+WORD_SQL_COLUMNS = {
+    column: {"int64": "INTEGER", "float64": "REAL"}.get(WORD_DTYPES[column], "TEXT") for column in WORD_COLUMNS
+}
+TASK_COLUMNS = {
+    "audio": "TEXT", "task_id": "INTEGER", "userId": "TEXT", "__id__": "TEXT", "story_id": "TEXT",
+    "grade": "TEXT", "title": "TEXT", "topic": "TEXT", "sound": "TEXT", "time": "TEXT",
+    "n_annotations": "INTEGER", "annotator_id": "TEXT", "updated_at": "TEXT",
+}
+
+# table -> (columns, key column replaced on re-ingest, indexed columns)
+TABLES = {
+    "sentences": (SENTENCE_COLUMNS, "sentence_level_id",
+                  ["sentence_level_id", "userId", "__id__", "annotator_id", "audio"]),
+    "words": (WORD_SQL_COLUMNS, "task_id",
+              ["task_id", "sentence_level_id", "userId", "__id__", "annotator", "original_audio_name"]),
+    "tasks": (TASK_COLUMNS, "audio", ["audio", "task_id", "userId", "__id__", "annotator_id"]),
+}
+
+
+def task_record(task: Dict[str, Any]) -> Dict[str, Any]:
+    """Metadata row for one sentence-level task (from an export or a task import file)."""
+    data = task.get("data", {})
+    annotations = task.get("annotations", [])
+    first = annotations[0] if annotations else {}
+    completed_by = first.get("completed_by", {})
+    return {
+        "audio": os.path.basename(str(data.get("audio", ""))),
+        "task_id": task.get("id"),
+        "userId": data.get("userId (matches the uid in the recording file name)", data.get("userId", "")),
+        "__id__": data.get("__id__", ""),
+        "story_id": data.get("story_id", ""),
+        "grade": data.get("grade", ""),
+        "title": data.get("title", ""),
+        "topic": data.get("topic", ""),
+        "sound": data.get("sound", ""),
+        "time": data.get("time", ""),
+        "n_annotations": len(annotations),
+        "annotator_id": completed_by.get("id", "") if isinstance(completed_by, dict) else completed_by,
+        "updated_at": max((a.get("updated_at") or "" for a in annotations), default=""),
+    }
+
+
+def detect_kind(path: str) -> str:
+    """Guess which table a file belongs to: a word-level export/table, a sentence TSV or sentence tasks."""
+    if path.endswith(".json"):
+        for _, raw in iter_json_array(path):
+            return "words" if b'"WordAnnotation"' in raw or b'"original_audio_name"' in raw else "tasks"
+        return "tasks"
+    with open(path, "r", encoding="utf-8") as f:
+        header = f.readline().rstrip("\n").split("\t")
+    return "words" if "region_id" in header else "sentences"
+
+
+class AnnotationStore:
+    """
+    SQLite store of sentence rows, word annotations and task metadata with
+    indexes on the columns analyses filter and join on. Files are ingested
+    incrementally: a file whose size and mtime are unchanged since its last
+    ingest is skipped, and re-ingesting replaces the rows of every key
+    (sentence_level_id, task_id or audio) the file contains.
+    """
+
+    def __init__(self, path: str = "../processed_data/annotations.sqlite"):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_schema()
+
+    def _create_schema(self) -> None:
+        with self.conn:
+            for table, (columns, _, indexed) in TABLES.items():
+                column_sql = ", ".join(f'"{c}" {t}' for c, t in columns.items())
+                self.conn.execute(f'CREATE TABLE IF NOT EXISTS {table} ({column_sql})')
+                for column in indexed:
+                    self.conn.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_{column.strip("_")} ON {table} ("{column}")')
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS ingest_log (path TEXT PRIMARY KEY, kind TEXT, size INTEGER, "
+                "mtime_ns INTEGER, rows INTEGER, ingested_at REAL)"
+            )
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    # ── ingest ──────────────────────────────────────────────────────────
+    def _records(self, path: str, kind: str) -> Iterator[Dict[str, Any]]:
+        if kind == "tasks":
+            return (task_record(task) for task in iter_export_tasks(path))
+        if kind == "words" and path.endswith(".json"):
+            return (row for task in iter_export_tasks(path) for row in flatten_task(task))
+        if kind == "sentences":
+            return iter_sentence_records(path)
+        f = open(path, "r", encoding="utf-8", newline="")
+        return _closing_rows(f, csv.DictReader(f, delimiter="\t"))
+
+    def ingest(self, path: str, kind: Optional[str] = None, force: bool = False) -> int:
+        """Load one file into its table; returns the rows written (0 when skipped as unchanged)."""
+        kind = kind or detect_kind(path)
+        columns, key, _ = TABLES[kind]
+        st = os.stat(path)
+        source = os.path.abspath(path)
+        logged = self.conn.execute("SELECT size, mtime_ns, kind FROM ingest_log WHERE path = ?", (source,)).fetchone()
+        if not force and logged == (st.st_size, st.st_mtime_ns, kind):
+            return 0
+
+        names = list(columns)
+        placeholders = ", ".join("?" for _ in names)
+        column_sql = ", ".join(f'"{c}"' for c in names)
+        types = [columns[c] for c in names]
+        rows = [tuple(_sql_value(record.get(c), t) for c, t in zip(names, types)) for record in self._records(path, kind)]
+        keys = {(row[names.index(key)],) for row in rows}
+
+        with self.conn:
+            self.conn.executemany(f'DELETE FROM {kind} WHERE "{key}" = ?', keys)
+            self.conn.executemany(f"INSERT INTO {kind} ({column_sql}) VALUES ({placeholders})", rows)
+            self.conn.execute(
+                "INSERT OR REPLACE INTO ingest_log VALUES (?, ?, ?, ?, ?, ?)",
+                (source, kind, st.st_size, st.st_mtime_ns, len(rows), time.time()),
+            )
+        return len(rows)
+
+    def ingest_many(self, paths: Iterable[str], force: bool = False) -> Dict[str, int]:
+        return {path: self.ingest(path, force=force) for path in paths}
+
+    # ── queries ─────────────────────────────────────────────────────────
+    def query(self, sql: str, params: Iterable[Any] = ()) -> pd.DataFrame:
+        return pd.read_sql_query(sql, self.conn, params=list(params))
+
+    def select(self, table: str, columns: Optional[List[str]] = None, **filters: Any) -> pd.DataFrame:
+        """Rows of *table* where every column equals its filter value (lists mean IN)."""
+        if table not in TABLES:
+            raise KeyError(f"Unknown table: {table}")
+        clauses, params = [], []
+        for column, wanted in filters.items():
+            if column not in TABLES[table][0]:
+                raise KeyError(f"Unknown column {column} in {table}")
+            if isinstance(wanted, (list, tuple, set)):
+                wanted = list(wanted)
+                clauses.append(f'"{column}" IN ({", ".join("?" for _ in wanted)})')
+                params.extend(wanted)
+            else:
+                clauses.append(f'"{column}" = ?')
+                params.append(wanted)
+        column_sql = ", ".join(f'"{c}"' for c in columns) if columns else "*"
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        return self.query(f"SELECT {column_sql} FROM {table}{where}", params)
+
+    def sentences(self, **filters: Any) -> pd.DataFrame:
+        return self.select("sentences", **filters)
+
+    def words(self, **filters: Any) -> pd.DataFrame:
+        return self.select("words", **filters)
+
+    def tasks(self, **filters: Any) -> pd.DataFrame:
+        return self.select("tasks", **filters)
+
+    def missing(self, values: Iterable[Any], table: str = "sentences", column: str = "sentence_level_id") -> List[Any]:
+        """Values that do not occur in table.column, in input order (one indexed lookup each)."""
+        values = list(values)
+        if column not in TABLES[table][0]:
+            raise KeyError(f"Unknown column {column} in {table}")
+        sql = f'SELECT 1 FROM {table} WHERE "{column}" = ? LIMIT 1'
+        return [v for v in values if self.conn.execute(sql, (_sql_value(v),)).fetchone() is None]
+
+    def count_by(self, table: str, *columns: str) -> pd.DataFrame:
+        column_sql = ", ".join(f'"{c}"' for c in columns)
+        return self.query(f"SELECT {column_sql}, COUNT(*) AS n FROM {table} GROUP BY {column_sql} ORDER BY n DESC")
+
+
+def _closing_rows(f, reader) -> Iterator[Dict[str, Any]]:
+    with f:
+        yield from reader
+
+
+def _sql_value(value: Any, column_type: str = "TEXT") -> Any:
+    if value is None or (value == "" and column_type != "TEXT"):
+        return None
+    if isinstance(value, (int, float, str)):
+        return value
+    return str(value)
+
+
+if __name__ == "__main__":
+    with AnnotationStore("../processed_data/annotations.sqlite") as store:
+        print(store.ingest_many([
+            "../processed_data/sentenceLabels.tsv",
+            "../processed_data/label_studio_audio_tasks.json",
+            "../annotationData/words/8_4_annotation_data.json",
+        ]))
+        print(store.count_by("sentences", "grade"))
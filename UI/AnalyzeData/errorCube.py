@@ -0,0 +1,136 @@
+import os
+from typing import Any, Iterator, List, Optional, Set, Tuple, Union
+
+import pandas as pd
+
+from data_preprocessing.exportStream import iter_export_tasks
+from data_preprocessing.flattenWordExport import (ERROR_TYPE_FIELDS, MULTI_SEP, WORD_COLUMNS, flatten_task,
+                                                  load_word_annotations)
+
+CUBE_DIMS = ["userId", "__id__", "grade", "field", "value"]
+TAXONOMY_FIELDS = ["error_category"] + ERROR_TYPE_FIELDS + ["MixedErrorTaxonomy"]
+
+
+def word_contributions(words: pd.DataFrame) -> pd.DataFrame:
+    """
+    Turn flattened word annotations into per-task counts of every
+    (field, value) of the error taxonomy; multi-valued cells count each value.
+    """
+    parts = []
+    for field in TAXONOMY_FIELDS:
+        values = words[field].astype("string").fillna("")
+        present = values != ""
+        if not present.any():
+            continue
+        exploded = values[present].str.split(MULTI_SEP).explode()
+        part = words.loc[exploded.index, ["task_id", "userId", "__id__", "grade"]].astype(str)
+        part["field"] = field
+        part["value"] = exploded.to_numpy()
+        parts.append(part)
+
+    if not parts:
+        return pd.DataFrame(columns=["task_id"] + CUBE_DIMS + ["count"])
+    stacked = pd.concat(parts, ignore_index=True)
+    return stacked.groupby(["task_id"] + CUBE_DIMS, observed=True).size().rename("count").reset_index()
+
+
+def iter_word_chunks(path: str, chunksize: int = 100_000) -> Iterator[Tuple[pd.DataFrame, Set[str]]]:
+    """
+    Word rows in chunks, each with the ids of the tasks it covers, from a
+    flattened word table or straight from a word-level JSON export. Only an
+    export also names tasks that have no word regions left.
+    """
+    if not path.endswith(".json"):
+        for chunk in load_word_annotations(path, chunksize=chunksize):
+            yield chunk, set(chunk["task_id"].astype(str))
+        return
+    rows, task_ids = [], set()
+    for task in iter_export_tasks(path):
+        task_ids.add(str(task.get("id")))
+        rows.extend(flatten_task(task))
+        if len(rows) >= chunksize:
+            yield pd.DataFrame(rows, columns=WORD_COLUMNS), task_ids
+            rows, task_ids = [], set()
+    if rows or task_ids:
+        yield pd.DataFrame(rows, columns=WORD_COLUMNS), task_ids
+
+
+class ErrorCube:
+    """
+    Precomputed reading-error counts per (child, story, grade, taxonomy field, value).
+
+    A per-task ledger of counts is kept so that re-ingesting a newer export
+    replaces the contributions of the tasks it contains; the cube itself is the
+    ledger summed over tasks, with categorical dimensions.
+    """
+
+    def __init__(self, ledger: Optional[pd.DataFrame] = None):
+        self.ledger = ledger if ledger is not None else pd.DataFrame(columns=["task_id"] + CUBE_DIMS + ["count"])
+        self._rebuild()
+
+    def _rebuild(self) -> None:
+        cube = self.ledger.groupby(CUBE_DIMS, observed=True)["count"].sum().reset_index()
+        for dim in CUBE_DIMS:
+            cube[dim] = cube[dim].astype("category")
+        cube["count"] = cube["count"].astype("int64")
+        self.cube = cube
+
+    def update(self, word_table_path: str, chunksize: int = 100_000) -> int:
+        """
+        Ingest a flattened word table (see flattenWordExport) or a word-level
+        export, replacing every task it contains, including tasks that no
+        longer contribute any counts. Returns the number of tasks seen.
+        """
+        seen: Set[str] = set()
+        contributions = []
+        for chunk, task_ids in iter_word_chunks(word_table_path, chunksize):
+            seen |= task_ids
+            contributions.append(word_contributions(chunk))
+        new = pd.concat(contributions, ignore_index=True) if contributions else self.ledger.iloc[:0].copy()
+        new["task_id"] = new["task_id"].astype(str)
+
+        kept = self.ledger[~self.ledger["task_id"].isin(seen)]
+        self.ledger = pd.concat([kept, new], ignore_index=True)
+        self._rebuild()
+        return len(seen)
+
+    def _mask(self, filters) -> pd.Series:
+        mask = pd.Series(True, index=self.cube.index)
+        for dim, wanted in filters.items():
+            if dim not in CUBE_DIMS:
+                raise KeyError(f"Unknown cube dimension: {dim}")
+            wanted = [wanted] if isinstance(wanted, str) or not hasattr(wanted, "__iter__") else list(wanted)
+            mask &= self.cube[dim].isin(wanted)
+        return mask
+
+    def query(self, **filters: Union[Any, List[Any]]) -> pd.DataFrame:
+        """Cube cells matching every filter, e.g. query(grade="2nd Grade", field="error_category")."""
+        return self.cube[self._mask(filters)]
+
+    def rollup(self, by: Union[str, List[str]], **filters: Union[Any, List[Any]]) -> pd.Series:
+        """
+        Counts summed over all dimensions not in *by*, e.g. rollup(["grade", "value"], field="error_category").
+        Each word is counted once per taxonomy field, so unless the filter
+        selects a single field, "field" is added to *by* rather than summed over.
+        """
+        by = [by] if isinstance(by, str) else list(by)
+        field = filters.get("field")
+        single_field = field is not None and (isinstance(field, str) or not hasattr(field, "__iter__")
+                                              or len(list(field)) == 1)
+        if "field" not in by and not single_field:
+            by = ["field"] + by
+        return self.query(**filters).groupby(by, observed=True)["count"].sum().sort_values(ascending=False)
+
+    def save(self, path: str) -> None:
+        self.ledger.to_pickle(path)
+
+    @classmethod
+    def load(cls, path: str) -> "ErrorCube":
+        return cls(pd.read_pickle(path) if os.path.exists(path) else None)
+
+
+if __name__ == "__main__":
+    cube = ErrorCube.load("../processed_data/error_cube.pkl")
+    cube.update("../processed_data/word_annotations.tsv")
+    cube.save("../processed_data/error_cube.pkl")
+    print(cube.rollup(["grade", "value"], field="error_category").head(20))
@@ -0,0 +1,227 @@
+import difflib
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from data_preprocessing.IPADict import IpaDictionary
+from data_preprocessing.sentenceTables import load_sentence_labels
+
+VOWELS = set("aeiouyæɑɒɐəɘɚɛɜɝɞɤɨɪʉʊʌʏøœɶɵɯ")
+# marks that belong to the preceding symbol rather than starting a new phoneme
+ATTACHING = {"͡", "͜", "ʰ", "ʷ", "ʲ", "ˠ", "ˤ", "ⁿ", "ˡ", "ʼ", "˞"}
+# stress, length, syllable, linking, intonation and tone marks: not phonemes
+SUPRASEGMENTALS = set("ˈˌːˑ.‿|‖˥˦˧˨˩")
+SAME_CLASS_COST = 0.5
+CROSS_CLASS_COST = 1.0
+INDEL_COST = 1.0
+
+WORD_SCORE_DTYPES = {
+    "sentence_level_id": "string",
+    "row": "int64",
+    "position": "int32",
+    "op": "category",
+    "gold_word": "string",
+    "actual_word": "string",
+    "gold_ipa": "string",
+    "actual_ipa": "string",
+    "gold_known": "bool",
+    "actual_known": "bool",
+    "distance": "float32",
+    "normalized": "float32",
+}
+
+
+def ipa_segments(ipa: str) -> Tuple[str, ...]:
+    """
+    Split a cleaned IPA string into phonemes, keeping ties and diacritics on
+    their base symbol; suprasegmentals the cleaning left in (e.g. ˌ) are dropped.
+    """
+    segments: List[str] = []
+    tie = False
+    for ch in ipa:
+        if ch in SUPRASEGMENTALS or ch.isspace():
+            continue
+        if segments and (tie or ch in ATTACHING or unicodedata.combining(ch)):
+            segments[-1] += ch
+            tie = ch in ("͡", "͜")
+        else:
+            segments.append(ch)
+            tie = False
+    return tuple(segments)
+
+
+def words_of(sentence: str) -> List[str]:
+    """Lowercased words in reading order, tokenized like IpaDictionary.get_vocab."""
+    return [t.lower() for t in re.findall(r"[A-Za-z']+", str(sentence)) if re.search(r"[A-Za-z]", t)]
+
+
+class PhonemeLexicon:
+    """
+    Cached word → pronunciations lookup over IpaDictionary.table, every
+    pronunciation already split into phonemes and encoded as integer ids.
+    Words missing from the dictionary fall back to their letters.
+    """
+
+    def __init__(self, ipa_dict: IpaDictionary):
+        self.table = ipa_dict.table
+        self.ids: Dict[str, int] = {}
+        self.pronunciations = lru_cache(maxsize=None)(self._pronunciations)
+
+    def encode(self, segments: Tuple[str, ...]) -> Tuple[int, ...]:
+        return tuple(self.ids.setdefault(s, len(self.ids)) for s in segments)
+
+    def _pronunciations(self, word: str) -> Tuple[bool, Tuple[Tuple[str, Tuple[int, ...]], ...]]:
+        ipas = self.table.get(word)
+        if ipas:
+            return True, tuple((ipa, self.encode(ipa_segments(ipa))) for ipa in ipas)
+        letters = word.replace("'", "")
+        return False, ((letters, self.encode(tuple(letters))),)
+
+    def cost_matrix(self) -> np.ndarray:
+        """Substitution costs between all phoneme ids: 0 same, 0.5 within vowel/consonant class, else 1."""
+        symbols = sorted(self.ids, key=self.ids.get)
+        is_vowel = np.array([s[0] in VOWELS for s in symbols])
+        costs = np.where(is_vowel[:, None] == is_vowel[None, :], SAME_CLASS_COST, CROSS_CLASS_COST)
+        np.fill_diagonal(costs, 0.0)
+        return costs.astype(np.float32)
+
+
+def batch_edit_distance(a: np.ndarray, a_len: np.ndarray, b: np.ndarray, b_len: np.ndarray,
+                        costs: np.ndarray, indel: float = INDEL_COST) -> np.ndarray:
+    """
+    Weighted Levenshtein distance for a batch of padded id sequences a (N, La)
+    and b (N, Lb). The DP runs one row of the table at a time for the whole
+    batch: deletions and substitutions are elementwise, and insertions along
+    the row are resolved with a running minimum.
+    """
+    n, max_a = a.shape
+    max_b = b.shape[1]
+    steps = np.arange(max_b + 1, dtype=np.float32) * indel
+    rows = np.arange(n)
+    prev = np.broadcast_to(steps, (n, max_b + 1)).copy()
+    result = np.where(a_len == 0, b_len * indel, 0.0).astype(np.float32)
+
+    for i in range(1, max_a + 1):
+        sub = costs[a[:, i - 1][:, None], b]
+        current = np.empty_like(prev)
+        current[:, 0] = prev[:, 0] + indel
+        current[:, 1:] = np.minimum(prev[:, 1:] + indel, prev[:, :-1] + sub)
+        current = np.minimum.accumulate(current - steps, axis=1) + steps
+        done = a_len == i
+        result[done] = current[rows[done], b_len[done]]
+        prev = current
+    return result
+
+
+def _pad(sequences: List[Tuple[int, ...]]) -> Tuple[np.ndarray, np.ndarray]:
+    lengths = np.array([len(s) for s in sequences], dtype=np.int64)
+    padded = np.zeros((len(sequences), max(lengths.max(initial=0), 1)), dtype=np.int64)
+    for k, s in enumerate(sequences):
+        padded[k, :len(s)] = s
+    return padded, lengths
+
+
+def align_words(gold: List[str], actual: List[str]) -> List[Tuple[str, int, Optional[str], Optional[str]]]:
+    """Word-level alignment (op, position in gold, gold word, actual word) of differing words."""
+    pairs = []
+    for op, i1, i2, j1, j2 in difflib.SequenceMatcher(a=gold, b=actual, autojunk=False).get_opcodes():
+        if op == "equal":
+            continue
+        if op == "replace":
+            for k in range(max(i2 - i1, j2 - j1)):
+                g = gold[i1 + k] if i1 + k < i2 else None
+                a = actual[j1 + k] if j1 + k < j2 else None
+                pairs.append(("replace" if g and a else "delete" if g else "insert", min(i1 + k, i2), g, a))
+        elif op == "delete":
+            pairs.extend(("delete", i, gold[i], None) for i in range(i1, i2))
+        else:
+            pairs.extend(("insert", i1, None, actual[j]) for j in range(j1, j2))
+    return pairs
+
+
+def score_sentence_table(df: pd.DataFrame, ipa_dict: IpaDictionary, batch_size: int = 4096) -> pd.DataFrame:
+    """
+    Score every differing word of every sentence whose transcription
+    ("actual") differs from its target. Substituted words get the weighted
+    phoneme edit distance of their closest pronunciations; omitted or
+    inserted words cost their full phoneme count.
+    """
+    lexicon = PhonemeLexicon(ipa_dict)
+    records = []
+    for row, sentence_level_id, gold, actual in zip(df.index, df["sentence_level_id"], df["goldStandard"], df["actual"]):
+        if not isinstance(actual, str) or not actual.strip() or not isinstance(gold, str):
+            continue
+        for op, position, g, a in align_words(words_of(gold), words_of(actual)):
+            g_known, g_prons = lexicon.pronunciations(g) if g else (False, (("", ()),))
+            a_known, a_prons = lexicon.pronunciations(a) if a else (False, (("", ()),))
+            records.append((str(sentence_level_id), row, position, op, g or "", a or "", g_known, a_known, g_prons, a_prons))
+
+    # one DP problem per pronunciation pair; each word keeps its closest pair
+    left, right = [], []
+    for rec in records:
+        for _, g_ids in rec[8]:
+            for _, a_ids in rec[9]:
+                left.append(g_ids)
+                right.append(a_ids)
+
+    distance = np.full(len(left), np.inf, dtype=np.float32)
+    order = np.argsort([len(s) for s in left], kind="stable")  # similar lengths share a batch
+    costs = lexicon.cost_matrix() if lexicon.ids else np.zeros((1, 1), dtype=np.float32)
+    for first in range(0, len(order), batch_size):
+        chunk = order[first:first + batch_size]
+        a, a_len = _pad([left[k] for k in chunk])
+        b, b_len = _pad([right[k] for k in chunk])
+        distance[chunk] = batch_edit_distance(a, a_len, b, b_len, costs)
+
+    rows = []
+    first = 0
+    for rec in records:
+        # pairs of one word are contiguous: pick its closest pronunciation pair
+        n_pairs = len(rec[8]) * len(rec[9])
+        best = int(np.argmin(distance[first:first + n_pairs]))
+        first += n_pairs
+        g_i, a_i = divmod(best, len(rec[9]))
+        g_ipa, g_ids = rec[8][g_i]
+        a_ipa, _ = rec[9][a_i]
+        d = float(distance[first - n_pairs + best])
+        rows.append(rec[:8] + (g_ipa, a_ipa, d, d / max(len(g_ids), 1)))
+
+    columns = ["sentence_level_id", "row", "position", "op", "gold_word", "actual_word",
+               "gold_known", "actual_known", "gold_ipa", "actual_ipa", "distance", "normalized"]
+    scores = pd.DataFrame(rows, columns=columns)[list(WORD_SCORE_DTYPES)].astype(WORD_SCORE_DTYPES)
+    return scores.sort_values("normalized", ascending=False, kind="stable", ignore_index=True)
+
+
+def rank_sentences(scores: pd.DataFrame) -> pd.DataFrame:
+    """Sentences ordered by total phoneme distance, for review of likely mispronunciations."""
+    ranked = scores.groupby(["sentence_level_id", "row"], observed=True).agg(
+        words=("distance", "size"),
+        distance=("distance", "sum"),
+        worst=("normalized", "max"),
+    )
+    return ranked.sort_values(["distance", "worst"], ascending=False).reset_index()
+
+
+def score_mispronunciations(tsv_file_path: str, ipa_dict_path: str, output_file: str) -> pd.DataFrame:
+    df = load_sentence_labels(tsv_file_path, columns=[])
+    scores = score_sentence_table(df, IpaDictionary(ipa_dict_path))
+    scores.to_csv(output_file, sep="\t", index=False)
+    print(f"Scored {len(scores)} words in {scores['row'].nunique()} sentences")
+    return scores
+
+
+def load_word_scores(path: str) -> pd.DataFrame:
+    return pd.read_csv(path, sep="\t", dtype=WORD_SCORE_DTYPES, keep_default_na=False)
+
+
+if __name__ == "__main__":
+    scores = score_mispronunciations(
+        "../processed_data/sentenceLabels.tsv",
+        "../raw_data/EnglishData.tsv",
+        "../processed_data/mispronunciation_scores.tsv",
+    )
+    print(rank_sentences(scores).head(20))
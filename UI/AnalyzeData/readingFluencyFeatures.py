@@ -0,0 +1,156 @@
+import os
+import wave
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+from data_preprocessing.audioArrays import frame_features, load_wav, mask_to_regions
+from data_preprocessing.sentenceTables import load_sentence_labels
+
+# frame levels are floored here (below the 16-bit noise floor) so digital silence does not dominate rms_std_db
+LEVEL_FLOOR_DB = -100.0
+
+FEATURE_DTYPES = {
+    "sentence_level_id": "string",
+    "audio": "string",
+    "start_time": "float64",
+    "end_time": "float64",
+    "segment_time": "float64",
+    "n_words": "int32",
+    "words_per_second": "float64",
+    "articulation_rate": "float64",
+    "speech_ratio": "float32",
+    "pause_count": "Int32",  # NA when the recording could not be read
+    "pause_total": "float32",
+    "pause_mean": "float32",
+    "rms_mean_db": "float32",
+    "rms_std_db": "float32",
+    "rms_max_db": "float32",
+}
+
+
+def segment_audio_features(
+    audio_file_path: str,
+    starts: np.ndarray,
+    ends: np.ndarray,
+    threshold_db: float = 12.0,
+    min_pause: float = 0.25,
+) -> Dict[str, np.ndarray]:
+    """
+    Read one recording once and compute acoustic features for all of its
+    segments together. Speech frames are those *threshold_db* above the
+    recording's noise floor; pauses are silent runs of at least *min_pause*
+    seconds lying strictly inside a segment.
+    """
+    samples, sample_rate = load_wav(audio_file_path)
+    rms_db, _, hop = frame_features(samples, sample_rate)
+    rms = 10.0 ** (rms_db / 20.0)
+    speech = rms_db > np.percentile(rms_db, 10) + threshold_db
+
+    n_frames = len(rms)
+    a = np.clip(np.floor(starts / hop).astype(int), 0, n_frames)
+    b = np.clip(np.ceil(ends / hop).astype(int), 0, n_frames)
+    b = np.maximum(b, a)
+    length = np.maximum(b - a, 1)
+
+    # prefix sums give every segment's sums in O(1)
+    c_speech = np.concatenate(([0], np.cumsum(speech)))
+    c_rms = np.concatenate(([0.0], np.cumsum(rms)))
+    level_db = np.maximum(rms_db, LEVEL_FLOOR_DB).astype(np.float64)  # float32 sums of squares cancel badly
+    c_db = np.concatenate(([0.0], np.cumsum(level_db)))
+    c_db2 = np.concatenate(([0.0], np.cumsum(level_db * level_db)))
+    speech_frames = c_speech[b] - c_speech[a]
+    rms_mean = (c_rms[b] - c_rms[a]) / length
+    db_mean = (c_db[b] - c_db[a]) / length
+    db_var = np.maximum((c_db2[b] - c_db2[a]) / length - db_mean * db_mean, 0.0)
+
+    # silent runs are sorted and disjoint, so containment is two binary searches
+    pause_starts, pause_ends = mask_to_regions(~speech)
+    long_pause = (pause_ends - pause_starts) * hop >= min_pause
+    pause_starts, pause_ends = pause_starts[long_pause], pause_ends[long_pause]
+    c_pause = np.concatenate(([0], np.cumsum(pause_ends - pause_starts)))
+    lo = np.searchsorted(pause_starts, a, side="right")
+    hi = np.searchsorted(pause_ends, b, side="left")
+    hi = np.maximum(hi, lo)
+    pause_count = hi - lo
+    pause_total = (c_pause[hi] - c_pause[lo]) * hop
+
+    rms_max = np.array([rms_db[x:y].max() if y > x else -200.0 for x, y in zip(a, b)])
+
+    return {
+        "speech_ratio": speech_frames / length,
+        "speech_time": speech_frames * hop,
+        "pause_count": pause_count,
+        "pause_total": pause_total,
+        "pause_mean": np.where(pause_count > 0, pause_total / np.maximum(pause_count, 1), 0.0),
+        "rms_mean_db": 20.0 * np.log10(np.maximum(rms_mean, 1e-10)),
+        "rms_std_db": np.sqrt(db_var),
+        "rms_max_db": rms_max,
+    }
+
+
+def _recording_worker(job: Tuple[str, np.ndarray, np.ndarray, np.ndarray]):
+    audio_file_path, row_index, starts, ends = job
+    try:
+        return row_index, segment_audio_features(audio_file_path, starts, ends)
+    except (OSError, EOFError, ValueError, wave.Error) as e:
+        print(f"⚠️  Skipping {audio_file_path}: {e}")
+        return row_index, None
+
+
+def extract_fluency_features(tsv_file_path: str, audio_input_directory: str, output_file: str,
+                             workers: int = None) -> pd.DataFrame:
+    """
+    Compute reading-fluency features for every row of sentenceLabels.tsv.
+    Text features are vectorized with pandas; audio features are computed per
+    recording in a process pool, each recording being read exactly once.
+    """
+    df = load_sentence_labels(tsv_file_path, columns=["audio"])
+    features = pd.DataFrame(index=df.index)
+    features["sentence_level_id"] = df["sentence_level_id"].astype(str)
+    features["audio"] = df["audio"]
+    features["start_time"] = df["start_time"]
+    features["end_time"] = df["end_time"]
+    features["segment_time"] = df["end_time"] - df["start_time"]
+
+    # words actually read: the transcription if given, otherwise the target sentence
+    text = df["actual"].where(df["actual"].fillna("").astype(str).str.strip() != "", df["goldStandard"])
+    features["n_words"] = text.fillna("").astype(str).str.count(r"[A-Za-z']*[A-Za-z][A-Za-z']*")
+    features["words_per_second"] = features["n_words"] / features["segment_time"].where(features["segment_time"] > 0)
+
+    jobs = [
+        (os.path.join(audio_input_directory, audio), group.index.to_numpy(),
+         group["start_time"].to_numpy(dtype=float), group["end_time"].to_numpy(dtype=float))
+        for audio, group in df.groupby("audio", sort=False, observed=True)
+    ]
+    audio_columns = ["speech_ratio", "speech_time", "pause_count", "pause_total", "pause_mean",
+                     "rms_mean_db", "rms_std_db", "rms_max_db"]
+    for column in audio_columns:
+        features[column] = np.nan
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for row_index, values in pool.map(_recording_worker, jobs):
+            if values is None:
+                continue
+            for column in audio_columns:
+                features.loc[row_index, column] = values[column]
+
+    features["articulation_rate"] = features["n_words"] / features["speech_time"].where(features["speech_time"] > 0)
+    features = features[list(FEATURE_DTYPES)].astype(FEATURE_DTYPES)
+    features.to_csv(output_file, sep="\t", index=False)
+    return features
+
+
+def load_fluency_features(path: str) -> pd.DataFrame:
+    """Read a feature table back with its declared column types."""
+    return pd.read_csv(path, sep="\t", dtype=FEATURE_DTYPES)
+
+
+if __name__ == "__main__":
+    extract_fluency_features(
+        "../processed_data/sentenceLabels.tsv",
+        "../raw_data/audio/",
+        "../processed_data/fluency_features.tsv",
+    )
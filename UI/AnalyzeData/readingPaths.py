@@ -0,0 +1,219 @@
+import json
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from data_preprocessing.storyRegistry import story_id_for
+
+OTHER = -1
+PAD = np.iinfo(np.int32).max
+PAIR_BUDGET = 1 << 22  # rows × width² cells per Kendall tau chunk
+
+READING_PATH_DTYPES = {
+    "task_id": "string",
+    "story_id": "string",
+    "title": "string",
+    "grade": "string",
+    "story_sentences": "Int16",
+    "read": "int16",
+    "other": "int16",
+    "distinct": "int16",
+    "repeats": "int16",
+    "unread": "Int16",
+    "forward_skips": "int16",
+    "backtracks": "int16",
+    "max_backtrack": "int16",
+    "lis": "int16",
+    "lis_ratio": "float32",
+    "kendall_tau": "float32",
+    "monotonic": "bool",
+}
+
+
+def order_matrix(orders: pd.Series) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Parse comma-separated sentence orders into a zero-padded (tasks, longest)
+    matrix of sentence numbers in reading order, "Other" (-1) and blanks
+    dropped. Also returns the kept length and the "Other" count per task.
+    """
+    n = len(orders)
+    parts = orders.fillna("").astype(str).reset_index(drop=True).str.split(",").explode()
+    numbers = pd.to_numeric(parts.str.strip(), errors="coerce").to_numpy(dtype=float)
+    row = parts.index.to_numpy()
+
+    other = np.bincount(row[numbers == OTHER], minlength=n)
+    keep = numbers > 0
+    row, values = row[keep], numbers[keep].astype(np.int32)
+    lengths = np.bincount(row, minlength=n)
+    starts = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+    matrix = np.zeros((n, max(int(lengths.max(initial=0)), 1)), dtype=np.int32)
+    matrix[row, np.arange(len(row)) - starts[row]] = values
+    return matrix, lengths, other
+
+
+def longest_increasing(matrix: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """
+    Length of the longest strictly increasing subsequence of every row:
+    patience sorting run one column at a time for all rows, each insertion
+    point found by a vectorized binary search (O(n log n) per row).
+    """
+    n, width = matrix.shape
+    rows = np.arange(n)
+    tails = np.full((n, width), PAD, dtype=np.int32)
+    size = np.zeros(n, dtype=np.int64)
+    steps = max(width.bit_length(), 1)
+    for j in range(width):
+        active = lengths > j
+        x = matrix[:, j]
+        lo, hi = np.zeros(n, dtype=np.int64), size.copy()
+        for _ in range(steps):
+            open_ = lo < hi
+            mid = (lo + hi) // 2
+            right = open_ & (tails[rows, np.minimum(mid, width - 1)] < x)
+            lo = np.where(right, mid + 1, lo)
+            hi = np.where(open_ & ~right, mid, hi)
+        tails[rows[active], lo[active]] = x[active]
+        size += active & (lo == size)
+    return size
+
+
+def kendall_tau(matrix: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """
+    Kendall tau-b between reading position and sentence number per row (NaN
+    below two sentences or when every sentence is the same). All pairs are
+    compared at once over the padded matrix, in row chunks bounded by PAIR_BUDGET.
+    """
+    n, width = matrix.shape
+    tau = np.full(n, np.nan)
+    upper = np.triu(np.ones((width, width), dtype=bool), k=1)
+    columns = np.arange(width)
+    chunk = max(PAIR_BUDGET // (width * width), 1)
+    for first in range(0, n, chunk):
+        m = matrix[first:first + chunk].astype(np.int64)
+        length = lengths[first:first + chunk].astype(np.int64)
+        valid = columns < length[:, None]
+        pairs = upper & valid[:, :, None] & valid[:, None, :]
+        sign = np.sign(m[:, None, :] - m[:, :, None])  # [k, i, j] = sign(m[j] - m[i])
+        score = np.where(pairs, sign, 0).sum(axis=(1, 2))
+        tied = (pairs & (sign == 0)).sum(axis=(1, 2))
+        total = length * (length - 1) // 2
+        denominator = np.sqrt(total * (total - tied).astype(float))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            tau[first:first + chunk] = np.where(denominator > 0, score / denominator, np.nan)
+    return tau
+
+
+def reading_path_metrics(orders: pd.Series, story_sentences: Optional[pd.Series] = None) -> pd.DataFrame:
+    """
+    Per-task reading-path measures from "sentence order" strings, computed
+    for the whole column at once: sentences read, "Other" entries, distinct
+    sentences, re-reads, story sentences never read (needs *story_sentences*),
+    forward jumps over at least one sentence, backward steps and the largest
+    one, LIS length and ratio, and Kendall tau. *monotonic* matches the old
+    filter_non_monotonic test (no backward step).
+    """
+    matrix, lengths, other = order_matrix(orders)
+    width = matrix.shape[1]
+    valid = np.arange(width) < lengths[:, None]
+
+    step = matrix[:, 1:] - matrix[:, :-1]
+    step_valid = valid[:, 1:]
+    backward = step_valid & (step < 0)
+
+    ordered = np.sort(np.where(valid, matrix, PAD), axis=1)
+    distinct = (lengths > 0) + (valid[:, 1:] & (ordered[:, 1:] != ordered[:, :-1])).sum(axis=1)
+    lis = longest_increasing(matrix, lengths)
+
+    metrics = pd.DataFrame({
+        "read": lengths,
+        "other": other,
+        "distinct": distinct,
+        "repeats": lengths - distinct,
+        "forward_skips": (step_valid & (step > 1)).sum(axis=1),
+        "backtracks": backward.sum(axis=1),
+        "max_backtrack": np.where(backward, -step, 0).max(axis=1, initial=0),
+        "lis": lis,
+        "lis_ratio": np.where(lengths > 0, lis / np.maximum(lengths, 1), np.nan),
+        "kendall_tau": kendall_tau(matrix, lengths),
+    }, index=orders.index)
+    metrics["monotonic"] = metrics["backtracks"] == 0
+    if story_sentences is not None:
+        metrics["story_sentences"] = story_sentences.astype("Int16")
+        metrics["unread"] = (metrics["story_sentences"] - metrics["distinct"]).clip(lower=0)
+    return metrics
+
+
+def count_story_sentences(possible_sentences: pd.Series) -> pd.Series:
+    """Number of story sentences in each possibleSentences JSON list, "Other" excluded."""
+    def count(text) -> Optional[int]:
+        try:
+            return sum(1 for choice in json.loads(text) if choice.get("value") != "Other")
+        except (TypeError, ValueError, AttributeError):
+            return None
+    counts = {text: count(text) for text in possible_sentences.dropna().unique()}
+    return possible_sentences.map(counts).astype("Int16")
+
+
+def analyze_reading_paths(df: pd.DataFrame, order_column: str = "sentence order") -> pd.DataFrame:
+    """Typed reading-path table (READING_PATH_DTYPES) for a sentence export with a sentence order column."""
+    story_sentences = count_story_sentences(df["possibleSentences"]) if "possibleSentences" in df.columns else None
+    metrics = reading_path_metrics(df[order_column], story_sentences)
+
+    contents = df["content"].fillna("").astype(str) if "content" in df.columns else pd.Series("", index=df.index)
+    story_ids = {text: story_id_for(text) if text else "" for text in contents.unique()}
+    table = pd.DataFrame({
+        "task_id": df["id"].astype(str) if "id" in df.columns else df.index.astype(str),
+        "story_id": contents.map(story_ids),
+        "title": df["title"] if "title" in df.columns else "",
+        "grade": df["grade"] if "grade" in df.columns else "",
+    }, index=df.index)
+    table = pd.concat([table, metrics], axis=1)
+    for column in READING_PATH_DTYPES:
+        if column not in table.columns:
+            table[column] = pd.NA
+    return table[list(READING_PATH_DTYPES)].astype(READING_PATH_DTYPES)
+
+
+def summarize_reading_paths(paths: pd.DataFrame, by: Sequence[str] = ("story_id", "grade")) -> pd.DataFrame:
+    """Reading-path measures aggregated per story and/or grade."""
+    return paths.groupby(list(by), observed=True, dropna=False).agg(
+        tasks=("task_id", "size"),
+        monotonic_share=("monotonic", "mean"),
+        kendall_tau=("kendall_tau", "mean"),
+        lis_ratio=("lis_ratio", "mean"),
+        repeats=("repeats", "mean"),
+        backtracks=("backtracks", "mean"),
+        forward_skips=("forward_skips", "mean"),
+        unread=("unread", "mean"),
+    ).reset_index()
+
+
+def write_reading_paths(export_file: str, output_file: str, summary_file: Optional[str] = None,
+                        by: Sequence[str] = ("story_id", "grade")) -> pd.DataFrame:
+    """Analyze a tab-separated sentence export (adding its sentence order first if needed) and save the table."""
+    from AnalyzeData.sentenceOrderings import generate_sentence_order, load_data_table
+
+    df = load_data_table(export_file)
+    if "sentence order" not in df.columns:
+        df = generate_sentence_order(df)
+    paths = analyze_reading_paths(df)
+    paths.to_csv(output_file, sep="\t", index=False)
+    if summary_file:
+        summarize_reading_paths(paths, by).to_csv(summary_file, sep="\t", index=False)
+    print(f"{len(paths)} tasks, {int((~paths['monotonic']).sum())} read out of order, "
+          f"{int((paths['repeats'] > 0).sum())} with re-reads")
+    return paths
+
+
+def load_reading_paths(path: str) -> pd.DataFrame:
+    return pd.read_csv(path, sep="\t", dtype=READING_PATH_DTYPES)
+
+
+if __name__ == "__main__":
+    paths = write_reading_paths(
+        "../annotationData/sentences/export_157513_project-157513-at-2025-06-29-23-28-82ec7a90.csv",
+        "../processed_data/reading_paths.tsv",
+        "../processed_data/reading_paths_by_story_grade.tsv",
+    )
+    print(summarize_reading_paths(paths, ["grade"]))
@@ -1,8 +1,8 @@
-from collections import Counter
-
 import pandas as pd
 import json
 
+from AnalyzeData.readingPaths import reading_path_metrics
+
 
 def load_data_table(filepath):
     """Load TSV file as a DataFrame."""
@@ -58,13 +58,8 @@ def generate_sentence_order(df):
 
 def filter_non_monotonic(df):
     """Return rows where sentence order is not monotonically increasing (ignoring -1)."""
-
-    def is_monotonic(row):
-        nums = [int(x) for x in row['sentence order'].split(',') if x != '-1' and x != '']
-        return all(earlier <= later for earlier, later in zip(nums, nums[1:]))
-
     # Filter rows where order is NOT monotonic
-    return df[~df.apply(is_monotonic, axis=1)]
+    return df[~reading_path_metrics(df['sentence order'])['monotonic']]
 
 
 def find_rows_with_duplicate_non_negative_one_df(df, sentence_order_column="sentence order"):
@@ -72,15 +67,7 @@ def find_rows_with_duplicate_non_negative_one_df(df, sentence_order_column="sent
     Takes a DataFrame and returns rows where a non--1 value
     in the sentence order column is repeated.
     """
-    from collections import Counter
-
-    def has_duplicate_non_minus_one(order_str):
-        order = str(order_str).split(',')
-        nums = [x.strip() for x in order if x.strip() != '-1' and x.strip() != '']
-        counts = Counter(nums)
-        return any(v > 1 for k, v in counts.items())
-
-    filtered_df = df[df[sentence_order_column].apply(has_duplicate_non_minus_one)]
+    filtered_df = df[reading_path_metrics(df[sentence_order_column])['repeats'] > 0]
     return filtered_df
 
 
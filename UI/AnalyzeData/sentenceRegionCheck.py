@@ -0,0 +1,185 @@
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from data_preprocessing.audioIndex import AudioIndex
+from data_preprocessing.preprocessData import mark_tasks_changed
+from data_preprocessing.sentenceTables import load_sentence_labels
+
+ISSUE_TYPES = ["non_positive_length", "overlap", "gap", "past_end", "out_of_order"]
+
+
+def sweep_regions(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Sort all regions once by (task, start, end) and sweep each task, carrying
+    the furthest end seen so far. Returns the sorted frame with the original
+    row label in "row" plus "prev_end" (NaN for a task's first region) and
+    "prev_row", the row that reached prev_end.
+    """
+    task = df["sentence_level_id"].astype(str).to_numpy()
+    start = df["start_time"].to_numpy(dtype=float)
+    end = df["end_time"].to_numpy(dtype=float)
+    order = np.lexsort((end, start, task))
+
+    swept = pd.DataFrame({
+        "row": df.index.to_numpy()[order],
+        "sentence_level_id": task[order],
+        "audio": df["audio"].to_numpy()[order],
+        "start_time": start[order],
+        "end_time": end[order],
+    })
+    first = np.ones(len(swept), dtype=bool)
+    first[1:] = swept["sentence_level_id"].to_numpy()[1:] != swept["sentence_level_id"].to_numpy()[:-1]
+
+    # running max of end per task; the region before i reaches prev_end
+    reach = swept.groupby("sentence_level_id", sort=False)["end_time"].cummax().to_numpy()
+    prev_end = np.empty(len(swept))
+    prev_end[0:1] = np.nan
+    prev_end[1:] = reach[:-1]
+    prev_end[first] = np.nan
+    swept["prev_end"] = prev_end
+
+    # row holding the running max: last position where end == reach, forward-filled
+    holder = np.where(swept["end_time"].to_numpy() == reach, np.arange(len(swept)), -1)
+    holder = np.maximum.accumulate(holder)
+    prev_holder = np.empty(len(swept), dtype=np.int64)
+    prev_holder[0:1] = -1
+    prev_holder[1:] = holder[:-1]
+    prev_holder[first] = -1
+    swept["prev_row"] = np.where(prev_holder >= 0, swept["row"].to_numpy()[np.maximum(prev_holder, 0)], -1)
+    return swept
+
+
+def find_region_issues(df: pd.DataFrame, durations: Optional[pd.Series] = None,
+                       gap_threshold: float = 5.0, tolerance: float = 0.0) -> pd.DataFrame:
+    """
+    One row per problem in a sentenceLabels table: regions of zero/negative
+    length, overlaps with an earlier region of the same task, unlabeled gaps
+    longer than *gap_threshold* seconds, regions ending past the recording
+    (*durations* indexed like df, e.g. from an AudioIndex) and rows stored
+    out of start order. "amount" is the overlap/gap/overrun in seconds.
+    """
+    swept = sweep_regions(df)
+    start, end, prev_end = swept["start_time"], swept["end_time"], swept["prev_end"]
+
+    checks = {
+        "non_positive_length": (end - start <= 0, end - start),
+        "overlap": (start < prev_end - tolerance, prev_end - start),
+        "gap": (start - prev_end > gap_threshold, start - prev_end),
+    }
+    if durations is not None:
+        duration = durations.reindex(swept["row"]).to_numpy(dtype=float)
+        checks["past_end"] = (end > duration + tolerance, end - duration)
+
+    stored_start = df["start_time"].astype(float)
+    previous_start = stored_start.groupby(df["sentence_level_id"].astype(str), sort=False).shift()
+    out_of_order = (stored_start < previous_start).reindex(swept["row"]).to_numpy()
+    checks["out_of_order"] = (out_of_order, previous_start.reindex(swept["row"]).to_numpy() - start)
+
+    parts = []
+    for issue, (mask, amount) in checks.items():
+        mask = np.asarray(mask, dtype=bool)
+        if not mask.any():
+            continue
+        part = swept.loc[mask, ["row", "sentence_level_id", "audio", "start_time", "end_time", "prev_row"]].copy()
+        part["issue"] = issue
+        part["amount"] = np.asarray(amount, dtype=float)[mask]
+        parts.append(part)
+
+    columns = ["row", "sentence_level_id", "audio", "start_time", "end_time", "prev_row", "issue", "amount"]
+    if not parts:
+        return pd.DataFrame(columns=columns)
+    issues = pd.concat(parts, ignore_index=True)[columns]
+    issues["issue"] = pd.Categorical(issues["issue"], categories=ISSUE_TYPES)
+    return issues.sort_values(["sentence_level_id", "start_time", "issue"], kind="stable", ignore_index=True)
+
+
+def summarize_region_issues(issues: pd.DataFrame) -> pd.DataFrame:
+    """Count, affected tasks and worst amount per issue type."""
+    return issues.groupby("issue", observed=True).agg(
+        count=("row", "size"),
+        tasks=("sentence_level_id", "nunique"),
+        max_amount=("amount", "max"),
+    )
+
+
+def fix_trivial_overlaps(df: pd.DataFrame, issues: pd.DataFrame, max_overlap: float = 0.25) -> Tuple[pd.DataFrame, int]:
+    """
+    Resolve overlaps of at most *max_overlap* seconds by moving both
+    boundaries to the midpoint, when both regions keep a positive length.
+    Returns the fixed copy and the number of overlaps resolved.
+    """
+    trivial = issues[(issues["issue"] == "overlap") & (issues["amount"] <= max_overlap)]
+    # a region can only be shortened once from each side
+    trivial = trivial.drop_duplicates("prev_row").drop_duplicates("row")
+
+    fixed = df.copy()
+    midpoint = (trivial["start_time"].to_numpy() + fixed.loc[trivial["prev_row"], "end_time"].to_numpy()) / 2.0
+    keeps_length = ((midpoint > fixed.loc[trivial["prev_row"], "start_time"].to_numpy())
+                    & (midpoint < trivial["end_time"].to_numpy()))
+    rows, prev_rows, midpoint = trivial["row"][keeps_length], trivial["prev_row"][keeps_length], midpoint[keeps_length]
+
+    fixed.loc[prev_rows, "end_time"] = midpoint
+    fixed.loc[rows, "start_time"] = midpoint
+    if "segment_time" in fixed.columns:
+        touched = np.concatenate([rows.to_numpy(), prev_rows.to_numpy()])
+        fixed.loc[touched, "segment_time"] = fixed.loc[touched, "end_time"] - fixed.loc[touched, "start_time"]
+    return fixed, int(keeps_length.sum())
+
+
+def rewrite_region_times(tsv_file_path: str, original: pd.DataFrame, fixed: pd.DataFrame) -> None:
+    """
+    Write the repaired times back into the sentence TSV (flat or normalized),
+    keeping every other field byte-for-byte: the file is re-read as text and
+    only the time cells that changed are replaced, so no value goes through
+    a lossy float or dtype round trip.
+    """
+    raw = pd.read_csv(tsv_file_path, sep="\t", dtype=str, keep_default_na=False)
+    for column in ("start_time", "end_time", "segment_time"):
+        if column in raw.columns:
+            changed = fixed[column].ne(original[column]) & fixed[column].notna()
+            raw.loc[changed, column] = fixed.loc[changed, column].astype(float).map(repr)
+    raw.to_csv(tsv_file_path, sep="\t", index=False)
+
+
+def check_sentence_regions(tsv_file_path: str, audio_input_directory: Optional[str] = None,
+                           audio_index_path: Optional[str] = None, gap_threshold: float = 5.0,
+                           fix: bool = False, max_overlap: float = 0.25,
+                           report_path: Optional[str] = None) -> pd.DataFrame:
+    """
+    Report region problems in sentenceLabels.tsv; recording lengths come from
+    the AudioIndex when *audio_input_directory* is given. With *fix*, trivial
+    overlaps are resolved in place and the affected tasks are marked as
+    changed so the next incremental word-task run re-cuts their clips; only
+    the repaired rows of the TSV are rewritten.
+    """
+    df = load_sentence_labels(tsv_file_path)
+    durations = None
+    if audio_input_directory:
+        audio_index = AudioIndex(audio_input_directory, audio_index_path)
+        audio_index.refresh()
+        durations = df["audio"].astype(object).map(audio_index.duration).astype(float)
+
+    issues = find_region_issues(df, durations, gap_threshold)
+    print(summarize_region_issues(issues).to_string() if len(issues) else "No region issues found.")
+    if report_path:
+        issues.to_csv(report_path, sep="\t", index=False)
+
+    if fix and len(issues):
+        fixed, n_fixed = fix_trivial_overlaps(df, issues, max_overlap)
+        if n_fixed:
+            moved = (fixed["start_time"] != df["start_time"]) | (fixed["end_time"] != df["end_time"])
+            rewrite_region_times(tsv_file_path, df, fixed)
+            mark_tasks_changed(tsv_file_path, fixed.loc[moved, "sentence_level_id"].astype(str))
+        print(f"Fixed {n_fixed} trivial overlaps (≤ {max_overlap}s)")
+    return issues
+
+
+if __name__ == "__main__":
+    check_sentence_regions(
+        "../processed_data/sentenceLabels.tsv",
+        "../raw_data/audio",
+        "../processed_data/audio_index.tsv",
+        report_path="../processed_data/region_issues.tsv",
+    )
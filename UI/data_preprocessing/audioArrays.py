@@ -0,0 +1,68 @@
+import wave
+
+import numpy as np
+
+
+def load_wav(audio_file_path, mono=True):
+    """
+    Read a PCM WAV file into a float32 NumPy array scaled to [-1, 1].
+    Returns (samples, sample_rate); samples is 1-D when *mono* is True,
+    otherwise shaped (frames, channels).
+    """
+    with wave.open(str(audio_file_path), "rb") as wav:
+        channels = wav.getnchannels()
+        sample_width = wav.getsampwidth()
+        sample_rate = wav.getframerate()
+        raw = wav.readframes(wav.getnframes())
+
+    if sample_width == 1:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif sample_width == 2:
+        samples = np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768.0
+    elif sample_width == 3:
+        # 24-bit: widen each little-endian triplet to int32 via the top three bytes
+        triplets = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3)
+        widened = np.zeros((len(triplets), 4), dtype=np.uint8)
+        widened[:, 1:] = triplets
+        samples = widened.view("<i4").ravel().astype(np.float32) / 2147483648.0
+    elif sample_width == 4:
+        samples = np.frombuffer(raw, dtype="<i4").astype(np.float32) / 2147483648.0
+    else:
+        raise ValueError(f"Unsupported sample width {sample_width} in {audio_file_path}")
+
+    samples = samples.reshape(-1, channels)
+    if mono:
+        samples = samples.mean(axis=1)
+    return samples, sample_rate
+
+
+def frame_signal(samples, frame_length, hop_length):
+    """Return a strided (n_frames, frame_length) view of a 1-D signal, zero-padding the tail."""
+    if len(samples) < frame_length:
+        samples = np.pad(samples, (0, frame_length - len(samples)))
+    remainder = (len(samples) - frame_length) % hop_length
+    if remainder:
+        samples = np.pad(samples, (0, hop_length - remainder))
+    return np.lib.stride_tricks.sliding_window_view(samples, frame_length)[::hop_length]
+
+
+def frame_features(samples, sample_rate, frame_ms=25, hop_ms=10):
+    """
+    Compute per-frame RMS energy (dBFS) and zero-crossing rate for a mono signal.
+    Returns (rms_db, zcr, hop_seconds).
+    """
+    frame_length = max(1, int(sample_rate * frame_ms / 1000))
+    hop_length = max(1, int(sample_rate * hop_ms / 1000))
+    frames = frame_signal(samples, frame_length, hop_length)
+
+    rms = np.sqrt(np.mean(frames * frames, axis=1))
+    rms_db = 20.0 * np.log10(np.maximum(rms, 1e-10))
+    signs = np.signbit(frames)
+    zcr = np.mean(signs[:, 1:] != signs[:, :-1], axis=1)
+    return rms_db, zcr, hop_length / sample_rate
+
+
+def mask_to_regions(mask):
+    """Return (starts, ends) frame indices of the True runs in a boolean mask (end exclusive)."""
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
@@ -0,0 +1,173 @@
+import hashlib
+import io
+import math
+import os
+import wave
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+from data_preprocessing.audioArrays import load_wav
+
+
+def polyphase_filter(up: int, down: int, half_taps: int = 16, beta: float = 8.0) -> np.ndarray:
+    """
+    Kaiser-windowed sinc low-pass for resampling by up/down, already split
+    into phases: row p holds the taps applied for output phase p.
+    """
+    n_taps = 2 * half_taps * max(up, down) + 1
+    cutoff = 0.5 / max(up, down)
+    t = np.arange(n_taps) - (n_taps - 1) / 2
+    h = 2 * cutoff * np.sinc(2 * cutoff * t) * np.kaiser(n_taps, beta) * up
+    taps_per_phase = -(-n_taps // up)
+    h = np.pad(h, (0, taps_per_phase * up - n_taps))
+    return h.reshape(taps_per_phase, up).T.astype(np.float32)
+
+
+def resample_poly(samples: np.ndarray, orig_rate: int, target_rate: int,
+                  half_taps: int = 16, block: int = 1 << 14) -> np.ndarray:
+    """
+    Resample a 1-D signal by the reduced ratio target_rate/orig_rate with a
+    polyphase FIR filter. Output samples are computed *block* at a time: each
+    gathers its input window and its phase's taps and reduces with einsum.
+    """
+    samples = np.asarray(samples, dtype=np.float32)
+    if orig_rate == target_rate:
+        return samples
+    g = math.gcd(orig_rate, target_rate)
+    up, down = target_rate // g, orig_rate // g
+    phases = polyphase_filter(up, down, half_taps)
+    n_phase_taps = phases.shape[1]
+    delay = (2 * half_taps * max(up, down)) // 2  # centre of the (odd-length) filter
+
+    n_out = -(-len(samples) * up // down)
+    padded = np.concatenate([np.zeros(n_phase_taps - 1, np.float32), samples,
+                             np.zeros(delay // up + n_phase_taps + 1, np.float32)])
+    offsets = np.arange(n_phase_taps)
+    out = np.empty(n_out, dtype=np.float32)
+    for first in range(0, n_out, block):
+        n = np.arange(first, min(first + block, n_out), dtype=np.int64) * down + delay
+        windows = padded[(n // up + n_phase_taps - 1)[:, None] - offsets[None, :]]
+        out[first:first + len(n)] = np.einsum("ml,ml->m", windows, phases[n % up])
+    return out
+
+
+def normalize(samples: np.ndarray, mode: str = "rms", target_db: float = -20.0,
+              peak_db: float = -1.0) -> np.ndarray:
+    """
+    Scale to *target_db* RMS ("rms") or to *peak_db* peak ("peak"); in RMS
+    mode the gain is capped so the peak never exceeds *peak_db*.
+    """
+    peak = float(np.max(np.abs(samples))) if len(samples) else 0.0
+    if peak == 0.0:
+        return samples
+    ceiling = 10.0 ** (peak_db / 20.0)
+    if mode == "peak":
+        gain = ceiling / peak
+    elif mode == "rms":
+        rms = float(np.sqrt(np.mean(samples.astype(np.float64) ** 2)))
+        gain = min(10.0 ** (target_db / 20.0) / rms, ceiling / peak)
+    else:
+        raise ValueError(f"Unknown normalization mode: {mode}")
+    return (samples * gain).astype(np.float32)
+
+
+def to_pcm16(samples: np.ndarray) -> bytes:
+    return (np.clip(samples, -1.0, 1.0) * 32767.0).astype("<i2").tobytes()
+
+
+class AudioConditioner:
+    """
+    Resample recordings to *target_rate* mono and normalize their loudness,
+    caching each conditioned array as .npy in *cache_dir*. The cache key
+    covers the file name, size and mtime and every conditioning parameter, so
+    a changed recording or setting is recomputed and nothing else is.
+    """
+
+    def __init__(self, cache_dir: str, target_rate: int = 16000, mode: str = "rms",
+                 target_db: float = -20.0, peak_db: float = -1.0):
+        self.cache_dir = cache_dir
+        self.params = {"target_rate": target_rate, "mode": mode, "target_db": target_db, "peak_db": peak_db}
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @property
+    def target_rate(self) -> int:
+        return self.params["target_rate"]
+
+    def cache_path(self, audio_file_path: str) -> str:
+        st = os.stat(audio_file_path)
+        name = os.path.basename(audio_file_path)
+        key = hashlib.sha1(repr((name, st.st_size, st.st_mtime_ns, sorted(self.params.items()))).encode()).hexdigest()
+        return os.path.join(self.cache_dir, f"{os.path.splitext(name)[0]}.{key[:16]}.npy")
+
+    def condition(self, audio_file_path: str) -> str:
+        """Condition one recording unless it is cached; returns the cache path."""
+        path = self.cache_path(audio_file_path)
+        if os.path.exists(path):
+            return path
+        samples, sample_rate = load_wav(audio_file_path)
+        samples = resample_poly(samples, sample_rate, self.target_rate)
+        samples = normalize(samples, self.params["mode"], self.params["target_db"], self.params["peak_db"])
+
+        # drop arrays cached for an older version of this recording or setting
+        stem = os.path.splitext(os.path.basename(audio_file_path))[0] + "."
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.startswith(stem) and entry.name.endswith(".npy") and entry.path != path:
+                os.remove(entry.path)
+        tmp_path = path + ".tmp.npy"
+        np.save(tmp_path, samples)
+        os.replace(tmp_path, path)
+        return path
+
+    def load(self, audio_file_path: str) -> Tuple[np.ndarray, int]:
+        """Conditioned (samples, rate) for a recording, memory-mapped from the cache."""
+        return np.load(self.condition(audio_file_path), mmap_mode="r"), self.target_rate
+
+    def wav_bytes(self, audio_file_path: str, start_s: float = 0.0, end_s: Optional[float] = None) -> bytes:
+        """The conditioned recording (or a part of it) as 16-bit mono WAV bytes."""
+        samples, rate = self.load(audio_file_path)
+        samples = samples[int(start_s * rate): None if end_s is None else int(end_s * rate)]
+        buf = io.BytesIO()
+        with wave.open(buf, "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(rate)
+            wav.writeframes(to_pcm16(samples))
+        return buf.getvalue()
+
+    def condition_all(self, audio_paths: Iterable[str], workers: Optional[int] = None) -> Dict[str, int]:
+        """Condition every uncached recording in a process pool."""
+        todo = []
+        conditioned = failed = 0
+        for audio_file_path in dict.fromkeys(audio_paths):
+            try:
+                if not os.path.exists(self.cache_path(audio_file_path)):
+                    todo.append(audio_file_path)
+            except OSError as e:
+                print(f"⚠️  Skipping {audio_file_path}: {e}")
+                failed += 1
+        if todo:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                for audio_file_path, error in zip(todo, pool.map(_condition_worker, [(self, p) for p in todo])):
+                    if error:
+                        print(f"⚠️  Skipping {audio_file_path}: {error}")
+                        failed += 1
+                    else:
+                        conditioned += 1
+        return {"conditioned": conditioned, "failed": failed}
+
+
+def _condition_worker(job: Tuple[AudioConditioner, str]) -> Optional[str]:
+    conditioner, audio_file_path = job
+    try:
+        conditioner.condition(audio_file_path)
+        return None
+    except (OSError, EOFError, ValueError, wave.Error) as e:
+        return str(e)
+
+
+if __name__ == "__main__":
+    audio_dir = "../raw_data/audio"
+    conditioner = AudioConditioner("../processed_data/conditioned_audio")
+    print(conditioner.condition_all(os.path.join(audio_dir, f) for f in sorted(os.listdir(audio_dir)) if f.endswith(".wav")))
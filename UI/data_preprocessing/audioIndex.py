@@ -0,0 +1,144 @@
+import csv
+import os
+import struct
+from typing import Any, Dict, Optional
+
+import pandas as pd
+
+INDEX_COLUMNS = [
+    "name", "size", "mtime_ns", "audio_format", "sample_rate",
+    "channels", "bits_per_sample", "frames", "duration",
+]
+
+
+def read_wav_header(audio_file_path: str) -> Dict[str, Any]:
+    """
+    Parse only the RIFF/WAVE chunk headers of a file: the fmt chunk is read,
+    the data chunk is measured but never loaded.
+    """
+    info: Dict[str, Any] = {}
+    with open(audio_file_path, "rb") as f:
+        riff, _, wave_id = struct.unpack("<4sI4s", f.read(12))
+        if riff != b"RIFF" or wave_id != b"WAVE":
+            raise ValueError(f"{audio_file_path} is not a RIFF/WAVE file")
+
+        data_size = data_offset = None
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                break
+            chunk_id, chunk_size = struct.unpack("<4sI", header)
+            if chunk_id == b"fmt ":
+                fmt = f.read(chunk_size)
+                (info["audio_format"], info["channels"], info["sample_rate"], _,
+                 info["block_align"], info["bits_per_sample"]) = struct.unpack("<HHIIHH", fmt[:16])
+            elif chunk_id == b"data":
+                data_size, data_offset = chunk_size, f.tell()
+                if "block_align" in info:
+                    break
+                f.seek(chunk_size + (chunk_size & 1), os.SEEK_CUR)
+            else:
+                f.seek(chunk_size + (chunk_size & 1), os.SEEK_CUR)
+
+    if "block_align" not in info or data_size is None:
+        raise ValueError(f"{audio_file_path} is missing a fmt or data chunk")
+    if info["sample_rate"] == 0 or info["block_align"] == 0:
+        raise ValueError(f"{audio_file_path} has a corrupt fmt chunk (sample rate {info['sample_rate']}, "
+                         f"block align {info['block_align']})")
+
+    # a truncated recording reports a larger data chunk than the file holds
+    data_size = min(data_size, os.path.getsize(audio_file_path) - data_offset)
+    info["frames"] = data_size // info.pop("block_align")
+    info["duration"] = info["frames"] / info["sample_rate"]
+    return info
+
+
+class AudioIndex:
+    """
+    Persistent table of WAV header metadata for a directory of recordings,
+    stored as a TSV and refreshed incrementally by file size and mtime.
+    """
+
+    def __init__(self, audio_dir: str, index_path: Optional[str] = None):
+        self.audio_dir = audio_dir
+        self.index_path = index_path or os.path.join(audio_dir, "audio_index.tsv")
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "r", encoding="utf-8", newline="") as f:
+                for row in csv.DictReader(f, delimiter="\t"):
+                    for key in ("size", "mtime_ns", "audio_format", "sample_rate",
+                                "channels", "bits_per_sample", "frames"):
+                        row[key] = int(row[key])
+                    row["duration"] = float(row["duration"])
+                    self.entries[row["name"]] = row
+
+    def refresh(self, save: bool = True) -> Dict[str, int]:
+        """Re-read headers of new or modified WAVs and drop entries for deleted ones."""
+        seen = set()
+        updated = 0
+        with os.scandir(self.audio_dir) as it:
+            for entry in it:
+                if not entry.is_file() or not entry.name.lower().endswith(".wav"):
+                    continue
+                seen.add(entry.name)
+                stat = entry.stat()
+                known = self.entries.get(entry.name)
+                if known and known["size"] == stat.st_size and known["mtime_ns"] == stat.st_mtime_ns:
+                    continue
+                try:
+                    info = read_wav_header(entry.path)
+                except (OSError, ValueError, struct.error) as e:
+                    print(f"⚠️  Skipping unreadable WAV {entry.name}: {e}")
+                    continue
+                self.entries[entry.name] = {
+                    "name": entry.name, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns, **info
+                }
+                updated += 1
+
+        removed = [name for name in self.entries if name not in seen]
+        for name in removed:
+            del self.entries[name]
+
+        if save and (updated or removed):
+            self.save()
+        return {"files": len(self.entries), "updated": updated, "removed": len(removed)}
+
+    def save(self) -> None:
+        with open(self.index_path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=INDEX_COLUMNS, delimiter="\t")
+            writer.writeheader()
+            for name in sorted(self.entries):
+                writer.writerow(self.entries[name])
+
+    def get(self, audio_name: str) -> Optional[Dict[str, Any]]:
+        return self.entries.get(os.path.basename(audio_name))
+
+    def duration(self, audio_name: str) -> Optional[float]:
+        info = self.get(audio_name)
+        return info["duration"] if info else None
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame(list(self.entries.values()), columns=INDEX_COLUMNS)
+
+
+def validate_segment_times(df: pd.DataFrame, audio_index: AudioIndex) -> pd.DataFrame:
+    """
+    Return the rows of a sentenceLabels table whose audio is unknown to the
+    index or whose start/end times fall outside the recording, with a reason.
+    """
+    durations = df["audio"].astype(object).map(audio_index.duration).astype(float)
+    reasons = pd.Series("", index=df.index)
+    reasons[durations.isna()] = "audio not in index"
+    reasons[(reasons == "") & (df["start_time"] < 0)] = "start before 0"
+    reasons[(reasons == "") & (df["start_time"] > df["end_time"])] = "start after end"
+    reasons[(reasons == "") & (df["end_time"] > durations)] = "end past recording"
+
+    invalid = df.loc[reasons != "", ["sentence_level_id", "audio", "start_time", "end_time"]].copy()
+    invalid["duration"] = durations[reasons != ""]
+    invalid["reason"] = reasons[reasons != ""]
+    return invalid
+
+
+if __name__ == "__main__":
+    index = AudioIndex("../raw_data/audio", "../processed_data/audio_index.tsv")
+    print(index.refresh())
@@ -0,0 +1,246 @@
+import json
+import mimetypes
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import formatdate
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Sequence, Tuple
+from urllib.parse import unquote
+from urllib.request import Request, urlopen
+
+from data_preprocessing.taskUrls import CLIPS_PATH
+
+CHUNK_SIZE = 1 << 16
+RANGE_PATTERN = re.compile(r"bytes=(\d*)-(\d*)$")
+mimetypes.add_type("audio/ogg", ".ogg")
+mimetypes.add_type("audio/ogg", ".opus")
+mimetypes.add_type("audio/wav", ".wav")
+mimetypes.add_type("audio/mpeg", ".mp3")
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    First and last byte of a single "bytes=a-b", "bytes=a-" or "bytes=-n"
+    range, clamped to the file. Returns None when it cannot be satisfied;
+    raises ValueError for anything this server does not support.
+    """
+    match = RANGE_PATTERN.match(header.strip())
+    if not match or match.groups() == ("", ""):
+        raise ValueError(header)
+    first, last = match.groups()
+    if first == "":
+        length = int(last)
+        if length == 0:
+            return None
+        return max(size - length, 0), size - 1
+    first = int(first)
+    last = min(int(last), size - 1) if last else size - 1
+    if first >= size or first > last:
+        return None
+    return first, last
+
+
+def etag_for(st: os.stat_result) -> str:
+    return f'"{st.st_size:x}-{st.st_mtime_ns:x}"'
+
+
+class AudioRequestHandler(BaseHTTPRequestHandler):
+    """
+    Serves files below the mounted directories with byte ranges, ETags,
+    Cache-Control and CORS headers so the annotation UI can stream from it
+    exactly as from the production host. Directory listings are not served.
+    """
+    server_version = "StorizaAudio/1.0"
+    protocol_version = "HTTP/1.1"
+    mounts: Dict[str, str] = {}
+    max_age = 3600
+    quiet = False
+
+    def resolve(self) -> Optional[str]:
+        path = self.path.split("?", 1)[0].split("#", 1)[0]
+        for prefix in sorted(self.mounts, key=len, reverse=True):
+            if path.startswith(prefix):
+                root = os.path.realpath(self.mounts[prefix])
+                try:
+                    target = os.path.realpath(os.path.join(root, unquote(path[len(prefix):])))
+                    if os.path.commonpath([root, target]) == root and os.path.isfile(target):
+                        return target
+                except ValueError:
+                    pass  # e.g. an encoded NUL byte in the path
+                return None
+        return None
+
+    def send_common_headers(self, st: os.stat_result) -> None:
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", etag_for(st))
+        self.send_header("Last-Modified", formatdate(st.st_mtime, usegmt=True))
+        self.send_header("Cache-Control", f"public, max-age={self.max_age}")
+        self.send_cors_headers()
+
+    def send_cors_headers(self) -> None:
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Access-Control-Allow-Headers", "Range, If-None-Match")
+        self.send_header("Access-Control-Expose-Headers", "Accept-Ranges, Content-Length, Content-Range, ETag")
+
+    def send_empty(self, status: HTTPStatus) -> None:
+        self.send_response(status)
+        self.send_cors_headers()
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_OPTIONS(self) -> None:
+        self.send_response(HTTPStatus.NO_CONTENT)
+        self.send_cors_headers()
+        self.send_header("Access-Control-Allow-Methods", "GET, HEAD, OPTIONS")
+        self.send_header("Access-Control-Max-Age", "86400")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_HEAD(self) -> None:
+        self.serve(body=False)
+
+    def do_GET(self) -> None:
+        self.serve(body=True)
+
+    def serve(self, body: bool) -> None:
+        path = self.resolve()
+        if path is None:
+            self.send_empty(HTTPStatus.NOT_FOUND)
+            return
+        st = os.stat(path)
+        etag = etag_for(st)
+        if etag in [t.strip() for t in self.headers.get("If-None-Match", "").split(",")]:
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_common_headers(st)
+            self.end_headers()
+            return
+
+        first, last = 0, st.st_size - 1
+        status = HTTPStatus.OK
+        range_header = self.headers.get("Range")
+        # If-Range with a stale validator means "send the whole file"
+        if range_header and self.headers.get("If-Range", etag) == etag:
+            try:
+                requested = parse_range(range_header, st.st_size)
+            except ValueError:
+                requested = ()  # unsupported syntax: send the whole file
+            if requested is None:
+                self.send_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+                self.send_common_headers(st)
+                self.send_header("Content-Range", f"bytes */{st.st_size}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            if requested:
+                # even "bytes=0-" gets a 206 with Content-Range, which players expect
+                first, last = requested
+                status = HTTPStatus.PARTIAL_CONTENT
+
+        length = max(last - first + 1, 0)
+        self.send_response(status)
+        self.send_common_headers(st)
+        self.send_header("Content-Type", mimetypes.guess_type(path)[0] or "application/octet-stream")
+        self.send_header("Content-Length", str(length))
+        if status == HTTPStatus.PARTIAL_CONTENT:
+            self.send_header("Content-Range", f"bytes {first}-{last}/{st.st_size}")
+        self.end_headers()
+        if not body:
+            return
+
+        with open(path, "rb") as f:
+            f.seek(first)
+            remaining = length
+            try:
+                while remaining > 0:
+                    chunk = f.read(min(CHUNK_SIZE, remaining))
+                    if not chunk:
+                        break
+                    self.wfile.write(chunk)
+                    remaining -= len(chunk)
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # players routinely drop a connection once they have enough
+
+    def log_message(self, format: str, *args) -> None:
+        if not self.quiet:
+            super().log_message(format, *args)
+
+
+class AudioHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # the default backlog of 5 stalls bursts of parallel clip loads
+
+
+def make_server(audio_dir: str, clips_dir: Optional[str] = None, host: str = "127.0.0.1", port: int = 8000,
+                max_age: int = 3600, quiet: bool = False) -> ThreadingHTTPServer:
+    """
+    Threaded server laid out like the production host: recordings at "/"
+    and clips under "/audio_clips/". Each connection gets its own thread.
+    """
+    mounts = {"/": audio_dir}
+    if clips_dir:
+        mounts["/" + CLIPS_PATH] = clips_dir
+    handler = type("MountedAudioRequestHandler", (AudioRequestHandler,),
+                   {"mounts": mounts, "max_age": max_age, "quiet": quiet})
+    return AudioHTTPServer((host, port), handler)
+
+
+def serve_audio(audio_dir: str, clips_dir: Optional[str] = None, host: str = "127.0.0.1", port: int = 8000,
+                max_age: int = 3600, quiet: bool = False) -> None:
+    server = make_server(audio_dir, clips_dir, host, port, max_age, quiet)
+    print(f"Serving {audio_dir} at http://{host}:{server.server_port}/"
+          + (f" and {clips_dir} at /{CLIPS_PATH}" if clips_dir else ""))
+    print(f"Build tasks against it with STORIZA_BASE_URL=http://{host}:{server.server_port}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def task_audio_urls(tasks_file: str) -> List[str]:
+    """Every data["audio"] URL of a task JSON file (sentence or word tasks)."""
+    with open(tasks_file, "r", encoding="utf-8") as f:
+        return [task["data"]["audio"] for task in json.load(f) if task.get("data", {}).get("audio")]
+
+
+def _fetch(url: str, range_bytes: Optional[int]) -> Tuple[float, int]:
+    request = Request(url, headers={"Range": f"bytes=0-{range_bytes - 1}"} if range_bytes else {})
+    started = time.perf_counter()
+    with urlopen(request) as response:
+        n_bytes = len(response.read())
+    return time.perf_counter() - started, n_bytes
+
+
+def benchmark_fetch(urls: Sequence[str], workers: int = 8, range_bytes: Optional[int] = None) -> Dict[str, float]:
+    """
+    Fetch *urls* with *workers* concurrent clients, the way the annotation UI
+    loads a page of tasks, and report throughput and latency percentiles.
+    With range_bytes only the first bytes of each file are requested.
+    """
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(lambda url: _fetch(url, range_bytes), urls))
+    elapsed = time.perf_counter() - started
+    latencies = sorted(r[0] for r in results)
+    total_bytes = sum(r[1] for r in results)
+
+    def percentile(q: float) -> float:
+        return latencies[min(int(q * len(latencies)), len(latencies) - 1)] * 1000 if latencies else 0.0
+
+    return {
+        "requests": len(results),
+        "seconds": round(elapsed, 3),
+        "requests_per_s": round(len(results) / elapsed, 1) if elapsed else 0.0,
+        "MB_per_s": round(total_bytes / 1e6 / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(0.5), 1),
+        "p95_ms": round(percentile(0.95), 1),
+        "max_ms": round(percentile(1.0), 1),
+    }
+
+
+if __name__ == "__main__":
+    serve_audio("../raw_data/audio", "../processed_data/audio_clips")
@@ -4,16 +4,6 @@ from typing import Union, List, Optional, Any, Dict
 import riva.client
 import grpc
 
-import openai
-from dotenv import load_dotenv
-
-# Load environment variables from .env file
-load_dotenv()
-
-# Read API key from environment
-api_key = os.getenv("NVIDIA_API_KEY")
-input_file="./../raw_data/audio/uid_0FdMSMtn95PJ9tLFeW3F4sFLPMh1_sid_GcbJYqscm9YpPDCHkJWP_1743044185.wav"
-
 
 def transcribe_file_offline_full(
     server: str,
@@ -41,11 +31,14 @@ def transcribe_file_offline_full(
     stop_threshold_eou: Optional[float] = 0.0,
 
     custom_configuration: Optional[Dict[str, Any]] = None,
+    audio_bytes: Optional[bytes] = None,
 ) -> Optional[str]:
     """Full-featured Riva offline ASR transcriber and model lister.
 
     If list_models is True, prints the models and returns None.
     Otherwise, returns transcript string or raises exception.
+    audio_bytes (e.g. AudioConditioner.wav_bytes) is sent instead of the
+    contents of input_file when given.
     """
     input_path = Path(input_file).expanduser().resolve() if input_file else None
     # Auth and ASRService setup
@@ -77,7 +70,7 @@ def transcribe_file_offline_full(
         print(asr_models)
         return None
     # Validate audio file
-    if not input_path or not os.path.isfile(input_path):
+    if audio_bytes is None and (not input_path or not os.path.isfile(input_path)):
         raise FileNotFoundError(f"Invalid input file path: {input_path}")
     # Build config
     config = riva.client.RecognitionConfig(
@@ -99,8 +92,11 @@ def transcribe_file_offline_full(
         stop_threshold,
         stop_threshold_eou
     )
-    with open(input_path, 'rb') as fh:
-        data = fh.read()
+    if audio_bytes is not None:
+        data = audio_bytes
+    else:
+        with open(input_path, 'rb') as fh:
+            data = fh.read()
     try:
         response = asr_service.offline_recognize(data, config)
     except grpc.RpcError as e:
@@ -113,6 +109,14 @@ def transcribe_file_offline_full(
 
 # Example usage (uncomment to test)
 if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    # Load environment variables from .env file
+    load_dotenv()
+
+    # Read API key from environment
+    api_key = os.getenv("NVIDIA_API_KEY")
+    input_file = "./../raw_data/audio/uid_0FdMSMtn95PJ9tLFeW3F4sFLPMh1_sid_GcbJYqscm9YpPDCHkJWP_1743044185.wav"
     SERVER = "grpc.nvcf.nvidia.com:443"
     API_KEY = "<your‑bearer‑token>"
     print(transcribe_file_offline_full(SERVER, api_key, input_file))
@@ -0,0 +1,100 @@
+import csv
+import io
+import os
+import tarfile
+import zipfile
+
+# Fixed member timestamp so the same clips always produce the same archive bytes.
+_ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+INDEX_NAME = "index.tsv"
+INDEX_COLUMNS = ["name", "bytes", "audio", "start_time", "end_time"]
+
+
+class ClipArchive:
+    """
+    Stream encoded clips straight into a zip (stored, not deflated) or tar archive.
+
+    Members are written in the order they are added, with fixed timestamps and
+    ownership, and close() appends an index.tsv listing every member.
+    With carry_over (an earlier archive, possibly at the same path), close()
+    first copies the members of it named in *keep* that were not added again,
+    so clips of tasks that were not re-clipped stay available while clips of
+    deleted or re-cut tasks are dropped; the new archive is built in a
+    temporary file and only then replaces *path*.
+    """
+
+    def __init__(self, path, archive_format=None, carry_over=None, keep=()):
+        self.path = str(path)
+        self.archive_format = archive_format or ("tar" if self.path.endswith(".tar") else "zip")
+        self.index = []
+        self.carry_over = str(carry_over) if carry_over else None
+        self.keep = set(keep)
+        self._write_path = self.path + ".tmp" if self.carry_over else self.path
+        if self.archive_format == "zip":
+            self._archive = zipfile.ZipFile(self._write_path, "w", compression=zipfile.ZIP_STORED)
+        elif self.archive_format == "tar":
+            self._archive = tarfile.open(self._write_path, "w", format=tarfile.PAX_FORMAT)
+        else:
+            raise ValueError(f"Unsupported archive format: {self.archive_format}")
+
+    def add(self, name, data, audio="", start_time="", end_time=""):
+        if self.archive_format == "zip":
+            info = zipfile.ZipInfo(name, date_time=_ZIP_DATE_TIME)
+            info.compress_type = zipfile.ZIP_STORED
+            info.external_attr = 0o644 << 16
+            self._archive.writestr(info, data)
+        else:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mode = 0o644
+            self._archive.addfile(info, io.BytesIO(data))
+        self.index.append([name, len(data), audio, start_time, end_time])
+
+    def _copy_carried_over(self):
+        written = {row[0] for row in self.index}
+        if self.archive_format == "zip":
+            source = zipfile.ZipFile(self.carry_over, "r")
+            names, read = source.namelist(), source.read
+        else:
+            source = tarfile.open(self.carry_over, "r")
+            names = [m.name for m in source.getmembers() if m.isfile()]
+            read = lambda name: source.extractfile(name).read()
+        with source:
+            old_index = {}
+            if INDEX_NAME in names:
+                rows = csv.reader(io.StringIO(read(INDEX_NAME).decode("utf-8")), delimiter="\t")
+                next(rows, None)
+                old_index = {row[0]: row[2:] for row in rows}
+            for name in names:
+                if name in self.keep and name not in written:
+                    self.add(name, read(name), *old_index.get(name, []))
+
+    def close(self):
+        if self.carry_over:
+            self._copy_carried_over()
+        buf = io.StringIO()
+        writer = csv.writer(buf, delimiter="\t", lineterminator="\n")
+        writer.writerow(INDEX_COLUMNS)
+        writer.writerows(self.index)
+        index_bytes = buf.getvalue().encode("utf-8")
+        self.index = []
+        self.add(INDEX_NAME, index_bytes)
+        self._archive.close()
+        if self._write_path != self.path:
+            os.replace(self._write_path, self.path)
+
+    def __enter__(self):
+        return self
+
+    def discard(self):
+        """Close after a failure; a carry-over build is dropped so *path* keeps the previous archive."""
+        self._archive.close()
+        if self._write_path != self.path:
+            os.remove(self._write_path)
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
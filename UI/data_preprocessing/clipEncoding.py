@@ -0,0 +1,153 @@
+import io
+import os
+import time
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+import pydub
+
+from data_preprocessing.sentenceTables import iter_sentence_records
+
+# pydub export settings per profile; None keeps the source value / pydub default
+ENCODING_PROFILES: Dict[str, Dict[str, Any]] = {
+    "mp3": {"format": "mp3", "extension": "mp3", "codec": None, "bitrate": None, "sample_rate": None, "channels": None},
+    "mp3_low": {"format": "mp3", "extension": "mp3", "codec": None, "bitrate": "32k", "sample_rate": 22050, "channels": 1},
+    "opus": {"format": "ogg", "extension": "ogg", "codec": "libopus", "bitrate": "24k", "sample_rate": 16000, "channels": 1},
+    "wav16": {"format": "wav", "extension": "wav", "codec": None, "bitrate": None, "sample_rate": 16000, "channels": 1},
+}
+
+
+def resolve_profiles(profiles: Sequence[Union[str, Dict[str, Any]]],
+                     overrides: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Profile settings by name, in the given order (the first one is the clip
+    the task points at). *overrides* maps a profile name to settings such as
+    {"bitrate": "16k", "sample_rate": 16000}.
+    """
+    resolved = {}
+    for profile in profiles:
+        if isinstance(profile, dict):
+            name, settings = profile["name"], {k: v for k, v in profile.items() if k != "name"}
+        else:
+            if profile not in ENCODING_PROFILES:
+                raise KeyError(f"Unknown encoding profile: {profile} (known: {', '.join(ENCODING_PROFILES)})")
+            name, settings = profile, dict(ENCODING_PROFILES[profile])
+        settings.update((overrides or {}).get(name, {}))
+        resolved[name] = settings
+    return resolved
+
+
+def parse_profile_options(options: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+    """Turn ["opus.bitrate=16k", "mp3_low.sample_rate=16000"] into resolve_profiles overrides."""
+    overrides: Dict[str, Dict[str, Any]] = {}
+    for option in options or []:
+        key, sep, value = option.partition("=")
+        name, dot, setting = key.partition(".")
+        if not sep or not dot:
+            raise ValueError(f"Expected <profile>.<setting>=<value>, got: {option}")
+        overrides.setdefault(name, {})[setting] = int(value) if setting in ("sample_rate", "channels") else value
+    return overrides
+
+
+def clip_paths(output_directory: str, clip_stem: str, profiles: Dict[str, Dict[str, Any]]) -> Dict[str, str]:
+    """Where each profile's clip goes: one sub-folder per profile under *output_directory*."""
+    return {name: os.path.join(output_directory, name, f"{clip_stem}.{settings['extension']}")
+            for name, settings in profiles.items()}
+
+
+def encode_segment(audio_segment, settings: Dict[str, Any]) -> bytes:
+    """Encode a pydub AudioSegment with one profile's settings."""
+    if settings.get("channels"):
+        audio_segment = audio_segment.set_channels(settings["channels"])
+    if settings.get("sample_rate"):
+        audio_segment = audio_segment.set_frame_rate(settings["sample_rate"])
+    if settings["format"] == "wav":
+        audio_segment = audio_segment.set_sample_width(2)
+
+    buf = io.BytesIO()
+    export_kwargs = {"format": settings["format"]}
+    if settings.get("codec"):
+        export_kwargs["codec"] = settings["codec"]
+    if settings.get("bitrate"):
+        export_kwargs["bitrate"] = settings["bitrate"]
+    audio_segment.export(buf, **export_kwargs)
+    return buf.getvalue()
+
+
+class EncodeStats:
+    """Per-profile totals of clips, audio seconds, encoded bytes and encode time."""
+
+    def __init__(self):
+        self.totals: Dict[str, Dict[str, float]] = {}
+
+    def record(self, profile: str, n_bytes: int, encode_seconds: float, audio_seconds: float) -> None:
+        total = self.totals.setdefault(profile, {"clips": 0, "audio_seconds": 0.0, "bytes": 0, "encode_seconds": 0.0})
+        total["clips"] += 1
+        total["audio_seconds"] += audio_seconds
+        total["bytes"] += n_bytes
+        total["encode_seconds"] += encode_seconds
+
+    def rows(self) -> List[Dict[str, Any]]:
+        rows = []
+        for profile, t in self.totals.items():
+            rows.append({
+                "profile": profile,
+                "clips": t["clips"],
+                "MB": round(t["bytes"] / 1e6, 3),
+                "kbps": round(8 * t["bytes"] / 1000 / t["audio_seconds"], 1) if t["audio_seconds"] else 0.0,
+                "encode_s": round(t["encode_seconds"], 2),
+                "x_realtime": round(t["audio_seconds"] / t["encode_seconds"], 1) if t["encode_seconds"] else 0.0,
+            })
+        return rows
+
+    def report(self) -> str:
+        rows = self.rows()
+        if not rows:
+            return "No clips encoded."
+        header = list(rows[0])
+        lines = ["\t".join(header)] + ["\t".join(str(row[h]) for h in header) for row in rows]
+        return "\n".join(lines)
+
+
+def encode_profiles(audio_segment, profiles: Dict[str, Dict[str, Any]],
+                    stats: Optional[EncodeStats] = None) -> Dict[str, bytes]:
+    """Encode one already-cut segment with every profile, timing each encode."""
+    encoded = {}
+    audio_seconds = len(audio_segment) / 1000.0
+    for name, settings in profiles.items():
+        started = time.perf_counter()
+        encoded[name] = encode_segment(audio_segment, settings)
+        if stats is not None:
+            stats.record(name, len(encoded[name]), time.perf_counter() - started, audio_seconds)
+    return encoded
+
+
+def benchmark_profiles(tsv_file_path: str, audio_input_directory: str, profiles: Dict[str, Dict[str, Any]],
+                       sample: int = 50, padding: float = 1.0) -> EncodeStats:
+    """
+    Encode an evenly spaced sample of sentence clips with every profile and
+    return the per-profile size and encode-time totals. Nothing is written.
+    """
+    records = list(iter_sentence_records(tsv_file_path))
+    step = max(len(records) // max(sample, 1), 1)
+    stats = EncodeStats()
+    recordings = {}
+    for record in records[::step][:sample]:
+        path = os.path.join(audio_input_directory, record["audio"])
+        if path not in recordings:
+            try:
+                recordings[path] = pydub.AudioSegment.from_wav(path)
+            except (OSError, EOFError, ValueError) as e:
+                print(f"⚠️  Skipping {path}: {e}")
+                recordings[path] = None
+        audio = recordings[path]
+        if audio is None:
+            continue
+        start_ms = max(float(record["start_time"]) - padding, 0) * 1000
+        end_ms = min((float(record["end_time"]) + padding) * 1000, len(audio))
+        encode_profiles(audio[start_ms:end_ms], profiles, stats)
+    return stats
+
+
+if __name__ == "__main__":
+    print(benchmark_profiles("../processed_data/sentenceLabels.tsv", "../raw_data/audio",
+                             resolve_profiles(list(ENCODING_PROFILES))).report())
@@ -1,11 +1,11 @@
 import json
 import pandas as pd
 
+from data_preprocessing.taskUrls import strip_base_url
+
 
 def convert_sentences_to_tsv(input_file: str, output_file: str):
     """Convert Label‑Studio sentence annotations to a TSV covering ALL tasks."""
-    url_prefix = "https://2025storiza.michaelbennie.org/"
-
     with open(input_file, "r", encoding="utf‑8") as f:
         data = json.load(f)
 
@@ -14,11 +14,7 @@ def convert_sentences_to_tsv(input_file: str, output_file: str):
     for task in data:
         task_data = task.get("data", {})
         audio_full = task_data.get("audio", "")
-        audio = (
-            audio_full[len(url_prefix) :]
-            if audio_full.startswith(url_prefix)
-            else audio_full
-        )
+        audio = strip_base_url(audio_full)
 
         # Skip tasks without annotations
         if not task.get("annotations"):
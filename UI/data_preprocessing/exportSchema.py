@@ -0,0 +1,148 @@
+from numbers import Real
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from data_preprocessing.exportStream import iter_export_tasks
+
+# region roles: "open" starts a new sentence region, "attached" must carry the
+# id of the region opened just before it, None is annotation-level
+SENTENCE_EXPORT_SCHEMA: Dict[Tuple[str, str], Dict[str, Any]] = {
+    ("labels", "SentenceLabel"): {"region": "open", "value": {"start": "number", "end": "number", "labels": "list"}},
+    ("choices", "SentenceSelect"): {"region": "attached", "value": {"choices": "nonempty_list"}},
+    ("textarea", "Sentence"): {"region": "attached", "value": {"text": "nonempty_list"}},
+    ("choices", "sentenceIssues"): {"region": "attached", "value": {"choices": "list"}},
+    ("textarea", "issues"): {"region": None, "value": {"text": "list"}},
+}
+
+VALUE_CHECKS: Dict[str, Callable[[Any], bool]] = {
+    "number": lambda v: isinstance(v, Real) and not isinstance(v, bool),
+    "string": lambda v: isinstance(v, str),
+    "list": lambda v: isinstance(v, list),
+    "nonempty_list": lambda v: isinstance(v, list) and len(v) > 0,
+}
+
+
+class Violation(NamedTuple):
+    task_id: Any
+    annotation_id: Any
+    result_id: Any
+    message: str
+    severity: str = "error"  # "warning" for result types the schema does not know
+
+
+class ExportValidationError(ValueError):
+    def __init__(self, input_file: str, violations: List[Violation]):
+        self.violations = violations  # errors only
+        super().__init__(f"{input_file}: {len(violations)} schema violation(s), first: {violations[0]}")
+
+
+class CompiledSchema:
+    """
+    A result schema turned into a dict lookup on (type, from_name) plus a
+    tuple of (field, check, expected) per result type, so checking a result
+    costs one lookup and a few isinstance calls.
+    """
+
+    def __init__(self, schema: Dict[Tuple[str, str], Dict[str, Any]], allow_unknown: bool = False):
+        self.allow_unknown = allow_unknown
+        self.rules = {
+            key: (spec.get("region"), tuple((field, VALUE_CHECKS[kind], kind) for field, kind in spec["value"].items()))
+            for key, spec in schema.items()
+        }
+
+    def check_result(self, result: Any, open_region_id: Optional[str]) -> Optional[str]:
+        """Return what is wrong with one result, or None; *open_region_id* is the last opened region."""
+        if not isinstance(result, dict):
+            return "result is not an object"
+        rule = self.rules.get((result.get("type"), result.get("from_name")))
+        if rule is None:
+            return None if self.allow_unknown else \
+                f"unexpected result type={result.get('type')!r} from_name={result.get('from_name')!r}"
+        region, fields = rule
+
+        value = result.get("value")
+        if not isinstance(value, dict):
+            return f"{result['from_name']}: missing value"
+        for field, check, kind in fields:
+            if not check(value.get(field)):
+                return f"{result['from_name']}: value.{field} is {value.get(field)!r}, expected {kind}"
+
+        if region == "open" and "start" in value and "end" in value and value["end"] < value["start"]:
+            return f"{result['from_name']}: end {value['end']} precedes start {value['start']}"
+        if region == "attached":
+            if open_region_id is None:
+                return f"{result['from_name']} precedes any region"
+            if result.get("id") != open_region_id:
+                return f"{result['from_name']} belongs to region {result.get('id')!r}, not the open region {open_region_id!r}"
+        return None
+
+    def iter_task_violations(self, task: Any, first_annotation_only: bool = False) -> Iterator[Violation]:
+        """
+        Yield every violation in one task, or only in its first annotation
+        (the one convert_task reads) with *first_annotation_only*.
+        """
+        if not isinstance(task, dict):
+            yield Violation(None, None, None, "task is not an object")
+            return
+        task_id = task.get("id")
+        if task_id is None:
+            yield Violation(None, None, None, "task has no id")
+        if not isinstance(task.get("data"), dict):
+            yield Violation(task_id, None, None, "task has no data object")
+        annotations = task.get("annotations", [])
+        if not isinstance(annotations, list):
+            yield Violation(task_id, None, None, "annotations is not a list")
+            return
+
+        for annot in annotations[:1] if first_annotation_only else annotations:
+            results = annot.get("result") if isinstance(annot, dict) else None
+            annotation_id = annot.get("id") if isinstance(annot, dict) else None
+            if not isinstance(results, list):
+                yield Violation(task_id, annotation_id, None, "annotation has no result list")
+                continue
+            open_region_id = None
+            for result in results:
+                problem = self.check_result(result, open_region_id)
+                if problem:
+                    # readers ignore result types they do not know, so those only warn
+                    known = not isinstance(result, dict) or (result.get("type"), result.get("from_name")) in self.rules
+                    yield Violation(task_id, annotation_id, result.get("id") if isinstance(result, dict) else None,
+                                    problem, "error" if known else "warning")
+                elif self.rules.get((result.get("type"), result.get("from_name")), (None,))[0] == "open":
+                    open_region_id = result.get("id")
+
+
+SENTENCE_SCHEMA = CompiledSchema(SENTENCE_EXPORT_SCHEMA)
+
+
+def validate_export(input_file: str, schema: CompiledSchema = SENTENCE_SCHEMA,
+                    max_violations: Optional[int] = None, first_annotation_only: bool = False) -> List[Violation]:
+    """
+    Check every task of a JSON export against *schema* in one streaming pass
+    and return all violations (or the first *max_violations*).
+    """
+    violations: List[Violation] = []
+    for task in iter_export_tasks(input_file):
+        for violation in schema.iter_task_violations(task, first_annotation_only):
+            violations.append(violation)
+            if max_violations is not None and len(violations) >= max_violations:
+                return violations
+    return violations
+
+
+def require_valid_export(input_file: str, schema: CompiledSchema = SENTENCE_SCHEMA,
+                         first_annotation_only: bool = False) -> None:
+    """
+    Print every violation and raise ExportValidationError listing the errors;
+    warnings alone do not fail.
+    """
+    violations = validate_export(input_file, schema, first_annotation_only=first_annotation_only)
+    for v in violations:
+        print(f"⚠️  task {v.task_id} annotation {v.annotation_id} result {v.result_id}: {v.message}")
+    errors = [v for v in violations if v.severity == "error"]
+    if errors:
+        raise ExportValidationError(input_file, errors)
+
+
+if __name__ == "__main__":
+    require_valid_export("../processed_data/merged_sentences_export.json")
+    print("Export is valid")
@@ -0,0 +1,83 @@
+import csv
+import json
+import re
+import sys
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+# A complete JSON string, a lone quote (string cut off at the buffer end) or a bracket.
+_TOKEN = re.compile(rb'"(?:[^"\\]|\\.)*"|"|[{}\[\]]', re.S)
+
+
+def iter_json_array(path: str, chunk_size: int = 1 << 20) -> Iterator[Tuple[int, bytes]]:
+    """
+    Yield (byte offset, raw bytes) for each top-level element of a JSON array
+    file while holding at most one element plus one chunk in memory.
+    """
+    with open(path, "rb") as f:
+        buf = b""
+        base = 0        # file offset of buf[0]
+        pos = 0
+        depth = 0
+        start = None    # buffer offset of the element being scanned
+        eof = False
+
+        while True:
+            m = _TOKEN.search(buf, pos)
+            if m is None or m.group() == b'"':
+                if eof:
+                    return
+                resume = m.start() if m else len(buf)
+                keep = start if start is not None else resume
+                buf = buf[keep:]
+                base += keep
+                pos = resume - keep
+                if start is not None:
+                    start = 0
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buf += chunk
+                continue
+
+            pos = m.end()
+            token = m.group()
+            if token[:1] == b'"':
+                continue
+            if token in (b"{", b"["):
+                if depth == 1:
+                    start = m.start()
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 1 and start is not None:
+                    yield base + start, buf[start:m.end()]
+                    start = None
+                elif depth == 0:
+                    return
+
+
+def iter_export_tasks(path: str) -> Iterator[Dict[str, Any]]:
+    """Stream the tasks of a Label Studio JSON export one at a time."""
+    for _, raw in iter_json_array(path):
+        yield json.loads(raw)
+
+
+def csv_delimiter(path: str) -> str:
+    """Delimiter of a Label Studio CSV export; re-saved exports are tab-separated despite the .csv name."""
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        header = f.readline()
+    return "\t" if "\t" in header else ","
+
+
+def iter_csv_rows(path: str, delimiter: Optional[str] = None) -> Iterator[Dict[str, str]]:
+    """Stream the rows of a Label Studio CSV export one at a time."""
+    csv.field_size_limit(min(sys.maxsize, 2 ** 31 - 1))
+    delimiter = delimiter or csv_delimiter(path)
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        yield from csv.DictReader(f, delimiter=delimiter)
+
+
+def read_raw(path: str, offset: int, length: int) -> bytes:
+    """Read back one element located by iter_json_array."""
+    with open(path, "rb") as f:
+        f.seek(offset)
+        return f.read(length)
@@ -0,0 +1,184 @@
+import csv
+import os
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from data_preprocessing.exportStream import iter_export_tasks
+from data_preprocessing.sentenceTables import iter_sentence_records
+
+# choices-type results attached to a WordAnnotation region
+ERROR_TYPE_FIELDS = [
+    "DisfluencyErrorType", "StructuralErrorType", "GrammaticalErrorType",
+    "OrthographicErrorType", "PhonologicalErrorType", "VisualTrackingErrorType",
+]
+# textarea-type results attached to a WordAnnotation region
+WORD_TEXT_FIELDS = ["mispronunciation_word", "produced_word", "spoken_word", "spoken_words"]
+
+TASK_FIELDS = ["goldStandard", "actual", "userId", "__id__", "grade", "title", "original_audio_name"]
+
+WORD_COLUMNS = (
+    ["task_id", "sentence_level_id", "annotation_id", "annotator", "region_id",
+     "start", "end", "duration", "error_category"]
+    + ERROR_TYPE_FIELDS + ["MixedErrorTaxonomy"] + WORD_TEXT_FIELDS
+    + ["annotation_issues"] + TASK_FIELDS
+)
+
+WORD_DTYPES = {
+    "task_id": "int64",
+    "sentence_level_id": "string",
+    "annotation_id": "int64",
+    "annotator": "category",
+    "region_id": "string",
+    "start": "float64",
+    "end": "float64",
+    "duration": "float64",
+    "error_category": "category",
+    **{field: "category" for field in ERROR_TYPE_FIELDS},
+    "MixedErrorTaxonomy": "string",
+    **{field: "string" for field in WORD_TEXT_FIELDS},
+    "annotation_issues": "string",
+    "goldStandard": "string",
+    "actual": "string",
+    "userId": "category",
+    "__id__": "category",
+    "grade": "category",
+    "title": "category",
+    "original_audio_name": "string",
+}
+
+# separator for multi-valued fields (several choices / several text lines)
+MULTI_SEP = "|"
+
+# (by (audio, start_time, end_time), by recording with a single sentence task)
+SentenceIds = Tuple[Dict[Tuple[str, float, float], str], Dict[str, str]]
+
+
+def load_sentence_level_ids(sentence_file: str) -> SentenceIds:
+    """
+    sentence_level_id of every sentenceLabels region, plus one per recording
+    for recordings covered by a single sentence task, which still matches
+    word tasks whose sentence region was adjusted after they were built.
+    """
+    by_region: Dict[Tuple[str, float, float], str] = {}
+    by_audio: Dict[str, set] = {}
+    for record in iter_sentence_records(sentence_file):
+        sentence_level_id = record["sentence_level_id"]
+        by_audio.setdefault(record["audio"], set()).add(sentence_level_id)
+        try:
+            by_region[(record["audio"], float(record["start_time"]), float(record["end_time"]))] = sentence_level_id
+        except ValueError:
+            continue
+    return by_region, {audio: next(iter(ids)) for audio, ids in by_audio.items() if len(ids) == 1}
+
+
+def match_sentence_level_id(data: Dict[str, Any], sentence_ids: SentenceIds) -> str:
+    """sentence_level_id for word-task data lacking one: exact region first, then recording."""
+    by_region, by_audio = sentence_ids
+    audio = data.get("original_audio_name", "")
+    try:
+        key = (audio, float(data["start_time"]), float(data["end_time"]))
+    except (KeyError, TypeError, ValueError):
+        key = None
+    return by_region.get(key) or by_audio.get(audio, "")
+
+
+def flatten_task(task: Dict[str, Any], sentence_ids: Optional[SentenceIds] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Yield one row per WordAnnotation region of every annotation of a task.
+    Tasks built without a sentence_level_id are matched through *sentence_ids*.
+    """
+    data = task.get("data", {})
+    task_values = {field: data.get(field, "") for field in TASK_FIELDS}
+    sentence_level_id = data.get("sentence_level_id", "")
+    if sentence_level_id in ("", None) and sentence_ids is not None:
+        sentence_level_id = match_sentence_level_id(data, sentence_ids)
+
+    for annot in task.get("annotations", []):
+        if annot.get("was_cancelled"):
+            continue
+        completed_by = annot.get("completed_by", {})
+        annotator = completed_by.get("email", completed_by.get("id", "")) if isinstance(completed_by, dict) else completed_by
+
+        regions: Dict[str, Dict[str, Any]] = {}
+        attached: Dict[str, Dict[str, str]] = {}
+        issues: List[str] = []
+
+        for r in annot.get("result", []):
+            from_name, value = r.get("from_name"), r.get("value", {})
+            if from_name == "WordAnnotation":
+                regions[r["id"]] = value
+            elif from_name in ERROR_TYPE_FIELDS:
+                attached.setdefault(r["id"], {})[from_name] = MULTI_SEP.join(value.get("choices", []))
+            elif from_name == "MixedErrorTaxonomy":
+                attached.setdefault(r["id"], {})[from_name] = MULTI_SEP.join(
+                    ">".join(path) for path in value.get("taxonomy", [])
+                )
+            elif from_name in WORD_TEXT_FIELDS:
+                attached.setdefault(r["id"], {})[from_name] = MULTI_SEP.join(value.get("text", []))
+            elif from_name == "issues":
+                issues.extend(value.get("text", []))
+
+        for region_id, value in regions.items():
+            start, end = value.get("start"), value.get("end")
+            row = {
+                "task_id": task.get("id"),
+                "sentence_level_id": sentence_level_id,
+                "annotation_id": annot.get("id"),
+                "annotator": annotator,
+                "region_id": region_id,
+                "start": start,
+                "end": end,
+                "duration": end - start if start is not None and end is not None else None,
+                "error_category": (value.get("labels") or [""])[0],
+                "annotation_issues": MULTI_SEP.join(issues),
+                **task_values,
+            }
+            row.update(attached.get(region_id, {}))
+            yield row
+
+
+def flatten_word_export(input_file: str, output_file: str, sentence_labels: Optional[str] = None) -> int:
+    """
+    Stream a word-level Label Studio JSON export into a TSV with one row per
+    word annotation. Tasks are read and written one at a time. Word tasks
+    without a sentence_level_id are joined to *sentence_labels* on
+    (original_audio_name, start_time, end_time); those that still do not
+    match are reported.
+    """
+    sentence_ids = None
+    if sentence_labels and os.path.exists(sentence_labels):
+        sentence_ids = load_sentence_level_ids(sentence_labels)
+    elif sentence_labels:
+        print(f"⚠️  {sentence_labels} not found; word tasks without a sentence_level_id stay unmatched")
+
+    n_rows = 0
+    unmatched: Dict[Any, int] = {}
+    with open(output_file, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=WORD_COLUMNS, delimiter="\t", restval="", extrasaction="ignore")
+        writer.writeheader()
+        for task in iter_export_tasks(input_file):
+            for row in flatten_task(task, sentence_ids):
+                writer.writerow(row)
+                n_rows += 1
+                if row["sentence_level_id"] in ("", None):
+                    unmatched[row["task_id"]] = unmatched.get(row["task_id"], 0) + 1
+    print(f"Wrote {n_rows} word annotations to {output_file}")
+    if unmatched:
+        print(f"⚠️  {sum(unmatched.values())} rows of {len(unmatched)} tasks have no sentence_level_id: "
+              f"{', '.join(str(task_id) for task_id in unmatched)}")
+    return n_rows
+
+
+def load_word_annotations(path: str, **kwargs) -> pd.DataFrame:
+    """Read a flattened word table with its declared column types (chunksize etc. pass through)."""
+    return pd.read_csv(path, sep="\t", dtype=WORD_DTYPES, keep_default_na=False,
+                       na_values={"start": [""], "end": [""], "duration": [""]}, **kwargs)
+
+
+if __name__ == "__main__":
+    flatten_word_export(
+        "../annotationData/words/8_4_annotation_data.json",
+        "../processed_data/word_annotations.tsv",
+        "../processed_data/sentenceLabels.tsv",
+    )
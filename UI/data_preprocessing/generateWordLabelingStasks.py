@@ -1,38 +1,137 @@
+import gzip
+import io
 import pydub
 import os
+import wave
 from tqdm import tqdm
 import pandas as pd
 import json
+from typing import Any, Dict, NamedTuple, Optional, Sequence
 
 from data_preprocessing.IPADict import IpaDictionary
+from data_preprocessing.audioConditioning import AudioConditioner, to_pcm16
+from data_preprocessing.audioIndex import AudioIndex, validate_segment_times
+from data_preprocessing.clipArchive import ClipArchive
+from data_preprocessing.clipEncoding import EncodeStats, clip_paths, encode_profiles, resolve_profiles
+from data_preprocessing.preprocessData import clear_changed_task_ids, load_changed_task_ids
+from data_preprocessing.sentenceTables import load_sentence_labels
+from data_preprocessing.storyRegistry import StoryRegistry
+from data_preprocessing.taskShards import ShardWriter
+from data_preprocessing.taskUrls import CLIPS_PATH, clips_url, strip_base_url
+from data_preprocessing.waveformPeaks import peak_documents, peak_file_names, peak_urls, segment_samples
 
 
-def generate_audio_segment(audio_file_path, start_time, end_time, padding=1, output_directory='../processed_data/audio_clips/'):
+def read_wav_range(audio_file_path, info, start_s, end_s):
+    """
+    Read only the frames between start_s and end_s (seconds) of a WAV whose
+    header metadata *info* comes from the AudioIndex.
+    """
+    start_frame = int(start_s * info["sample_rate"])
+    end_frame = min(int(end_s * info["sample_rate"]), info["frames"])
+    with wave.open(audio_file_path, "rb") as wav:
+        wav.setpos(start_frame)
+        frames = wav.readframes(max(end_frame - start_frame, 0))
+    return pydub.AudioSegment(
+        data=frames,
+        sample_width=info["bits_per_sample"] // 8,
+        frame_rate=info["sample_rate"],
+        channels=info["channels"],
+    )
+
+
+def generate_audio_segment(audio_file_path, start_time, end_time, padding=1, output_directory='../processed_data/audio_clips/',
+                           audio_index=None, archive=None, conditioner=None, peaks_dir=None, profiles=None,
+                           encode_stats=None):
     """
     Generates a segment of the audio file from start_time to end_time with padding.
     Saves it as an MP3 file in the specified output directory.
+    When an AudioIndex is given, the recording length comes from its header
+    table and only the padded segment is read from disk.
+    When a ClipArchive is given, the encoded MP3 is streamed into the archive
+    instead of being written to output_directory; the returned path is the
+    one the clip would have had, so task URLs are unchanged.
+    When an AudioConditioner is given, the clip is cut from the cached
+    resampled, loudness-normalized recording instead of the raw WAV.
+    With peaks_dir, waveform peak files for the clip are written there (or
+    into the archive under peaks/), unless they are newer than the recording.
+    With profiles (see resolve_profiles), the cut segment is encoded once per
+    profile into output_directory/<profile>/ and the first profile's path is
+    returned; encode sizes and times are added to encode_stats.
     """
-    # Load the audio file
-    audio = pydub.AudioSegment.from_wav(audio_file_path)
+    info = audio_index.get(audio_file_path) if audio_index is not None else None
+    if conditioner is not None:
+        samples, rate = conditioner.load(audio_file_path)
+        start_s = max(start_time - padding, 0)
+        end_s = min(end_time + padding, len(samples) / rate)
+        audio_segment = pydub.AudioSegment(
+            data=to_pcm16(samples[int(start_s * rate):int(end_s * rate)]),
+            sample_width=2,
+            frame_rate=rate,
+            channels=1,
+        )
+    elif info is not None and info["audio_format"] == 1:  # plain PCM, readable by the wave module
+        start_s = max(start_time - padding, 0)
+        end_s = min(end_time + padding, info["duration"])
+        audio_segment = read_wav_range(audio_file_path, info, start_s, end_s)
+    else:
+        # Load the audio file
+        audio = pydub.AudioSegment.from_wav(audio_file_path)
+
+        # Get the total length of the audio file (in milliseconds)
+        audio_length_ms = len(audio)
+
+        # Convert start and end times to milliseconds with padding
+        start_ms = max((start_time - padding), 0) * 1000  # Ensure start time does not go below 0
+        end_ms = min((end_time + padding) * 1000, audio_length_ms)  # Ensure end time does not exceed the audio length
+
+        # Extract the segment
+        audio_segment = audio[start_ms:end_ms]
+
+    # Generate file name in the required format
+    audio_name = os.path.basename(audio_file_path).split('.')[0]  # Strip file extension
+    clip_name = f"{start_time:.1f}_end_{end_time:.1f}_{audio_name}.mp3"
+    output_file = os.path.join(output_directory, clip_name)
 
-    # Get the total length of the audio file (in milliseconds)
-    audio_length_ms = len(audio)
+    if peaks_dir is not None:
+        clip_stem = os.path.splitext(clip_name)[0]
+        peak_paths = [os.path.join(peaks_dir, n) for n in peak_file_names(clip_stem).values()]
+        up_to_date = archive is None and all(
+            os.path.exists(p) and os.path.getmtime(p) >= os.path.getmtime(audio_file_path) for p in peak_paths
+        )
+        if not up_to_date:
+            documents = peak_documents(segment_samples(audio_segment), audio_segment.frame_rate, clip_stem)
+            if archive is None:
+                os.makedirs(peaks_dir, exist_ok=True)
+            for name, payload in documents.items():
+                if archive is not None:
+                    archive.add(f"peaks/{name}", payload, os.path.basename(audio_file_path), start_time, end_time)
+                else:
+                    with open(os.path.join(peaks_dir, name), "wb") as f:
+                        f.write(payload)
 
-    # Convert start and end times to milliseconds with padding
-    start_ms = max((start_time - padding), 0) * 1000  # Ensure start time does not go below 0
-    end_ms = min((end_time + padding) * 1000, audio_length_ms)  # Ensure end time does not exceed the audio length
+    if profiles:
+        clip_stem = os.path.splitext(clip_name)[0]
+        paths = clip_paths(output_directory, clip_stem, profiles)
+        for name, payload in encode_profiles(audio_segment, profiles, encode_stats).items():
+            if archive is not None:
+                archive.add(os.path.relpath(paths[name], output_directory).replace(os.sep, "/"), payload,
+                            os.path.basename(audio_file_path), start_time, end_time)
+            else:
+                os.makedirs(os.path.dirname(paths[name]), exist_ok=True)
+                with open(paths[name], "wb") as f:
+                    f.write(payload)
+        return next(iter(paths.values()))
 
-    # Extract the segment
-    audio_segment = audio[start_ms:end_ms]
+    if archive is not None:
+        buf = io.BytesIO()
+        audio_segment.export(buf, format='mp3')
+        archive.add(clip_name, buf.getvalue(), os.path.basename(audio_file_path), start_time, end_time)
+        return output_file
 
     # Ensure output directory exists
     if not os.path.exists(output_directory):
         os.makedirs(output_directory)
 
-    # Generate file name in the required format
-    audio_name = os.path.basename(audio_file_path).split('.')[0]  # Strip file extension
-    output_file = os.path.join(output_directory, f"{start_time:.1f}_end_{end_time:.1f}_{audio_name}.mp3")
-
     # Export the segment as an MP3
     audio_segment.export(output_file, format='mp3')
 
@@ -48,75 +147,238 @@ def safe_str(v):
     return str(v)
 
 
-def generate_json_from_tsv(tsv_file_path, audio_input_directory,audio_output_directory):
+def load_task_entries(json_output_path, shard_dir=None):
+    """Read back previously generated tasks, from the shard manifest if sharded."""
+    manifest_path = os.path.join(shard_dir, "manifest.json") if shard_dir else None
+    if manifest_path and os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            shards = json.load(f)["shards"]
+        entries = []
+        for shard in shards:
+            path = os.path.join(shard_dir, shard["file"])
+            opener = gzip.open if path.endswith(".gz") else open
+            with opener(path, "rb") as f:
+                entries.extend(json.load(f))
+        return entries
+    if os.path.exists(json_output_path):
+        with open(json_output_path) as f:
+            return json.load(f)
+    return []
+
+
+class ClipOptions(NamedTuple):
+    """
+    How generate_json_from_tsv produces the word-task clips.
+
+    archive: a .zip or .tar path the clips are packed into instead of the
+        clips directory; in incremental mode the clips of carried-over tasks
+        are copied from the previous archive.
+    peaks: write waveform peaks for every clip into a peaks/ folder next to
+        the clips and reference them from each task as data["peaks"].
+    profiles: names from ENCODING_PROFILES (settings adjusted by
+        profile_overrides); every clip is encoded once per profile, the task
+        audio points at the first one and all are listed in
+        data["audio_variants"].
+    condition_cache: resample and loudness-normalize the recordings first
+        (see AudioConditioner, cached in that directory) and cut the clips
+        from the conditioned audio.
+    """
+    archive: Optional[str] = None
+    peaks: bool = False
+    profiles: Optional[Sequence[str]] = None
+    profile_overrides: Optional[Dict[str, Dict[str, Any]]] = None
+    condition_cache: Optional[str] = None
+
+
+def clip_url_path(path, audio_output_directory):
+    """URL path of a clip below the clips directory, whatever its trailing slash."""
+    return os.path.relpath(path, audio_output_directory).replace(os.sep, "/")
+
+
+def entry_clip_names(entry, base_url=None):
+    """Archive member names of the clip, its variants and its peak files that a task entry points at."""
+    data = entry["data"]
+    names = set()
+    for url in [data["audio"], *data.get("audio_variants", {}).values(), *data.get("peaks", {}).values()]:
+        path = strip_base_url(url, base_url)
+        if path.startswith(CLIPS_PATH):
+            names.add(path[len(CLIPS_PATH):])
+    return names
+
+
+def generate_json_from_tsv(tsv_file_path, audio_input_directory,audio_output_directory, audio_index_path=None,
+                           incremental=False, shard_dir=None, shard_by="__id__", max_tasks=1000, max_bytes=None,
+                           compress=False, ipa_dict_path='../raw_data/EnglishData.tsv', json_output_path=None,
+                           workers=None, story_registry=None, base_url=None, clip_options=None):
     """
     Reads a TSV file, extracts relevant data, and generates a JSON object with audio metadata and annotations.
+    With incremental=True, only tasks changed since the last word-task run
+    (see load_changed_task_ids) are re-clipped; entries for all other tasks
+    are carried over from the previous JSON output.
+    With shard_dir set, tasks are instead streamed into compact JSON shards
+    (see ShardWriter) grouped by the *shard_by* column, and the manifest path
+    is returned.
+    A TSV written with a story registry is joined back to its story fields
+    through story_registry; IPA hints are formatted once per distinct sentence.
+    Archiving, peaks, encoding profiles and audio conditioning are set through
+    clip_options (see ClipOptions). Clip URLs start with base_url (see
+    taskUrls.get_base_url) plus audio_clips/.
     """
-    df = pd.read_csv(tsv_file_path, sep='\t')
+    clip_options = clip_options or ClipOptions()
+    json_output_path = json_output_path or os.path.join("./../processed_data/", 'audio_segments_data.json')
+    df = load_sentence_labels(tsv_file_path)
+    registry = StoryRegistry(story_registry)
+    df = registry.join(df)
     json_data = []
-    ipa_dict = IpaDictionary('../raw_data/EnglishData.tsv')
-    # Process each row in the DataFrame
-    for index, row in tqdm(df.iterrows(), total=len(df)):
-        # Prepare data for the JSON entry
-        audio_name = row['audio']
-        audio_file_path = os.path.join(audio_input_directory, audio_name)
-        segment_path = generate_audio_segment(audio_file_path, row['start_time'], row['end_time'])
-
-        gold_standard = row['goldStandard'] if (row['goldStandard'] != "Other" or row["goldStandard"]is None) else ""
-
-        actual_audio = row['actual'] if (row['actual'] is not None and type(row['actual'])==str) else gold_standard
-
-        if type(gold_standard) != str or len(gold_standard) == 0:
-            continue
-            gold_standard = actual_audio
-            actual_audio=""
-
-
-
-        if(not row['nonchild']):
-            segment_path = segment_path[len(audio_output_directory):]
-            vocab = ipa_dict.get_vocab(gold_standard + " " + actual_audio)
-            table_str = ipa_dict.format_string_table(vocab)
-            data = {
-                "data": {
-                    # ---------- core -----------
-                    "original_audio_name": audio_name,
-                    "audio": f"https://2025storiza.michaelbennie.org/audio_clips/{segment_path}",
-                    "goldStandard": gold_standard,
-                    "actual": actual_audio,
-                    "start_time": row["start_time"],
-                    "end_time": row["end_time"],
-                    "segment_time": row["segment_time"],  # end − start
-                    "repeated": row["repeated"],
-                    "runon": row["runon"],
-                    "nonchild": row["nonchild"],
-                    "IPAHints": table_str,
-
-                    # ---------- extra metadata -----------
-                    "annotator_id": row["annotator_id"],
-                    "grade": safe_str(row["grade"]),
-                    "sound": safe_str(row["sound"]),
-                    "title": safe_str(row["title"]),
-                    "topic": safe_str(row["topic"]),
-                    "words": row["words"],
-                    "__id__": row["__id__"],
-                    "content": row["content"],
-                    "time": row["time"],
-                    "picture": row["picture"],
-                    "userId": row["userId"],
-                    "sentence_level_id":row["sentence_level_id"]
+    writer = None
+    if shard_dir:
+        # group rows so every shard covers one story/child
+        df = df.sort_values(shard_by, kind="stable")
+        writer = ShardWriter(shard_dir, max_tasks=max_tasks, max_bytes=max_bytes, compress=compress)
+
+    def emit(entry):
+        if writer is not None:
+            writer.add(entry, group=entry["data"].get(shard_by, ""))
+        else:
+            json_data.append(entry)
+
+    ipa_dict = IpaDictionary(ipa_dict_path)
+
+    audio_index = AudioIndex(audio_input_directory, audio_index_path)
+    audio_index.refresh()
+    invalid = validate_segment_times(df, audio_index)
+    if len(invalid):
+        print(f"⚠️  {len(invalid)} rows have times outside their recording:")
+        print(invalid.to_string(index=False))
+
+    previous_entries = {}
+    changed_ids = load_changed_task_ids(tsv_file_path) if incremental else None
+    if changed_ids is not None:
+        for entry in load_task_entries(json_output_path, shard_dir):
+            sentence_level_id = str(entry["data"]["sentence_level_id"])
+            if sentence_level_id not in changed_ids:
+                previous_entries.setdefault(sentence_level_id, []).append(entry)
+    reused = set()
+
+    conditioner = None
+    if clip_options.condition_cache:
+        conditioner = AudioConditioner(clip_options.condition_cache)
+        needed = df.loc[~df["sentence_level_id"].astype(str).isin(previous_entries), "audio"].unique()
+        print(conditioner.condition_all((os.path.join(audio_input_directory, a) for a in needed), workers))
+
+    archive = None
+    if clip_options.archive:
+        # carried-over tasks still point at their clips in the previous archive
+        carry_over = clip_options.archive if previous_entries and os.path.exists(clip_options.archive) else None
+        keep = set()
+        for sentence_level_id in set(df["sentence_level_id"].astype(str)) & previous_entries.keys():
+            for entry in previous_entries[sentence_level_id]:
+                keep |= entry_clip_names(entry, base_url)
+        archive = ClipArchive(clip_options.archive, carry_over=carry_over, keep=keep)
+    clip_base_url = clips_url(base_url)
+    profiles = (resolve_profiles(clip_options.profiles, clip_options.profile_overrides)
+                if clip_options.profiles else None)
+    encode_stats = EncodeStats() if profiles else None
+    try:
+        # Process each row in the DataFrame
+        for index, row in tqdm(df.iterrows(), total=len(df)):
+            sentence_level_id = str(row["sentence_level_id"])
+            if sentence_level_id in previous_entries:
+                if sentence_level_id not in reused:
+                    for entry in previous_entries[sentence_level_id]:
+                        emit(entry)
+                    reused.add(sentence_level_id)
+                continue
+
+            # Prepare data for the JSON entry
+            audio_name = row['audio']
+            audio_file_path = os.path.join(audio_input_directory, audio_name)
+            segment_path = generate_audio_segment(audio_file_path, row['start_time'], row['end_time'],
+                                                  output_directory=audio_output_directory, audio_index=audio_index,
+                                                  archive=archive, conditioner=conditioner,
+                                                  peaks_dir=os.path.join(audio_output_directory, "peaks") if clip_options.peaks else None,
+                                                  profiles=profiles, encode_stats=encode_stats)
+
+            gold_standard = row['goldStandard'] if (row['goldStandard'] != "Other" or row["goldStandard"]is None) else ""
+
+            actual_audio = row['actual'] if (row['actual'] is not None and type(row['actual'])==str) else gold_standard
+
+            if type(gold_standard) != str or len(gold_standard) == 0:
+                continue
+                gold_standard = actual_audio
+                actual_audio=""
+
+
+
+            if(not row['nonchild']):
+                segment_path = clip_url_path(segment_path, audio_output_directory)
+                table_str = registry.ipa_hints(gold_standard + " " + actual_audio, ipa_dict)
+                data = {
+                    "data": {
+                        # ---------- core -----------
+                        "original_audio_name": audio_name,
+                        "audio": clip_base_url + segment_path,
+                        "goldStandard": gold_standard,
+                        "actual": actual_audio,
+                        "start_time": row["start_time"],
+                        "end_time": row["end_time"],
+                        "segment_time": row["segment_time"],  # end − start
+                        "repeated": row["repeated"],
+                        "runon": row["runon"],
+                        "nonchild": row["nonchild"],
+                        "IPAHints": table_str,
+
+                        # ---------- extra metadata -----------
+                        "annotator_id": row["annotator_id"],
+                        "grade": safe_str(row["grade"]),
+                        "sound": safe_str(row["sound"]),
+                        "title": safe_str(row["title"]),
+                        "topic": safe_str(row["topic"]),
+                        "words": row["words"],
+                        "__id__": row["__id__"],
+                        "content": row["content"],
+                        "time": row["time"],
+                        "picture": row["picture"],
+                        "userId": row["userId"],
+                        "sentence_level_id":row["sentence_level_id"]
+                    }
                 }
-            }
 
-            json_data.append(data)
+                if clip_options.peaks:
+                    clip_stem = os.path.splitext(os.path.basename(segment_path))[0]
+                    data["data"]["peaks"] = peak_urls(clip_base_url + "peaks/",
+                                                      peak_file_names(clip_stem))
+                if profiles and len(profiles) > 1:
+                    clip_stem = os.path.splitext(os.path.basename(segment_path))[0]
+                    data["data"]["audio_variants"] = {
+                        name: clip_base_url + clip_url_path(path, audio_output_directory)
+                        for name, path in clip_paths(audio_output_directory, clip_stem, profiles).items()
+                    }
+
+                emit(data)
+    except BaseException:
+        # leave the previous archive in place instead of a half-written one
+        if archive is not None:
+            archive.discard()
+        raise
 
-    # Convert data to JSON string
-    json_output_path = os.path.join("./../processed_data/", 'audio_segments_data.json')
-    with open(json_output_path, 'w') as json_file:
-        json.dump(json_data, json_file, indent=4)
+    if archive is not None:
+        archive.close()
+    if encode_stats is not None:
+        print(encode_stats.report())
+    if writer is not None:
+        output_path = writer.close()
+    else:
+        # Convert data to JSON string
+        with open(json_output_path, 'w') as json_file:
+            json.dump(json_data, json_file, indent=4)
+        output_path = json_output_path
 
-    return json_output_path
+    # every pending change is now clipped
+    clear_changed_task_ids(tsv_file_path)
+    return output_path
 
 
 if __name__ == '__main__':
-    generate_json_from_tsv('../processed_data/sentenceLabels.tsv', '../raw_data/audio/','../processed_data/audio_clips/')
\ No newline at end of file
+    generate_json_from_tsv('../processed_data/sentenceLabels.tsv', '../raw_data/audio/','../processed_data/audio_clips/',
+                           '../processed_data/audio_index.tsv')
\ No newline at end of file
@@ -0,0 +1,101 @@
+import csv
+import glob
+import json
+import os
+from typing import Any, Dict, List, Tuple
+
+from data_preprocessing.exportStream import csv_delimiter, iter_csv_rows, iter_json_array
+
+
+def task_updated_at(task: Dict[str, Any]) -> str:
+    """Most recent annotation update of a task (ISO timestamps compare as strings)."""
+    stamps = [a.get("updated_at") or "" for a in task.get("annotations", [])]
+    return max(stamps, default="") or task.get("updated_at") or ""
+
+
+def _merge_json_exports(input_files: List[str], output_file: str) -> int:
+    # pass 1: id → (file, offset, length, updated_at); only the index stays in memory
+    index: Dict[Any, Tuple[int, int, int, str]] = {}
+    for file_idx, path in enumerate(input_files):
+        for offset, raw in iter_json_array(path):
+            task = json.loads(raw)
+            stamp = task_updated_at(task)
+            known = index.get(task.get("id"))
+            # later files win ties, so the newer snapshot is kept
+            if known is None or stamp >= known[3]:
+                index[task.get("id")] = (file_idx, offset, len(raw), stamp)
+
+    # pass 2: copy the winning tasks byte-for-byte, in first-seen order
+    handles = [open(path, "rb") for path in input_files]
+    try:
+        with open(output_file, "wb") as out:
+            out.write(b"[\n")
+            for n, (file_idx, offset, length, _) in enumerate(index.values()):
+                if n:
+                    out.write(b",\n")
+                handles[file_idx].seek(offset)
+                out.write(handles[file_idx].read(length))
+            out.write(b"\n]\n")
+    finally:
+        for handle in handles:
+            handle.close()
+    return len(index)
+
+
+def csv_row_key(row: Dict[str, str]) -> Tuple[str, str]:
+    """CSV exports have one row per annotation, so cross-annotations of a task are kept apart."""
+    return row["id"], row.get("annotation_id", "")
+
+
+def _merge_csv_exports(input_files: List[str], output_file: str) -> int:
+    index: Dict[Tuple[str, str], Tuple[int, int, str]] = {}
+    fieldnames: List[str] = []
+    delimiters = [csv_delimiter(path) for path in input_files]
+    for file_idx, path in enumerate(input_files):
+        for row_idx, row in enumerate(iter_csv_rows(path, delimiters[file_idx])):
+            if row_idx == 0:
+                fieldnames.extend(k for k in row if k not in fieldnames)
+            stamp = row.get("updated_at", "")
+            key = csv_row_key(row)
+            known = index.get(key)
+            if known is None or stamp >= known[2]:
+                index[key] = (file_idx, row_idx, stamp)
+
+    # the output keeps the delimiter of the first input
+    with open(output_file, "w", encoding="utf-8", newline="") as out:
+        writer = csv.DictWriter(out, fieldnames=fieldnames, restval="", delimiter=delimiters[0])
+        writer.writeheader()
+        for file_idx, path in enumerate(input_files):
+            for row_idx, row in enumerate(iter_csv_rows(path, delimiters[file_idx])):
+                if index[csv_row_key(row)][:2] == (file_idx, row_idx):
+                    writer.writerow(row)
+    return len({task_id for task_id, _ in index})
+
+
+def merge_exports(input_files: List[str], output_file: str) -> str:
+    """
+    Merge overlapping Label Studio exports into one, keeping for every task id
+    the copy with the most recently updated annotation. CSV exports have one
+    row per annotation and are deduplicated on (id, annotation_id) instead.
+
+    Inputs are streamed twice (index, then copy), so memory is bounded by the
+    id → location index rather than by the size of the exports. All inputs
+    must be either JSON or CSV; the output uses the same format.
+    """
+    kinds = {os.path.splitext(path)[1].lower() for path in input_files}
+    if kinds == {".json"}:
+        n_tasks = _merge_json_exports(input_files, output_file)
+    elif kinds == {".csv"}:
+        n_tasks = _merge_csv_exports(input_files, output_file)
+    else:
+        raise ValueError(f"Cannot merge a mix of export formats: {sorted(kinds)}")
+
+    print(f"Merged {len(input_files)} exports into {n_tasks} tasks → {output_file}")
+    return output_file
+
+
+if __name__ == "__main__":
+    merge_exports(
+        sorted(glob.glob("../annotationData/sentences/export_157513_project-157513-*.json")),
+        "../processed_data/merged_sentences_export.json",
+    )
@@ -1,9 +1,19 @@
+import glob
+import hashlib
 import json
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 import pandas as pd
 from typing import *
 
+from data_preprocessing.exportSchema import SENTENCE_SCHEMA, require_valid_export
+from data_preprocessing.exportStream import iter_export_tasks, iter_json_array, read_raw
+from data_preprocessing.mergeExports import merge_exports
+from data_preprocessing.sentenceTables import load_sentence_labels, save_sentence_labels
+from data_preprocessing.storyRegistry import STORY_FIELDS, StoryRegistry, story_id_for
+from data_preprocessing.taskUrls import strip_base_url
+
 
 def strip_quotes(s: str) -> str:
     """Normalise straight/curly quotes and trim."""
@@ -105,145 +115,349 @@ def correctly_split_errors(
 
 
 
-def convert_sentences_to_tsv(input_file: str, output_file: str,error_map_file: str,split_map_file:str ):
-    """Convert Label‑Studio sentence annotations to a TSV covering ALL tasks."""
-    url_prefix = "https://2025storiza.michaelbennie.org/"
+def convert_task(task: Dict[str, Any], error_map: Dict[str, Any], split_map: Dict[str, Any],
+                 validated: bool = False, registry: Optional[StoryRegistry] = None) -> List[Dict[str, Any]]:
+    """
+    Convert one Label‑Studio task into its sorted, error-corrected sentence rows.
 
-    with open(input_file, "r", encoding="utf‑8") as f:
-        data = json.load(f)
+    Unless the export already passed exportSchema validation (*validated*),
+    every result is checked first and malformed ones are skipped with a warning.
+    Tasks built with a story registry carry only a story_id; their story
+    fields are then looked up in *registry*.
+    """
+    task_data = task.get("data", {})
+    story_id = task_data.get("story_id") or (story_id_for(task_data["content"]) if task_data.get("content") else "")
+    story = registry.get(story_id) if registry is not None and story_id else None
+    if story is not None and "content" not in task_data:
+        task_data = {**{field: story[field] for field in STORY_FIELDS}, **task_data}
+    sentence_level_id=str(task.get("id", ""))
+    audio_full = task_data.get("audio", "")
+    audio = strip_base_url(audio_full)
+
+    # Skip tasks without annotations
+    if not task.get("annotations"):
+        return []
+
+    annot = task["annotations"][0]  # keep the first completed annotation
+    annotator_id = annot.get("completed_by", {}).get("id", "")
+    results = annot.get("result") or []
+    if len(task["annotations"])>1:
+            print("multiple annotations found!!!",sentence_level_id)
+
+    current = None
+    region_id = None
+    task_sentences = []
+
+
+    for ann in results:
+        if not validated:
+            problem = SENTENCE_SCHEMA.check_result(ann, region_id)
+            if problem:
+                print(f"⚠️  Task {sentence_level_id}: skipping result {ann.get('id') if isinstance(ann, dict) else ann!r}: {problem}")
+                continue
 
-    error_map: Dict[str, Any] = json.loads(Path(error_map_file).read_text(encoding="utf-8"))
-    split_map: Dict[str, Any] = json.loads(Path(split_map_file).read_text(encoding="utf-8"))
+        a_type = ann["type"]
+        a_val = ann["value"]
+
+        # ── new sentence ──────────────────────────────────────────
+        if a_type == "labels" and ann["from_name"] == "SentenceLabel":
+            # flush previous
+            if current and current["goldStandard"] not in ["", "Other", "Other"]:
+                if current["start_time"] is not None and current["end_time"] is not None:
+                    current["segment_time"] = current["end_time"] - current["start_time"]
+
+                current["goldStandard"] = strip_quotes(current["goldStandard"].strip())
+
+                task_sentences.append(current)
+
+            region_id = ann.get("id")
+            start, end = a_val.get("start"), a_val.get("end")
+            current = {
+                # sentence-level
+                "sentence_level_id": sentence_level_id,
+                "audio": audio,
+                "start_time": start,
+                "end_time": end,
+                "goldStandard": "",
+                "actual": "",
+                "repeated": False,
+                "runon": False,
+                "nonchild": False,
+                # task-level
+                "annotator_id": annotator_id,
+                "grade": task_data.get("grade", ""),
+                "sound": task_data.get("sound", ""),
+                "title": task_data.get("title", ""),
+                "topic": task_data.get("topic", ""),
+                "words": task_data.get("words", ""),
+                "__id__": task_data.get("__id__", ""),
+                "story_id": story_id,
+                "content": task_data.get("content", ""),
+                "time": task_data.get("time", ""),
+                "picture": task_data.get("picture", ""),
+                "userId": task_data.get(
+                    "userId (matches the uid in the recording file name)", ""
+                ),
+                # calculated later
+                "segment_time": "",
+            }
+
+        # ── gold-standard text ───────────────────────────────────
+        elif a_type == "choices" and ann["from_name"] == "SentenceSelect":
+            current["goldStandard"] = a_val["choices"][0]
+
+        # ── child’s production ───────────────────────────────────
+        elif a_type == "textarea" and ann["from_name"] == "Sentence":
+            current["actual"] = a_val["text"][0]
+
+        # ── sentence flags ───────────────────────────────────────
+        elif a_type == "choices" and ann["from_name"] == "sentenceIssues":
+            issues = set(a_val["choices"])
+            current["repeated"] = "repeated" in issues
+            current["runon"] = "runon" in issues
+            current["nonchild"] = "Not" in issues
+
+    # flush last sentence of the task
+    if current and current["goldStandard"] not in ["", "Other", "Other"]:
+        if current["start_time"] is not None and current["end_time"] is not None:
+            current["segment_time"] = current["end_time"] - current["start_time"]
+        current["goldStandard"] = strip_quotes(current["goldStandard"].strip())
+        task_sentences.append(current)
+
+    # ── NEW: sort and extend rows ───────────────────────────────────
+    task_sentences.sort(
+        key=lambda s: (
+            s["start_time"] is None,        # None goes last
+            s["start_time"] if s["start_time"] is not None else 0
+        )
+    )
 
-    rows: List[Dict[str, Any]] = []
+    # 1️⃣ merge 6b “join pairs”
+    task_sentences = combine_error_pairs(task_sentences, error_map.get(sentence_level_id))
 
+    # 2️⃣ split 5-error “over-combined” sentences
+    task_sentences = correctly_split_errors(task_sentences, split_map.get(sentence_level_id))
 
+    return task_sentences
 
 
-    for task in data:
-        task_data = task.get("data", {})
-        sentence_level_id=str(task.get("id", ""))
-        audio_full = task_data.get("audio", "")
-        audio = (
-            audio_full[len(url_prefix) :]
-            if audio_full.startswith(url_prefix)
-            else audio_full
-        )
+def task_fingerprint(task: Dict[str, Any], error_map: Dict[str, Any], split_map: Dict[str, Any]) -> str:
+    """
+    Hash everything that determines a task's TSV rows: its annotations
+    (id, updated_at, result) and its entries in the error/split maps.
+    """
+    sentence_level_id = str(task.get("id", ""))
+    payload = [
+        task.get("data", {}).get("audio", ""),
+        [[a.get("id"), a.get("updated_at"), a.get("result")] for a in task.get("annotations", [])],
+        error_map.get(sentence_level_id),
+        split_map.get(sentence_level_id),
+    ]
+    return hashlib.sha1(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
 
-        # Skip tasks without annotations
-        if not task.get("annotations"):
-            continue
 
-        annot = task["annotations"][0]  # keep the first completed annotation
-        annotator_id = annot.get("completed_by", {}).get("id", "")
-        results = annot["result"]
-        if len(task["annotations"])>1:
-                print("multiple annotations found!!!",sentence_level_id)
-
-
-
-
-        current = None
-        task_sentences = []
-
-
-        for ann in results:
-            a_type = ann["type"]
-            a_val = ann["value"]
-
-            # ── new sentence ──────────────────────────────────────────
-            if a_type == "labels" and ann["from_name"] == "SentenceLabel":
-                # flush previous
-                if current and current["goldStandard"] not in ["", "Other", "Other"]:
-                    if current["start_time"] is not None and current["end_time"] is not None:
-                        current["segment_time"] = current["end_time"] - current["start_time"]
-
-                    current["goldStandard"] = strip_quotes(current["goldStandard"].strip())
-
-                    task_sentences.append(current)
-
-                start, end = a_val.get("start"), a_val.get("end")
-                current = {
-                    # sentence-level
-                    "sentence_level_id": sentence_level_id,
-                    "audio": audio,
-                    "start_time": start,
-                    "end_time": end,
-                    "goldStandard": "",
-                    "actual": "",
-                    "repeated": False,
-                    "runon": False,
-                    "nonchild": False,
-                    # task-level
-                    "annotator_id": annotator_id,
-                    "grade": task_data.get("grade", ""),
-                    "sound": task_data.get("sound", ""),
-                    "title": task_data.get("title", ""),
-                    "topic": task_data.get("topic", ""),
-                    "words": task_data.get("words", ""),
-                    "__id__": task_data.get("__id__", ""),
-                    "content": task_data.get("content", ""),
-                    "time": task_data.get("time", ""),
-                    "picture": task_data.get("picture", ""),
-                    "userId": task_data.get(
-                        "userId (matches the uid in the recording file name)", ""
-                    ),
-                    # calculated later
-                    "segment_time": "",
-                }
-
-            # ── gold-standard text ───────────────────────────────────
-            elif a_type == "choices" and ann["from_name"] == "SentenceSelect":
-                current["goldStandard"] = a_val["choices"][0]
-
-            # ── child’s production ───────────────────────────────────
-            elif a_type == "textarea" and ann["from_name"] == "Sentence":
-                current["actual"] = a_val["text"][0]
-
-            # ── sentence flags ───────────────────────────────────────
-            elif a_type == "choices" and ann["from_name"] == "sentenceIssues":
-                issues = set(a_val["choices"])
-                current["repeated"] = "repeated" in issues
-                current["runon"] = "runon" in issues
-                current["nonchild"] = "Not" in issues
-
-        # flush last sentence of the task
-        if current and current["goldStandard"] not in ["", "Other", "Other"]:
-            if current["start_time"] is not None and current["end_time"] is not None:
-                current["segment_time"] = current["end_time"] - current["start_time"]
-            current["goldStandard"] = strip_quotes(current["goldStandard"].strip())
-            task_sentences.append(current)
-
-        # ── NEW: sort and extend rows ───────────────────────────────────
-        task_sentences.sort(
-            key=lambda s: (
-                s["start_time"] is None,        # None goes last
-                s["start_time"] if s["start_time"] is not None else 0
-            )
-        )
+def fingerprint_path(output_file: str) -> Path:
+    return Path(str(output_file) + ".fingerprints.json")
 
 
+def load_changed_task_ids(output_file: str) -> Optional[Set[str]]:
+    """
+    Task ids changed since word tasks were last generated from the TSV (every
+    convert run and region fix adds to this set), or None if unknown.
+    """
+    path = fingerprint_path(output_file)
+    if not path.exists():
+        return None
+    return set(json.loads(path.read_text(encoding="utf-8")).get("changed", []))
+
+
+def mark_tasks_changed(output_file: str, task_ids: Iterable[str]) -> None:
+    """Add *task_ids* to the pending changed set of a converted TSV, if it has one."""
+    path = fingerprint_path(output_file)
+    if not path.exists():
+        return
+    state = json.loads(path.read_text(encoding="utf-8"))
+    state["changed"] = sorted(set(state.get("changed", [])) | set(task_ids))
+    path.write_text(json.dumps(state), encoding="utf-8")
+
+
+def clear_changed_task_ids(output_file: str) -> None:
+    """Empty the pending changed set once word tasks have been generated from the TSV."""
+    path = fingerprint_path(output_file)
+    if not path.exists():
+        return
+    state = json.loads(path.read_text(encoding="utf-8"))
+    state["changed"] = []
+    path.write_text(json.dumps(state), encoding="utf-8")
+
+
+# (sentence_level_id, fingerprint, story fields or None, rows or None when unchanged)
+TaskResult = Tuple[str, str, Optional[Dict[str, Any]], Optional[List[Dict[str, Any]]]]
+
+
+def convert_or_reuse(task: Dict[str, Any], error_map: Dict[str, Any], split_map: Dict[str, Any],
+                     previous_fingerprints: Dict[str, str], validated: bool = False,
+                     registry: Optional[StoryRegistry] = None) -> TaskResult:
+    """Fingerprint one task and convert it unless the previous run already has its rows."""
+    sentence_level_id = str(task.get("id", ""))
+    task_data = task.get("data", {})
+    story = {field: task_data[field] for field in STORY_FIELDS if field in task_data} if task_data.get("content") else None
+    fingerprint = task_fingerprint(task, error_map, split_map)
+    if previous_fingerprints.get(sentence_level_id) == fingerprint:
+        return sentence_level_id, fingerprint, story, None
+    return sentence_level_id, fingerprint, story, convert_task(task, error_map, split_map, validated, registry)
+
+
+# ── parallel conversion over task shards ───────────────────────────────
+_shard_state: Dict[str, Any] = {}
+
+
+def _init_shard_worker(error_map: Dict[str, Any], split_map: Dict[str, Any], previous_fingerprints: Dict[str, str],
+                       validated: bool, story_registry: Optional[str]) -> None:
+    _shard_state.update(
+        error_map=error_map,
+        split_map=split_map,
+        previous_fingerprints=previous_fingerprints,
+        validated=validated,
+        registry=StoryRegistry(story_registry) if story_registry else None,
+    )
 
 
-        if str(sentence_level_id)=='188964307' or True:
+def _convert_shard(job: Tuple[str, List[Tuple[int, int]]]) -> List[TaskResult]:
+    input_file, spans = job
+    start = spans[0][0]
+    raw = read_raw(input_file, start, spans[-1][0] + spans[-1][1] - start)
+    return [
+        convert_or_reuse(json.loads(raw[offset - start:offset - start + length]), _shard_state["error_map"],
+                         _shard_state["split_map"], _shard_state["previous_fingerprints"],
+                         _shard_state["validated"], _shard_state["registry"])
+        for offset, length in spans
+    ]
+
+
+def iter_task_spans(input_file: str, shard_size: int) -> Iterator[List[Tuple[int, int]]]:
+    """(offset, length) of every task in the export, in runs of *shard_size* consecutive tasks."""
+    spans: List[Tuple[int, int]] = []
+    for offset, raw in iter_json_array(input_file):
+        spans.append((offset, len(raw)))
+        if len(spans) == shard_size:
+            yield spans
+            spans = []
+    if spans:
+        yield spans
+
+
+def convert_task_shards(input_file: str, error_map: Dict[str, Any], split_map: Dict[str, Any],
+                        previous_fingerprints: Dict[str, str], validated: bool = False,
+                        story_registry: Optional[str] = None, workers: Optional[int] = None,
+                        shard_size: int = 200) -> Iterator[TaskResult]:
+    """
+    Convert the export in a process pool, one run of consecutive tasks per
+    job. Only byte offsets are scanned here; each worker reads its shard back
+    with one read and converts it, error maps included. Results come back in
+    the original task order.
+    """
+    jobs = ((input_file, spans) for spans in iter_task_spans(input_file, shard_size))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_shard_worker,
+                             initargs=(error_map, split_map, previous_fingerprints, validated, story_registry)) as pool:
+        for results in pool.map(_convert_shard, jobs):
+            yield from results
+
+
+def convert_sentences_to_tsv(input_file: str, output_file: str,error_map_file: str,split_map_file:str,
+                             incremental: bool = False, validate: bool = True,
+                             story_registry: Optional[str] = None, normalized: bool = False,
+                             workers: Optional[int] = None, shard_size: int = 200) -> List[str]:
+    """
+    Convert Label‑Studio sentence annotations to a TSV covering ALL tasks.
+
+    With *incremental*, per-task fingerprints from the previous run (stored
+    next to *output_file*) are compared and only new or changed tasks are
+    re-converted; rows of unchanged tasks are copied from the previous TSV.
+    Returns the ids of the tasks that were (re-)converted; they are also
+    added to the pending changed set the next incremental word-task run
+    re-clips (see load_changed_task_ids).
+
+    With *validate* the whole export is first checked against the sentence
+    schema in one streaming pass, failing with every violation listed before
+    anything is written; tasks are then converted without per-result checks.
+
+    With *story_registry* (a StoryRegistry JSON path) the story fields are
+    written once per story to the registry instead of on every row; rows
+    keep the story_id.
 
+    With *normalized* the output is a slim sentence table plus a task table
+    (see sentenceTables), read back as logical rows by load_sentence_labels.
 
-            # 1️⃣ merge 6b “join pairs”
-            task_sentences = combine_error_pairs(task_sentences, error_map.get(sentence_level_id))
+    With *workers* > 1 the tasks are converted in a process pool, in shards
+    of *shard_size* consecutive tasks (see convert_task_shards); the output
+    is identical to a serial run.
+    """
+    registry = StoryRegistry(story_registry) if story_registry else None
+    if validate:
+        require_valid_export(input_file, first_annotation_only=True)  # convert_task reads only the first
+
+    error_map: Dict[str, Any] = json.loads(Path(error_map_file).read_text(encoding="utf-8"))
+    split_map: Dict[str, Any] = json.loads(Path(split_map_file).read_text(encoding="utf-8"))
 
-            # 2️⃣ split 5-error “over-combined” sentences
-            task_sentences = correctly_split_errors(task_sentences, split_map.get(sentence_level_id))
+    previous_fingerprints: Dict[str, str] = {}
+    previous_rows: Dict[str, List[Dict[str, Any]]] = {}
+    pending: Set[str] = set()
+    fp_path = fingerprint_path(output_file)
+    if incremental and fp_path.exists() and Path(output_file).exists():
+        previous_state = json.loads(fp_path.read_text(encoding="utf-8"))
+        previous_fingerprints = previous_state["fingerprints"]
+        # changes not yet consumed by a word-task run stay pending
+        pending = set(previous_state.get("changed", []))
+        previous = load_sentence_labels(output_file, as_str=True)
+        for record in previous.to_dict("records"):
+            previous_rows.setdefault(record["sentence_level_id"], []).append(record)
 
-            rows.extend(task_sentences)
+    rows: List[Dict[str, Any]] = []
+    fingerprints: Dict[str, str] = {}
+    changed: List[str] = []
+
+    if workers is not None and workers > 1:
+        results = convert_task_shards(input_file, error_map, split_map, previous_fingerprints, validate,
+                                      story_registry, workers, shard_size)
+    else:
+        results = (convert_or_reuse(task, error_map, split_map, previous_fingerprints, validate, registry)
+                   for task in iter_export_tasks(input_file))
+
+    for sentence_level_id, fingerprint, story, task_rows in results:
+        if registry is not None and story is not None:
+            registry.add(story)
+        fingerprints[sentence_level_id] = fingerprint
+
+        if task_rows is None:
+            rows.extend(previous_rows.get(sentence_level_id, []))
+            continue
 
+        changed.append(sentence_level_id)
+        rows.extend(task_rows)
 
     # save TSV
-    pd.DataFrame(rows).to_csv(output_file, sep="\t", index=False)
+    table = pd.DataFrame(rows)
+    if registry is not None:
+        table = table.drop(columns=STORY_FIELDS, errors="ignore")
+        registry.save()
+    save_sentence_labels(table, output_file, normalized)
+
+    pending = sorted((pending | set(changed)) & set(fingerprints))
+    fp_path.write_text(json.dumps({"fingerprints": fingerprints, "changed": pending}), encoding="utf-8")
+    if incremental:
+        print(f"Re-converted {len(changed)}/{len(fingerprints)} tasks")
+    return changed
 
 
 if __name__ == "__main__":
+    # consolidate every snapshot of the project, newest annotation per task wins
+    merge_exports(
+        sorted(glob.glob("../annotationData/sentences/export_157513_project-157513-*.json")),
+        "../processed_data/merged_sentences_export.json",
+    )
     convert_sentences_to_tsv(
-        "../annotationData/sentences/export_157513_project-157513-at-2025-07-08-04-28-a6ff5f03.json",
+        "../processed_data/merged_sentences_export.json",
         "../processed_data/sentenceLabels.tsv",
         "../ErrorData/6b_errors.json",
                 "../ErrorData/5_errors.json",
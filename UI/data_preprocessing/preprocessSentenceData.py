@@ -3,83 +3,114 @@ import json
 import pandas as pd
 import re
 
-# Paths
-audio_dir = "../raw_data/audio"
-xlsx_path = "../raw_data/Filtered_Story_Data_-_Missing_Files_Only.csv"
-base_url = "https://2025storiza.michaelbennie.org/"
+from data_preprocessing.storyRegistry import STORY_FIELDS, StoryRegistry
+from data_preprocessing.taskUrls import get_base_url
+from data_preprocessing.waveformPeaks import compute_recording_peaks, peak_urls
 
-# Read Excel data
-df = pd.read_csv(xlsx_path)
 
-# Prepare output list
-label_studio_tasks = []
+def build_sentence_tasks(audio_dir, xlsx_path, output_path, base_url=None,
+                         registry_path=None, peaks_dir=None, workers=None):
+    """
+    Build one Label Studio sentence-segmentation task per recording in audio_dir,
+    joined to its story row in the metadata CSV, and save them as JSON.
+    Sentence splitting is done once per distinct story (see StoryRegistry).
+    With registry_path, the story fields are saved once per story in that
+    file and tasks keep only the story_id and the text the labeling
+    interface displays.
+    URLs start with base_url (see get_base_url).
+    With peaks_dir (a folder inside audio_dir, served at the same relative
+    path under base_url), waveform peaks are precomputed for every recording
+    that becomes a task and referenced as data["peaks"].
+    """
+    base_url = get_base_url(base_url)
+    if peaks_dir:
+        peaks_path = os.path.relpath(peaks_dir, audio_dir)
+        if peaks_path == os.pardir or peaks_path.startswith(os.pardir + os.sep):
+            # only files below audio_dir are served under base_url
+            raise ValueError(f"peaks_dir must be inside audio_dir ({audio_dir}), got {peaks_dir}")
+        peaks_url = base_url if peaks_path == os.curdir else base_url + peaks_path.replace(os.sep, "/") + "/"
+    registry = StoryRegistry(registry_path)
 
-# List all wav files in the audio directory
-audio_files = [f for f in os.listdir(audio_dir) if f.endswith('.wav')]
+    # Read Excel data
+    df = pd.read_csv(xlsx_path)
 
-# Process each audio file
-for audio_file in audio_files:
-    # Extract userId and __id__ from filename
-    match = re.match(r"uid_(.*?)_sid_(.*?)_(.*?)\.wav", audio_file)
-    if not match:
-        continue
-    user_id, audio_id, _ = match.groups()
+    # Prepare output list
+    label_studio_tasks = []
+    task_by_audio = {}
 
-    # Find matching row in Excel (column names assumed from your description)
-    row = df[(df['userId (matches the uid in the recording file name)'] == user_id) & (df['__id__'] == audio_id)]
-    if row.empty:
-        continue
-    row = row.iloc[0]
+    # List all wav files in the audio directory
+    audio_files = [f for f in os.listdir(audio_dir) if f.endswith('.wav')]
 
-    # Extract and process text content
-    content = row['content']
-    sentences = re.split(r'([.?!]["\']?\s+)(?=[A-Z])', content.strip())
+    # Process each audio file
+    for audio_file in audio_files:
+        # Extract userId and __id__ from filename
+        match = re.match(r"uid_(.*?)_sid_(.*?)_(.*?)\.wav", audio_file)
+        if not match:
+            continue
+        user_id, audio_id, _ = match.groups()
 
-    # Recombine the split pattern chunks
-    combined = []
-    for i in range(0, len(sentences), 2):
-        chunk = sentences[i]
-        if i + 1 < len(sentences):
-            chunk += sentences[i + 1]
-        combined.append(chunk.strip())
+        # Find matching row in Excel (column names assumed from your description)
+        row = df[(df['userId (matches the uid in the recording file name)'] == user_id) & (df['__id__'] == audio_id)]
+        if row.empty:
+            continue
+        row = row.iloc[0]
 
-    sentences = [s for s in combined if s]
-    # Format gold standard text
-    gold_standard_text = "\n".join([f"{i + 1}. {s}" for i, s in enumerate(sentences)])
+        # Sentence split, gold standard text and possibleSentences, once per story
+        story_id = registry.add(row)
+        story = registry.get(story_id)
 
-    # Create possibleSentences list
-    possible_sentences = [{"value": s} for s in sentences]
-    possible_sentences.append({"value": "Other", "hint":"The child did not produce any of the above sentences. If there are only minor differences between the produced and target sentence, do not choose this option."})
-
-    # Create task entry
-    task = {
-        "data": {
-            "audio": base_url + audio_file,
-            "goldStandardText": gold_standard_text,
-            "possibleSentences": possible_sentences,
-            "grade": row.get("grade", ""),
-            "sound": row.get("sound", ""),
-            "title": row.get("title", ""),
-            "topic": row.get("topic", ""),
-            "words": row.get("words", ""),
-            "__id__": row.get("__id__", ""),
-            "content": row.get("content", ""),
-            "time": row.get("time", ""),
-            "picture": row.get("picture", ""),
-            "userId (matches the uid in the recording file name)": row.get(
-                "userId (matches the uid in the recording file name)", ""),
-            "matching_file": row.get("matching_file", "")
+        # Create task entry
+        task = {
+            "data": {
+                "audio": base_url + audio_file,
+                "goldStandardText": story["goldStandardText"],
+                "possibleSentences": story["possibleSentences"],
+                "grade": row.get("grade", ""),
+                "sound": row.get("sound", ""),
+                "title": row.get("title", ""),
+                "topic": row.get("topic", ""),
+                "words": row.get("words", ""),
+                "__id__": row.get("__id__", ""),
+                "content": row.get("content", ""),
+                "time": row.get("time", ""),
+                "picture": row.get("picture", ""),
+                "userId (matches the uid in the recording file name)": row.get(
+                    "userId (matches the uid in the recording file name)", ""),
+                "matching_file": row.get("matching_file", ""),
+                "story_id": story_id,
+            }
         }
-    }
-    if type(row.get("matching_file"))!= str:
-        print("AAAAAA")
-    else:
-        label_studio_tasks.append(task)
+        if registry_path:
+            for field in STORY_FIELDS:
+                del task["data"][field]
+        if type(row.get("matching_file"))!= str:
+            print("AAAAAA")
+        else:
+            label_studio_tasks.append(task)
+            task_by_audio[audio_file] = task
+
+    if peaks_dir:
+        # only for the recordings that became tasks
+        peak_names = compute_recording_peaks([os.path.join(audio_dir, f) for f in task_by_audio], peaks_dir,
+                                             workers=workers)
+        for audio_file, names in peak_names.items():
+            task_by_audio[audio_file]["data"]["peaks"] = peak_urls(peaks_url, names)
+
+    # Save to JSON
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    with open(output_path, "w") as f:
+        json.dump(label_studio_tasks, f, indent=2)
+
+    if registry_path:
+        registry.save()
+    print(f"Saved {len(label_studio_tasks)} tasks ({len(registry.stories)} stories) to {output_path}")
+    return output_path
 
-# Save to JSON
-output_path = "../processed_data/label_studio_audio_tasks.json"
-os.makedirs(os.path.dirname(output_path), exist_ok=True)
-with open(output_path, "w") as f:
-    json.dump(label_studio_tasks, f, indent=2)
 
-print(f"Saved {len(label_studio_tasks)} tasks to {output_path}")
+if __name__ == "__main__":
+    # Paths
+    build_sentence_tasks(
+        "../raw_data/audio",
+        "../raw_data/Filtered_Story_Data_-_Missing_Files_Only.csv",
+        "../processed_data/label_studio_audio_tasks.json",
+    )
@@ -0,0 +1,91 @@
+import csv
+import os
+from typing import Any, Dict, Iterator, List, Optional
+
+import pandas as pd
+
+# column order of a logical sentenceLabels row (see convert_task)
+LOGICAL_COLUMNS = [
+    "sentence_level_id", "audio", "start_time", "end_time", "goldStandard", "actual", "repeated", "runon",
+    "nonchild", "annotator_id", "grade", "sound", "title", "topic", "words", "__id__", "story_id", "content",
+    "time", "picture", "userId", "segment_time",
+]
+# fields that are the same for every sentence of a task
+TASK_LEVEL_COLUMNS = [
+    "audio", "annotator_id", "grade", "sound", "title", "topic", "words", "__id__", "story_id",
+    "content", "time", "picture", "userId",
+]
+# repeated strings loaded as categoricals, in flat and normalized layouts alike
+CATEGORICAL_COLUMNS = [
+    "audio", "grade", "sound", "title", "topic", "__id__", "story_id", "content", "time", "picture", "userId",
+]
+
+
+def task_table_path(sentence_file: str) -> str:
+    """Task table written next to a normalized sentence table, e.g. sentenceLabels.tasks.tsv."""
+    root, ext = os.path.splitext(str(sentence_file))
+    return f"{root}.tasks{ext}"
+
+
+def is_normalized(sentence_file: str) -> bool:
+    return os.path.exists(task_table_path(sentence_file))
+
+
+def save_sentence_labels(table: pd.DataFrame, output_file: str, normalized: bool = False) -> None:
+    """
+    Write logical sentence rows either as one flat TSV or, with *normalized*,
+    as a slim sentence table plus one row per task in task_table_path().
+    """
+    task_path = task_table_path(output_file)
+    if not normalized:
+        table.to_csv(output_file, sep="\t", index=False)
+        if os.path.exists(task_path):
+            os.remove(task_path)
+        return
+
+    task_columns = [c for c in TASK_LEVEL_COLUMNS if c in table.columns]
+    tasks = table[["sentence_level_id"] + task_columns].drop_duplicates("sentence_level_id")
+    tasks.to_csv(task_path, sep="\t", index=False)
+    table.drop(columns=task_columns).to_csv(output_file, sep="\t", index=False)
+
+
+def load_sentence_labels(sentence_file: str, columns: Optional[List[str]] = None,
+                         as_str: bool = False) -> pd.DataFrame:
+    """
+    Read sentenceLabels in either layout as logical rows. Repeated string
+    columns come back as categoricals; for a normalized pair only the task
+    columns in *columns* (all by default) are joined onto the sentence rows.
+    With *as_str* every value is read as a string, blanks kept as "".
+    """
+    read_kwargs = {"dtype": str, "keep_default_na": False} if as_str else {}
+    df = pd.read_csv(sentence_file, sep="\t", **read_kwargs)
+
+    task_path = task_table_path(sentence_file)
+    if os.path.exists(task_path):
+        wanted = [c for c in (columns if columns is not None else TASK_LEVEL_COLUMNS)
+                  if c in TASK_LEVEL_COLUMNS and c not in df.columns]
+        if wanted:
+            header = pd.read_csv(task_path, sep="\t", nrows=0).columns
+            usecols = ["sentence_level_id"] + [c for c in wanted if c in header]
+            tasks = pd.read_csv(task_path, sep="\t", usecols=usecols, **read_kwargs)
+            if not as_str:
+                tasks = tasks.astype({c: "category" for c in CATEGORICAL_COLUMNS if c in tasks.columns})
+            df = df.join(tasks.set_index("sentence_level_id"), on="sentence_level_id")
+            df = df[[c for c in LOGICAL_COLUMNS if c in df.columns] + [c for c in df.columns if c not in LOGICAL_COLUMNS]]
+
+    if not as_str:
+        df = df.astype({c: "category" for c in CATEGORICAL_COLUMNS
+                        if c in df.columns and df[c].dtype != "category"})
+    return df
+
+
+def iter_sentence_records(sentence_file: str) -> Iterator[Dict[str, Any]]:
+    """Stream logical rows as string dicts with the standard library, joining the task table if present."""
+    task_path = task_table_path(sentence_file)
+    tasks: Dict[str, Dict[str, str]] = {}
+    if os.path.exists(task_path):
+        with open(task_path, "r", encoding="utf-8", newline="") as f:
+            tasks = {row["sentence_level_id"]: row for row in csv.DictReader(f, delimiter="\t")}
+    with open(sentence_file, "r", encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f, delimiter="\t"):
+            yield {**tasks.get(row["sentence_level_id"], {}), **row}
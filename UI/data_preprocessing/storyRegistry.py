@@ -0,0 +1,91 @@
+import hashlib
+import json
+import os
+import re
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+# story-level fields that tasks and sentence rows reference through story_id
+STORY_FIELDS = ["content", "title", "topic", "words", "picture", "sound"]
+
+OTHER_SENTENCE = {"value": "Other", "hint": "The child did not produce any of the above sentences. If there are only minor differences between the produced and target sentence, do not choose this option."}
+
+
+def story_id_for(content: str) -> str:
+    return hashlib.sha1(str(content).strip().encode("utf-8")).hexdigest()[:16]
+
+
+def split_sentences(content: str) -> List[str]:
+    """Split story text after ., ? or ! (optionally quoted) followed by a capital."""
+    sentences = re.split(r'([.?!]["\']?\s+)(?=[A-Z])', content.strip())
+
+    # Recombine the split pattern chunks
+    combined = []
+    for i in range(0, len(sentences), 2):
+        chunk = sentences[i]
+        if i + 1 < len(sentences):
+            chunk += sentences[i + 1]
+        combined.append(chunk.strip())
+    return [s for s in combined if s]
+
+
+class StoryRegistry:
+    """
+    One entry per distinct story text, keyed by a hash of its content, holding
+    the story fields plus everything derived from the text (sentence split,
+    goldStandardText, possibleSentences). Each is computed once however many
+    children read the story; tasks and sentence rows carry only the story_id.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.stories: Dict[str, Dict[str, Any]] = {}
+        self._hints: Dict[str, str] = {}
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.stories = json.load(f)["stories"]
+
+    def add(self, fields: Dict[str, Any]) -> str:
+        """Register the story in *fields* (needs "content") if new; returns its story_id."""
+        story_id = story_id_for(fields["content"])
+        if story_id not in self.stories:
+            sentences = split_sentences(str(fields["content"]))
+            story = {}
+            for field in STORY_FIELDS:
+                value = fields.get(field, "")
+                # NumPy scalars from a pandas row are not JSON-serializable
+                story[field] = value.item() if hasattr(value, "item") else value
+            story["sentences"] = sentences
+            story["goldStandardText"] = "\n".join([f"{i + 1}. {s}" for i, s in enumerate(sentences)])
+            story["possibleSentences"] = [{"value": s} for s in sentences] + [OTHER_SENTENCE]
+            self.stories[story_id] = story
+        return story_id
+
+    def get(self, story_id: str) -> Optional[Dict[str, Any]]:
+        return self.stories.get(story_id)
+
+    def ipa_hints(self, text: str, ipa_dict) -> str:
+        """IPA hint table for a sentence, formatted once per distinct text."""
+        if text not in self._hints:
+            self._hints[text] = ipa_dict.format_string_table(ipa_dict.get_vocab(text))
+        return self._hints[text]
+
+    def join(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Add the STORY_FIELDS columns a compact table left out, matched on story_id."""
+        missing = [field for field in STORY_FIELDS if field not in df.columns]
+        if not missing or "story_id" not in df.columns:
+            return df
+        if not self.stories:
+            source = f"Story registry {self.path} is empty or missing" if self.path else "No story registry given"
+            raise ValueError(f"{source}, but the table carries only story_id and lacks {', '.join(missing)}; "
+                             "pass the registry it was written with (--story-registry)")
+        stories = pd.DataFrame.from_dict(self.stories, orient="index")[missing]
+        return df.join(stories, on="story_id")
+
+    def save(self, path: Optional[str] = None) -> None:
+        path = path or self.path
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"stories": self.stories}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)  # a failed save must not truncate the registry
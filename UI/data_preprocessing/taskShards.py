@@ -0,0 +1,96 @@
+import glob
+import gzip
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+
+class ShardWriter:
+    """
+    Write Label Studio tasks into compact JSON shard files as they are produced.
+
+    A shard is closed when it reaches *max_tasks* tasks or *max_bytes*
+    (uncompressed) bytes, or when the group key changes, so each shard holds a
+    single story/child when tasks arrive grouped. close() writes manifest.json
+    and removes shard files a previous, larger run left in *output_dir*.
+    """
+
+    def __init__(self, output_dir: str, prefix: str = "tasks", max_tasks: Optional[int] = 1000,
+                 max_bytes: Optional[int] = None, compress: bool = False):
+        self.output_dir = output_dir
+        self.prefix = prefix
+        self.max_tasks = max_tasks
+        self.max_bytes = max_bytes
+        self.compress = compress
+        self.shards: List[Dict[str, Any]] = []
+        self._file = None
+        self._group = None
+        self._count = 0
+        self._bytes = 0
+        os.makedirs(output_dir, exist_ok=True)
+
+    def add(self, task: Dict[str, Any], group: Any = "") -> None:
+        encoded = json.dumps(task, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+        # a missing key is NaN, which never equals itself
+        group = "" if pd.isna(group) else str(group)
+        if (
+            self._file is None
+            or group != self._group
+            or (self.max_tasks and self._count >= self.max_tasks)
+            or (self.max_bytes and self._bytes + len(encoded) + 2 > self.max_bytes)
+        ):
+            self._open(group)
+
+        if self._count:
+            self._file.write(b",")
+            self._bytes += 1
+        self._file.write(encoded)
+        self._bytes += len(encoded)
+        self._count += 1
+
+    def _open(self, group: str) -> None:
+        self._close_shard()
+        name = f"{self.prefix}_{len(self.shards):05d}.json" + (".gz" if self.compress else "")
+        path = os.path.join(self.output_dir, name)
+        self._file = gzip.open(path, "wb") if self.compress else open(path, "wb")
+        self._file.write(b"[")
+        self._group = group
+        self._count = 0
+        self._bytes = 2
+        self.shards.append({"file": name, "group": group})
+
+    def _close_shard(self) -> None:
+        if self._file is None:
+            return
+        self._file.write(b"]")
+        self._file.close()
+        self._file = None
+        self.shards[-1].update(
+            tasks=self._count,
+            bytes=os.path.getsize(os.path.join(self.output_dir, self.shards[-1]["file"])),
+        )
+
+    def close(self) -> str:
+        """Close the open shard and write the manifest; returns the manifest path."""
+        self._close_shard()
+        written = {s["file"] for s in self.shards}
+        for pattern in (f"{self.prefix}_*.json", f"{self.prefix}_*.json.gz"):
+            for path in glob.glob(os.path.join(glob.escape(self.output_dir), pattern)):
+                if os.path.basename(path) not in written:
+                    os.remove(path)
+        manifest_path = os.path.join(self.output_dir, "manifest.json")
+        with open(manifest_path, "w") as f:
+            json.dump({
+                "shards": self.shards,
+                "total_tasks": sum(s["tasks"] for s in self.shards),
+                "total_bytes": sum(s["bytes"] for s in self.shards),
+            }, f, indent=2)
+        return manifest_path
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,31 @@
+import os
+from typing import Optional
+
+DEFAULT_BASE_URL = "https://2025storiza.michaelbennie.org/"
+BASE_URL_ENV = "STORIZA_BASE_URL"
+CLIPS_PATH = "audio_clips/"
+
+
+def get_base_url(override: Optional[str] = None) -> str:
+    """
+    Prefix of every recording URL in task JSON: *override*, else the
+    STORIZA_BASE_URL environment variable, else the production host.
+    Recordings are served at the root, clips under audio_clips/.
+    """
+    url = override or os.getenv(BASE_URL_ENV) or DEFAULT_BASE_URL
+    return url if url.endswith("/") else url + "/"
+
+
+def clips_url(override: Optional[str] = None) -> str:
+    return get_base_url(override) + CLIPS_PATH
+
+
+def strip_base_url(url: str, override: Optional[str] = None) -> str:
+    """
+    Path of a task audio URL relative to the base URL. Exports made against
+    the production host still resolve when a local base URL is configured.
+    """
+    for prefix in (get_base_url(override), DEFAULT_BASE_URL):
+        if url.startswith(prefix):
+            return url[len(prefix):]
+    return url
@@ -0,0 +1,131 @@
+import json
+import os
+import wave
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from data_preprocessing.audioArrays import frame_features, load_wav, mask_to_regions
+from data_preprocessing.taskUrls import strip_base_url
+
+
+def detect_speech_regions(
+    samples: np.ndarray,
+    sample_rate: int,
+    threshold_db: float = 12.0,
+    zcr_threshold: float = 0.25,
+    min_pause: float = 0.6,
+    min_speech: float = 0.3,
+    padding: float = 0.1,
+) -> List[Tuple[float, float]]:
+    """
+    Find pause-delimited speech regions (in seconds) from frame energy and ZCR.
+
+    A frame counts as speech if it is *threshold_db* above the recording's noise
+    floor, or half that and noisy (high ZCR, i.e. fricatives). Pauses shorter
+    than *min_pause* are bridged, so regions roughly follow read sentences;
+    regions shorter than *min_speech* are dropped.
+    """
+    rms_db, zcr, hop = frame_features(samples, sample_rate)
+    if len(rms_db) == 0:
+        return []
+
+    noise_floor = np.percentile(rms_db, 10)
+    speech = (rms_db > noise_floor + threshold_db) | (
+        (rms_db > noise_floor + threshold_db / 2) & (zcr > zcr_threshold)
+    )
+
+    starts, ends = mask_to_regions(speech)
+    if len(starts) == 0:
+        return []
+
+    # bridge short pauses: keep a boundary only where the gap is long enough
+    gaps = (starts[1:] - ends[:-1]) * hop
+    keep = gaps >= min_pause
+    starts = np.concatenate(([starts[0]], starts[1:][keep]))
+    ends = np.concatenate((ends[:-1][keep], [ends[-1]]))
+
+    long_enough = (ends - starts) * hop >= min_speech
+    duration = len(samples) / sample_rate
+    region_starts = np.maximum(starts[long_enough] * hop - padding, 0.0)
+    region_ends = np.minimum(ends[long_enough] * hop + padding, duration)
+    return [(float(s), float(e)) for s, e in zip(region_starts, region_ends)]
+
+
+def presegment_file(audio_file_path: str, **kwargs) -> Tuple[List[Tuple[float, float]], float]:
+    """Return (speech regions, duration in seconds) for one WAV file."""
+    samples, sample_rate = load_wav(audio_file_path)
+    return detect_speech_regions(samples, sample_rate, **kwargs), len(samples) / sample_rate
+
+
+def _presegment_worker(audio_file_path: str):
+    try:
+        return presegment_file(audio_file_path)
+    except (OSError, EOFError, ValueError, wave.Error) as e:
+        print(f"⚠️  Could not pre-segment {audio_file_path}: {e}")
+        return None
+
+
+def build_prediction(regions: List[Tuple[float, float]], duration: float,
+                     model_version: str = "energy_vad_v1") -> Dict[str, Any]:
+    """Wrap regions as a Label Studio prediction of SentenceLabel regions."""
+    return {
+        "model_version": model_version,
+        "result": [
+            {
+                "id": f"vad{i}",
+                "type": "labels",
+                "from_name": "SentenceLabel",
+                "to_name": "SentenceAudio",
+                "original_length": duration,
+                "value": {"start": start, "end": end, "labels": ["Sentence"], "channel": 0},
+            }
+            for i, (start, end) in enumerate(regions)
+        ],
+    }
+
+
+def add_presegmentation_predictions(
+    tasks_file: str,
+    audio_dir: str,
+    output_file: str = None,
+    base_url: str = None,
+    workers: int = None,
+) -> str:
+    """
+    Attach energy-based SentenceLabel predictions to every task in *tasks_file*.
+    Recordings are processed in parallel; the result overwrites *tasks_file*
+    unless *output_file* is given.
+    """
+    with open(tasks_file, "r", encoding="utf-8") as f:
+        tasks = json.load(f)
+
+    audio_paths = []
+    for task in tasks:
+        audio = task["data"].get("audio", "")
+        audio = strip_base_url(audio, base_url)
+        audio_paths.append(os.path.join(audio_dir, audio))
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        outcomes = list(pool.map(_presegment_worker, audio_paths, chunksize=4))
+
+    for task, outcome in zip(tasks, outcomes):
+        if outcome is None:
+            continue
+        regions, duration = outcome
+        task["predictions"] = [build_prediction(regions, duration)]
+
+    output_file = output_file or tasks_file
+    with open(output_file, "w") as f:
+        json.dump(tasks, f, indent=2)
+
+    print(f"Pre-segmented {sum(o is not None for o in outcomes)}/{len(tasks)} tasks into {output_file}")
+    return output_file
+
+
+if __name__ == "__main__":
+    add_presegmentation_predictions(
+        "../processed_data/label_studio_audio_tasks.json",
+        "../raw_data/audio",
+    )
@@ -0,0 +1,142 @@
+import json
+import os
+import wave
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+
+from data_preprocessing.audioArrays import load_wav
+
+# samples per pixel of each zoom level; coarser levels must be multiples of the finest
+PEAK_LEVELS = (256, 1024, 4096)
+INDEX_NAME = "index.json"
+
+
+def peak_levels(samples: np.ndarray, levels: Sequence[int] = PEAK_LEVELS) -> Dict[int, np.ndarray]:
+    """
+    Interleaved 8-bit [min, max, min, max, ...] peaks of a mono float signal
+    at every level. Only the finest level touches the samples; each coarser
+    level reduces the blocks of the finest one.
+    """
+    levels = sorted(levels)
+    finest = levels[0]
+    if any(level % finest for level in levels):
+        raise ValueError(f"Peak levels must be multiples of {finest}: {levels}")
+
+    n_blocks = max(-(-len(samples) // finest), 1)
+    blocks = np.zeros(n_blocks * finest, dtype=np.float32)
+    blocks[:len(samples)] = samples
+    blocks = blocks.reshape(n_blocks, finest)
+    lo, hi = blocks.min(axis=1), blocks.max(axis=1)
+
+    peaks = {}
+    for level in levels:
+        factor = level // finest
+        n = -(-n_blocks // factor)
+        pad = n * factor - n_blocks
+        level_lo = np.pad(lo, (0, pad), constant_values=0.0).reshape(n, factor).min(axis=1)
+        level_hi = np.pad(hi, (0, pad), constant_values=0.0).reshape(n, factor).max(axis=1)
+        interleaved = np.empty(2 * n, dtype=np.int8)
+        interleaved[0::2] = np.round(np.clip(level_lo, -1.0, 1.0) * 127)
+        interleaved[1::2] = np.round(np.clip(level_hi, -1.0, 1.0) * 127)
+        peaks[level] = interleaved
+    return peaks
+
+
+def peak_file_names(stem: str, levels: Sequence[int] = PEAK_LEVELS) -> Dict[int, str]:
+    return {level: f"{stem}.{level}.json" for level in sorted(levels)}
+
+
+def peak_documents(samples: np.ndarray, sample_rate: int, stem: str,
+                   levels: Sequence[int] = PEAK_LEVELS) -> Dict[str, bytes]:
+    """Peak files (audiowaveform JSON format, version 2) keyed by file name."""
+    names = peak_file_names(stem, levels)
+    documents = {}
+    for level, data in peak_levels(samples, levels).items():
+        document = {"version": 2, "channels": 1, "sample_rate": sample_rate, "samples_per_pixel": level,
+                    "bits": 8, "length": len(data) // 2, "data": data.tolist()}
+        documents[names[level]] = json.dumps(document, separators=(",", ":")).encode("utf-8")
+    return documents
+
+
+def write_peaks(samples: np.ndarray, sample_rate: int, peaks_dir: str, stem: str,
+                levels: Sequence[int] = PEAK_LEVELS) -> Dict[int, str]:
+    os.makedirs(peaks_dir, exist_ok=True)
+    for name, payload in peak_documents(samples, sample_rate, stem, levels).items():
+        with open(os.path.join(peaks_dir, name), "wb") as f:
+            f.write(payload)
+    return peak_file_names(stem, levels)
+
+
+def segment_samples(audio_segment) -> np.ndarray:
+    """Mono float samples of a pydub AudioSegment."""
+    raw = np.array(audio_segment.get_array_of_samples(), dtype=np.float32)
+    raw = raw.reshape(-1, audio_segment.channels).mean(axis=1)
+    return raw / float(1 << (8 * audio_segment.sample_width - 1))
+
+
+def peak_urls(base_url: str, names: Dict[int, str]) -> Dict[str, str]:
+    """Task-JSON reference to the peak files, keyed by samples per pixel."""
+    return {str(level): base_url + name for level, name in names.items()}
+
+
+def _recording_worker(job: Tuple[str, str, Tuple[int, ...]]) -> Optional[str]:
+    audio_file_path, peaks_dir, levels = job
+    try:
+        samples, sample_rate = load_wav(audio_file_path)
+        write_peaks(samples, sample_rate, peaks_dir, os.path.splitext(os.path.basename(audio_file_path))[0], levels)
+        return None
+    except (OSError, EOFError, ValueError, wave.Error) as e:
+        return str(e)
+
+
+def compute_recording_peaks(audio_paths: Iterable[str], peaks_dir: str, levels: Sequence[int] = PEAK_LEVELS,
+                            workers: Optional[int] = None) -> Dict[str, Dict[int, str]]:
+    """
+    Write peak files for every recording into *peaks_dir* in a process pool,
+    skipping recordings whose size, mtime and levels match the index kept in
+    that directory. Returns the peak file names per recording.
+    """
+    levels = tuple(sorted(levels))
+    os.makedirs(peaks_dir, exist_ok=True)
+    index_path = os.path.join(peaks_dir, INDEX_NAME)
+    index = {}
+    if os.path.exists(index_path):
+        with open(index_path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+
+    names, todo, stamps = {}, [], {}
+    for audio_file_path in dict.fromkeys(audio_paths):
+        audio_name = os.path.basename(audio_file_path)
+        stem = os.path.splitext(audio_name)[0]
+        st = os.stat(audio_file_path)
+        stamps[audio_name] = [st.st_size, st.st_mtime_ns, list(levels)]
+        names[audio_name] = peak_file_names(stem, levels)
+        files_present = all(os.path.exists(os.path.join(peaks_dir, n)) for n in names[audio_name].values())
+        if index.get(audio_name) != stamps[audio_name] or not files_present:
+            todo.append(audio_file_path)
+
+    unchanged = len(names) - len(todo)
+    if todo:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for audio_file_path, error in zip(todo, pool.map(_recording_worker, [(p, peaks_dir, levels) for p in todo])):
+                audio_name = os.path.basename(audio_file_path)
+                if error:
+                    print(f"⚠️  Skipping peaks for {audio_file_path}: {error}")
+                    names.pop(audio_name)
+                    stamps.pop(audio_name)
+                    index.pop(audio_name, None)
+    index.update(stamps)
+    with open(index_path, "w", encoding="utf-8") as f:
+        json.dump(index, f)
+    print(f"Computed peaks for {len(todo)} recordings, {unchanged} unchanged")
+    return names
+
+
+if __name__ == "__main__":
+    audio_dir = "../raw_data/audio"
+    compute_recording_peaks(
+        [os.path.join(audio_dir, f) for f in sorted(os.listdir(audio_dir)) if f.endswith(".wav")],
+        os.path.join(audio_dir, "peaks"),
+    )
@@ -1,7 +1,11 @@
 import json
+import os
+import random
 from collections import defaultdict
 import copy
 
+from data_preprocessing.exportStream import iter_json_array, read_raw
+
 # Keys to remove from annotations
 keys_to_remove = {
     "DisfluencyErrorType", "StructuralErrorType", "GrammaticalErrorType",
@@ -69,24 +73,74 @@ def filter_first_x_tasks_single_annotator(tasks, x=10):
     return filtered_tasks
 
 
-def main(input_file_path, output_file_path):
-    """Load, filter (single annotator), create predictions, and save JSON file."""
-    with open(input_file_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
+def stream_sample_tasks(input_file_path, x=10, method="first", stratify_by=None, seed=0):
+    """
+    Select up to X single-annotator tasks per annotator while streaming the export.
+
+    method="first" keeps the first X in file order (as filter_first_x_tasks_single_annotator),
+    method="reservoir" draws a uniform sample of X with a seeded reservoir.
+    stratify_by="story" or "grade" samples X per (annotator, story/grade) instead.
+    Only (offset, length) locations are kept, so memory does not grow with the export.
+    """
+    rng = random.Random(seed)
+    selected = defaultdict(list)
+    seen = defaultdict(int)
+
+    for offset, raw in iter_json_array(input_file_path):
+        task = json.loads(raw)
+        if "annotations" not in task:
+            continue
+        annotator_ids = {a["completed_by"]["id"] for a in task["annotations"] if "completed_by" in a}
+        if len(annotator_ids) != 1:
+            if annotator_ids:
+                print("MUltiple ANNOTATORS:", len(annotator_ids), annotator_ids, task.get("id"))
+            continue
+
+        key = (next(iter(annotator_ids)),)
+        if stratify_by == "story":
+            key += (task.get("data", {}).get("__id__", ""),)
+        elif stratify_by == "grade":
+            key += (task.get("data", {}).get("grade", ""),)
+
+        seen[key] += 1
+        if len(selected[key]) < x:
+            selected[key].append((offset, len(raw)))
+        elif method == "reservoir":
+            j = rng.randrange(seen[key])
+            if j < x:
+                selected[key][j] = (offset, len(raw))
+
+    # restore file order so the output is deterministic and easy to diff
+    return sorted(loc for locations in selected.values() for loc in locations)
+
+
+def write_cross_check_tasks(input_file_path, locations, output_file_path):
+    """Re-read only the selected tasks, add cleaned predictions and write them one by one."""
+    with open(output_file_path, "w", encoding="utf-8") as f:
+        f.write("[\n")
+        for n, (offset, length) in enumerate(locations):
+            task = create_cleaned_predictions(json.loads(read_raw(input_file_path, offset, length)))
+            if n:
+                f.write(",\n")
+            f.write(json.dumps(task, indent=2))
+        f.write("\n]\n")
 
-    # Filter: only single annotator tasks + first X per annotator
-    filtered_data = filter_first_x_tasks_single_annotator(data, x=20)
 
-    # Create cleaned predictions but keep original annotations untouched
-    processed_data = [create_cleaned_predictions(task) for task in filtered_data]
+def main(input_file_path, output_file_path, x=20, method="first", stratify_by=None, seed=0):
+    """Stream, sample (single annotator), create predictions, and save JSON file."""
+    # Sample: only single annotator tasks + X per annotator (and story/grade)
+    locations = stream_sample_tasks(input_file_path, x=x, method=method, stratify_by=stratify_by, seed=seed)
 
-    with open(output_file_path, "w", encoding="utf-8") as f:
-        json.dump(processed_data, f, indent=2)
+    # Create cleaned predictions but keep original annotations untouched
+    write_cross_check_tasks(input_file_path, locations, output_file_path)
 
-    print(f"Processed file saved to {output_file_path}")
+    print(f"Processed file saved to {output_file_path} ({len(locations)} tasks)")
 
 
 if __name__ == "__main__":
-    input_path = "../annotationData/words/8_4_annotation_data.json"
-    output_path = "../processed_data/cleaned_word_export_first20.json"
+    # Run from UI/ as `python -m generate_word_level_cross_checking.remove_ideintifying_data`
+    # (or use `python storiza.py sample-cross-check <export>`); paths are relative to UI/.
+    ui_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    input_path = os.path.join(ui_dir, "annotationData/words/8_4_annotation_data.json")
+    output_path = os.path.join(ui_dir, "processed_data/cleaned_word_export_first20.json")
     main(input_path, output_path)
@@ -0,0 +1,428 @@
+#!/usr/bin/env python
+"""
+Single command-line entry point for the Storiza annotation pipeline.
+
+Run from the UI/ directory, e.g.
+
+    python storiza.py merge annotationData/sentences/export_157513_*.json -o processed_data/merged.json
+    python storiza.py convert processed_data/merged.json --incremental
+    python storiza.py word-tasks --shard-dir processed_data/shards
+
+Every subcommand imports its pipeline module (and so pandas, pydub, NumPy,
+Riva, ...) only when it runs, so quick commands start immediately.
+Defaults for any option can be overridden with --config storiza.json, a JSON
+object keyed by option name (e.g. {"audio_dir": "/data/audio"}).
+"""
+import argparse
+import json
+import os
+import re
+import sys
+
+AUDIO_DIR = "raw_data/audio"
+PROCESSED_DIR = "processed_data"
+SENTENCE_TSV = os.path.join(PROCESSED_DIR, "sentenceLabels.tsv")
+EXPORT_NAME = re.compile(r"export_(\d+)_project-\d+-at-(\d{4}-\d{2}-\d{2}-\d{2}-\d{2})")
+
+
+# ── quick commands (standard library only) ─────────────────────────────
+def cmd_list_exports(args):
+    for entry in sorted(os.scandir(args.directory), key=lambda e: e.name):
+        if not entry.is_file() or not entry.name.startswith("export_"):
+            continue
+        match = EXPORT_NAME.match(entry.name)
+        project, taken = match.groups() if match else ("?", "?")
+        line = f"{entry.name}\tproject={project}\ttaken={taken}\t{entry.stat().st_size / 1e6:.1f} MB"
+        if args.count and entry.name.endswith(".json"):
+            from data_preprocessing.exportStream import iter_json_array
+            line += f"\ttasks={sum(1 for _ in iter_json_array(entry.path))}"
+        print(line)
+
+
+def cmd_index_audio(args):
+    from data_preprocessing.audioIndex import AudioIndex
+    print(AudioIndex(args.audio_dir, args.index).refresh())
+
+
+def cmd_merge(args):
+    from data_preprocessing.mergeExports import merge_exports
+    merge_exports(args.inputs, args.output)
+
+
+# ── pipeline stages ─────────────────────────────────────────────────────
+def cmd_build_tasks(args):
+    from data_preprocessing.preprocessSentenceData import build_sentence_tasks
+    build_sentence_tasks(args.audio_dir, args.metadata, args.output, registry_path=args.story_registry,
+                         peaks_dir=args.peaks_dir, workers=args.workers)
+
+
+def cmd_presegment(args):
+    from data_preprocessing.voicePreSegmentation import add_presegmentation_predictions
+    add_presegmentation_predictions(args.tasks, args.audio_dir, args.output, workers=args.workers)
+
+
+def cmd_validate_export(args):
+    from data_preprocessing.exportSchema import validate_export
+    violations = validate_export(args.input, max_violations=args.limit)
+    for v in violations:
+        print(f"task {v.task_id}\tannotation {v.annotation_id}\tresult {v.result_id}\t{v.severity}\t{v.message}")
+    errors = sum(v.severity == "error" for v in violations)
+    print(f"{errors} error(s), {len(violations) - errors} warning(s)" if violations else "Export is valid.")
+    return 1 if errors else 0
+
+
+def cmd_convert(args):
+    from data_preprocessing.preprocessData import convert_sentences_to_tsv
+    convert_sentences_to_tsv(args.input, args.output, args.error_map, args.split_map,
+                             incremental=args.incremental, validate=not args.no_validate,
+                             story_registry=args.story_registry, normalized=args.normalized,
+                             workers=args.workers, shard_size=args.shard_size)
+
+
+def cmd_word_tasks(args):
+    from data_preprocessing.clipEncoding import parse_profile_options
+    from data_preprocessing.generateWordLabelingStasks import ClipOptions, generate_json_from_tsv
+    clip_options = ClipOptions(
+        archive=args.clip_archive,
+        peaks=args.peaks,
+        profiles=args.profile,
+        profile_overrides=parse_profile_options(args.profile_option),
+        condition_cache=args.condition_cache,
+    )
+    result = generate_json_from_tsv(
+        args.tsv, args.audio_dir, args.clips_dir,
+        audio_index_path=args.audio_index,
+        incremental=args.incremental,
+        shard_dir=args.shard_dir,
+        shard_by=args.shard_by,
+        max_tasks=args.max_tasks,
+        max_bytes=args.max_bytes,
+        compress=args.gzip,
+        ipa_dict_path=args.ipa_dict,
+        json_output_path=args.output,
+        workers=args.workers,
+        story_registry=args.story_registry,
+        clip_options=clip_options,
+    )
+    print(result)
+
+
+def cmd_encode_bench(args):
+    from data_preprocessing.clipEncoding import ENCODING_PROFILES, benchmark_profiles, parse_profile_options, resolve_profiles
+    profiles = resolve_profiles(args.profile or list(ENCODING_PROFILES), parse_profile_options(args.profile_option))
+    print(benchmark_profiles(args.tsv, args.audio_dir, profiles, args.sample).report())
+
+
+def cmd_serve(args):
+    from data_preprocessing.audioServer import serve_audio
+    serve_audio(args.audio_dir, args.clips_dir, args.host, args.port, args.max_age, args.quiet)
+
+
+def cmd_fetch_bench(args):
+    from data_preprocessing.audioServer import benchmark_fetch, task_audio_urls
+    from data_preprocessing.taskUrls import get_base_url, strip_base_url
+    urls = task_audio_urls(args.tasks)[:args.limit]
+    if args.base_url:
+        # point production URLs in the task file at the server under test
+        base_url = get_base_url(args.base_url)
+        urls = [base_url + strip_base_url(url, base_url) for url in urls]
+    for key, value in benchmark_fetch(urls, args.workers, args.range_bytes).items():
+        print(f"{key}\t{value}")
+
+
+def cmd_condition(args):
+    from data_preprocessing.audioConditioning import AudioConditioner
+    conditioner = AudioConditioner(args.cache, args.rate, args.mode, args.target_db, args.peak_db)
+    paths = [e.path for e in sorted(os.scandir(args.audio_dir), key=lambda e: e.name) if e.name.endswith(".wav")]
+    print(conditioner.condition_all(paths, args.workers))
+
+
+def cmd_transcribe(args):
+    from data_preprocessing.audio_prelabeling import transcribe_file_offline_full
+    audio_bytes = None
+    if args.conditioned:
+        from data_preprocessing.audioConditioning import AudioConditioner
+        audio_bytes = AudioConditioner(args.conditioned).wav_bytes(args.input)
+    print(transcribe_file_offline_full(args.server, args.api_key or os.getenv("NVIDIA_API_KEY"), args.input,
+                                       audio_bytes=audio_bytes))
+
+
+def cmd_sample_cross_check(args):
+    from generate_word_level_cross_checking.remove_ideintifying_data import main
+    main(args.input, args.output, x=args.x, method=args.method, stratify_by=args.stratify_by, seed=args.seed)
+
+
+def cmd_flatten_words(args):
+    from data_preprocessing.flattenWordExport import flatten_word_export
+    flatten_word_export(args.input, args.output, args.sentence_labels)
+
+
+# ── analysis ────────────────────────────────────────────────────────────
+def cmd_validate_times(args):
+    from data_preprocessing.audioIndex import AudioIndex, validate_segment_times
+    from data_preprocessing.sentenceTables import load_sentence_labels
+    index = AudioIndex(args.audio_dir, args.audio_index)
+    index.refresh()
+    invalid = validate_segment_times(load_sentence_labels(args.tsv, columns=["audio"]), index)
+    print(invalid.to_string(index=False) if len(invalid) else "All segment times fall within their recordings.")
+    return 1 if len(invalid) else 0
+
+
+def cmd_check_regions(args):
+    from AnalyzeData.sentenceRegionCheck import check_sentence_regions
+    check_sentence_regions(args.tsv, args.audio_dir, args.audio_index, gap_threshold=args.gap,
+                           fix=args.fix, max_overlap=args.max_overlap, report_path=args.report)
+
+
+def cmd_agreement(args):
+    from AnalyzeData.annotationAgreement import agreement_from_export
+    summary = agreement_from_export(args.input, args.output, args.region, args.label, args.tolerance)
+    print(json.dumps(summary, indent=2))
+
+
+def cmd_fluency(args):
+    from AnalyzeData.readingFluencyFeatures import extract_fluency_features
+    extract_fluency_features(args.tsv, args.audio_dir, args.output, workers=args.workers)
+
+
+def cmd_mispronunciations(args):
+    from AnalyzeData.mispronunciationScores import rank_sentences, score_mispronunciations
+    scores = score_mispronunciations(args.tsv, args.ipa_dict, args.output)
+    print(rank_sentences(scores).head(args.top).to_string(index=False))
+
+
+def cmd_reading_paths(args):
+    from AnalyzeData.readingPaths import summarize_reading_paths, write_reading_paths
+    paths = write_reading_paths(args.export, args.output, args.summary, args.by)
+    print(summarize_reading_paths(paths, args.by).to_string(index=False))
+
+
+def cmd_error_cube(args):
+    from AnalyzeData.errorCube import ErrorCube
+    cube = ErrorCube.load(args.cube)
+    if args.update:
+        cube.update(args.update)
+        cube.save(args.cube)
+    filters = dict(f.split("=", 1) for f in args.filter)
+    print(cube.rollup(args.by, **filters).to_string())
+
+
+def cmd_store(args):
+    from AnalyzeData.annotationStore import AnnotationStore
+    with AnnotationStore(args.db) as store:
+        for path, rows in store.ingest_many(args.ingest, force=args.force).items():
+            print(f"{path}\t{rows if rows else 'unchanged'}")
+        if args.sql:
+            print(store.query(args.sql).to_string(index=False))
+
+
+def build_parser(config=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--config", help="JSON file with default option values")
+    parser.add_argument("--base-url", default=None,
+                        help="prefix of task audio URLs (default: $STORIZA_BASE_URL or the production host)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def add(name, func, help_text):
+        p = sub.add_parser(name, help=help_text, formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+        p.set_defaults(func=func)
+        return p
+
+    p = add("list-exports", cmd_list_exports, "list Label Studio export snapshots")
+    p.add_argument("directory", nargs="?", default="annotationData/sentences")
+    p.add_argument("--count", action="store_true", help="also count tasks in JSON exports")
+
+    p = add("index-audio", cmd_index_audio, "refresh the WAV header index")
+    p.add_argument("--audio-dir", default=AUDIO_DIR)
+    p.add_argument("--index", default=os.path.join(PROCESSED_DIR, "audio_index.tsv"))
+
+    p = add("merge", cmd_merge, "merge export snapshots, newest annotation per task wins")
+    p.add_argument("inputs", nargs="+")
+    p.add_argument("-o", "--output", default=os.path.join(PROCESSED_DIR, "merged_sentences_export.json"))
+
+    p = add("build-tasks", cmd_build_tasks, "build sentence-segmentation tasks from recordings")
+    p.add_argument("--audio-dir", default=AUDIO_DIR)
+    p.add_argument("--metadata", default="raw_data/Filtered_Story_Data_-_Missing_Files_Only.csv")
+    p.add_argument("-o", "--output", default=os.path.join(PROCESSED_DIR, "label_studio_audio_tasks.json"))
+    p.add_argument("--story-registry", default=None, help="store story fields once per story in this JSON file")
+    p.add_argument("--peaks-dir", default=None, help="precompute waveform peaks here, inside --audio-dir, e.g. raw_data/audio/peaks")
+    p.add_argument("--workers", type=int, default=None)
+
+    p = add("presegment", cmd_presegment, "attach energy-based sentence region predictions")
+    p.add_argument("--tasks", default=os.path.join(PROCESSED_DIR, "label_studio_audio_tasks.json"))
+    p.add_argument("--audio-dir", default=AUDIO_DIR)
+    p.add_argument("-o", "--output", default=None)
+    p.add_argument("--workers", type=int, default=None)
+
+    p = add("validate-export", cmd_validate_export, "check a sentence-level export against the expected schema")
+    p.add_argument("input")
+    p.add_argument("--limit", type=int, default=None, help="stop after this many violations")
+
+    p = add("convert", cmd_convert, "convert a sentence-level export to sentenceLabels.tsv")
+    p.add_argument("input")
+    p.add_argument("-o", "--output", default=SENTENCE_TSV)
+    p.add_argument("--error-map", default="ErrorData/6b_errors.json")
+    p.add_argument("--split-map", default="ErrorData/5_errors.json")
+    p.add_argument("--incremental", action="store_true")
+    p.add_argument("--no-validate", action="store_true", help="skip the schema pass, check results while converting")
+    p.add_argument("--story-registry", default=None, help="write story fields here instead of on every row")
+    p.add_argument("--normalized", action="store_true", help="write a slim sentence table plus a task table")
+    p.add_argument("--workers", type=int, default=None, help="convert task shards in this many processes")
+    p.add_argument("--shard-size", type=int, default=200, help="consecutive tasks per parallel job")
+
+    p = add("word-tasks", cmd_word_tasks, "cut clips and build word-level tasks")
+    p.add_argument("--tsv", default=SENTENCE_TSV)
+    p.add_argument("--audio-dir", default=AUDIO_DIR)
+    p.add_argument("--clips-dir", default=os.path.join(PROCESSED_DIR, "audio_clips/"))
+    p.add_argument("--audio-index", default=os.path.join(PROCESSED_DIR, "audio_index.tsv"))
+    p.add_argument("--ipa-dict", default="raw_data/EnglishData.tsv")
+    p.add_argument("-o", "--output", default=os.path.join(PROCESSED_DIR, "audio_segments_data.json"))
+    p.add_argument("--incremental", action="store_true")
+    p.add_argument("--shard-dir", default=None)
+    p.add_argument("--shard-by", default="__id__")
+    p.add_argument("--max-tasks", type=int, default=1000)
+    p.add_argument("--max-bytes", type=int, default=None)
+    p.add_argument("--gzip", action="store_true")
+    p.add_argument("--clip-archive", default=None, help=".zip or .tar to pack clips into")
+    p.add_argument("--condition-cache", default=None, help="cut clips from conditioned audio cached here")
+    p.add_argument("--story-registry", default=None, help="registry the TSV's story_id column refers to")
+    p.add_argument("--peaks", action="store_true", help="write waveform peaks for every clip")
+    p.add_argument("--profile", action="append", default=None,
+                   help="encoding profile (repeatable; the first one is served): mp3, mp3_low, opus, wav16")
+    p.add_argument("--profile-option", action="append", default=[], help="override a setting, e.g. opus.bitrate=16k")
+    p.add_argument("--workers", type=int, default=None)
+
+    p = add("encode-bench", cmd_encode_bench, "compare clip size and encode time across encoding profiles")
+    p.add_argument("--tsv", default=SENTENCE_TSV)
+    p.add_argument("--audio-dir", default=AUDIO_DIR)
+    p.add_argument("--profile", action="append", default=None, help="profiles to compare (default: all)")
+    p.add_argument("--profile-option", action="append", default=[], help="override a setting, e.g. opus.bitrate=16k")
+    p.add_argument("--sample", type=int, default=50, help="number of clips to encode")
+
+    p = add("serve", cmd_serve, "serve recordings and clips locally with range requests")
+    p.add_argument("--audio-dir", default=AUDIO_DIR)
+    p.add_argument("--clips-dir", default=os.path.join(PROCESSED_DIR, "audio_clips"))
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8000)
+    p.add_argument("--max-age", type=int, default=3600, help="Cache-Control max-age in seconds")
+    p.add_argument("--quiet", action="store_true", help="do not log every request")
+
+    p = add("fetch-bench", cmd_fetch_bench, "load task audio URLs concurrently and report latency")
+    p.add_argument("tasks", help="task JSON whose data.audio URLs are fetched")
+    p.add_argument("--workers", type=int, default=8)
+    p.add_argument("--limit", type=int, default=200)
+    p.add_argument("--range-bytes", type=int, default=None, help="only request the first N bytes of each file")
+
+    p = add("condition", cmd_condition, "resample and loudness-normalize recordings into the cache")
+    p.add_argument("--audio-dir", default=AUDIO_DIR)
+    p.add_argument("--cache", default=os.path.join(PROCESSED_DIR, "conditioned_audio"))
+    p.add_argument("--rate", type=int, default=16000)
+    p.add_argument("--mode", choices=["rms", "peak"], default="rms")
+    p.add_argument("--target-db", type=float, default=-20.0, help="RMS target (dBFS)")
+    p.add_argument("--peak-db", type=float, default=-1.0, help="peak ceiling (dBFS)")
+    p.add_argument("--workers", type=int, default=None)
+
+    p = add("transcribe", cmd_transcribe, "transcribe one recording with Riva ASR")
+    p.add_argument("input")
+    p.add_argument("--server", default="grpc.nvcf.nvidia.com:443")
+    p.add_argument("--api-key", default=None, help="defaults to $NVIDIA_API_KEY")
+    p.add_argument("--conditioned", default=None, help="send the conditioned audio from this cache")
+
+    p = add("sample-cross-check", cmd_sample_cross_check, "sample word-level tasks for cross-checking")
+    p.add_argument("input")
+    p.add_argument("-o", "--output", default=os.path.join(PROCESSED_DIR, "cleaned_word_export_first20.json"))
+    p.add_argument("-x", type=int, default=20)
+    p.add_argument("--method", choices=["first", "reservoir"], default="first")
+    p.add_argument("--stratify-by", choices=["story", "grade"], default=None)
+    p.add_argument("--seed", type=int, default=0)
+
+    p = add("flatten-words", cmd_flatten_words, "flatten a word-level export to a typed TSV")
+    p.add_argument("input")
+    p.add_argument("-o", "--output", default=os.path.join(PROCESSED_DIR, "word_annotations.tsv"))
+    p.add_argument("--sentence-labels", default=SENTENCE_TSV,
+                   help="sentence table to join tasks without a sentence_level_id to")
+
+    p = add("validate-times", cmd_validate_times, "check segment times against recording lengths")
+    p.add_argument("--tsv", default=SENTENCE_TSV)
+    p.add_argument("--audio-dir", default=AUDIO_DIR)
+    p.add_argument("--audio-index", default=os.path.join(PROCESSED_DIR, "audio_index.tsv"))
+
+    p = add("check-regions", cmd_check_regions, "find overlapping, empty, gapped or overrunning sentence regions")
+    p.add_argument("--tsv", default=SENTENCE_TSV)
+    p.add_argument("--audio-dir", default=AUDIO_DIR)
+    p.add_argument("--audio-index", default=os.path.join(PROCESSED_DIR, "audio_index.tsv"))
+    p.add_argument("--gap", type=float, default=5.0, help="report unlabeled gaps longer than this (s)")
+    p.add_argument("--report", default=None, help="write every issue to this TSV")
+    p.add_argument("--fix", action="store_true", help="resolve trivial overlaps in the TSV before cutting clips")
+    p.add_argument("--max-overlap", type=float, default=0.25)
+
+    p = add("agreement", cmd_agreement, "inter-annotator agreement for a JSON or CSV export")
+    p.add_argument("input")
+    p.add_argument("-o", "--output", default=None)
+    p.add_argument("--region", default="SentenceLabel")
+    p.add_argument("--label", default="SentenceSelect")
+    p.add_argument("--tolerance", type=float, default=0.5)
+
+    p = add("fluency", cmd_fluency, "extract reading-fluency features per sentence")
+    p.add_argument("--tsv", default=SENTENCE_TSV)
+    p.add_argument("--audio-dir", default=AUDIO_DIR)
+    p.add_argument("-o", "--output", default=os.path.join(PROCESSED_DIR, "fluency_features.tsv"))
+    p.add_argument("--workers", type=int, default=None)
+
+    p = add("mispronunciations", cmd_mispronunciations, "rank sentences by phoneme-level reading errors")
+    p.add_argument("--tsv", default=SENTENCE_TSV)
+    p.add_argument("--ipa-dict", default="raw_data/EnglishData.tsv")
+    p.add_argument("-o", "--output", default=os.path.join(PROCESSED_DIR, "mispronunciation_scores.tsv"))
+    p.add_argument("--top", type=int, default=20)
+
+    p = add("reading-paths", cmd_reading_paths, "measure how far out of order each story was read")
+    p.add_argument("export", help="tab-separated sentence export, with or without a 'sentence order' column")
+    p.add_argument("-o", "--output", default=os.path.join(PROCESSED_DIR, "reading_paths.tsv"))
+    p.add_argument("--summary", default=os.path.join(PROCESSED_DIR, "reading_paths_summary.tsv"))
+    p.add_argument("--by", nargs="+", default=["story_id", "grade"], help="summary grouping columns")
+
+    p = add("error-cube", cmd_error_cube, "update and query the reading-error cube")
+    p.add_argument("--cube", default=os.path.join(PROCESSED_DIR, "error_cube.pkl"))
+    p.add_argument("--update", default=None, help="flattened word table or word export to ingest first")
+    p.add_argument("--by", nargs="+", default=["value"])
+    p.add_argument("--filter", nargs="*", default=[], help="dimension=value pairs")
+
+    p = add("store", cmd_store, "ingest tables into the SQLite annotation store and query it")
+    p.add_argument("ingest", nargs="*", help="sentence TSVs, word exports/tables or task files")
+    p.add_argument("--db", default=os.path.join(PROCESSED_DIR, "annotations.sqlite"))
+    p.add_argument("--force", action="store_true", help="re-ingest files even if unchanged")
+    p.add_argument("--sql", default=None, help="query to run after ingesting")
+
+    if config:
+        # defaults only: anything given on the command line still wins
+        for p in [parser, *sub.choices.values()]:
+            apply_config_defaults(p, config)
+    return parser
+
+
+def apply_config_defaults(parser, config):
+    """Use config values as defaults for the options *parser* itself defines."""
+    dests = {action.dest for action in parser._actions
+             if not isinstance(action, argparse._SubParsersAction)}
+    parser.set_defaults(**{key: value for key, value in config.items() if key in dests})
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    config_parser = argparse.ArgumentParser(add_help=False)
+    config_parser.add_argument("--config")
+    pre, _ = config_parser.parse_known_args(argv)
+    config = None
+    if pre.config:
+        with open(pre.config, "r", encoding="utf-8") as f:
+            config = json.load(f)
+
+    args = build_parser(config).parse_args(argv)
+    if args.base_url:
+        from data_preprocessing.taskUrls import BASE_URL_ENV
+        os.environ[BASE_URL_ENV] = args.base_url  # also seen by worker processes
+    return args.func(args) or 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
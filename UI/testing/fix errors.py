@@ -13,8 +13,10 @@ from __future__ import annotations
 import json
 import re
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import List, Set
+from functools import partial
+from typing import Dict, List, Optional, Set, Tuple
 
 
 ###############################################################################
@@ -110,10 +112,11 @@ def clean_annotation_results(results: List[dict], valid_choices: Set[str]) -> bo
     Returns True *only if an actually-selected choice turned out invalid* ✓
     """
     invalid_selection_found = False                         # ✓
-    to_remove = []
+    survivors = []
 
     for r in results:
         if r.get("type") != "choices":
+            survivors.append(r)
             continue
 
         # keep original ordering so we can compare faithfully
@@ -122,13 +125,14 @@ def clean_annotation_results(results: List[dict], valid_choices: Set[str]) -> bo
 
         if kept != orig:                                   # at least one choice deleted
             invalid_selection_found = True                 # ✓ flag once per annotation
-            if kept:
-                r["value"]["choices"] = kept
-            else:
-                to_remove.append(r)
+            if not kept:
+                continue                                   # drop the block entirely
+            r["value"]["choices"] = kept
+        survivors.append(r)
 
-    for bad in to_remove:
-        results.remove(bad)
+    # single pass: rebuild the list in place instead of repeated list.remove()
+    if len(survivors) != len(results):
+        results[:] = survivors
 
     return invalid_selection_found                          # ✓
 
@@ -138,12 +142,26 @@ def clean_annotation_results(results: List[dict], valid_choices: Set[str]) -> bo
 ###############################################################################
 # 3. Main transformation
 ###############################################################################
-def transform_tasks(tasks: list) -> list:
+def transform_tasks(tasks: list, stories: Optional[Dict[str, dict]] = None) -> list:
+    """
+    Rebuild possibleSentences from each task's story text and drop annotation
+    choices that are no longer valid; returns the ids of tasks that had any.
+    Tasks built with a story registry carry only a story_id; their text is
+    looked up in *stories* (the registry's "stories" mapping).
+    """
     bad_task_ids = []
 
     for task in tasks:
         data = task["data"]
-        gold = data.get("content", "")
+        gold = data.get("content")
+        if gold is None and data.get("story_id"):
+            if data["story_id"] not in (stories or {}):
+                # without the story text every real choice would look invalid
+                print(f"⚠️  Task {task.get('id', data.get('__id__'))}: unknown story_id, left unchanged")
+                continue
+            gold = stories[data["story_id"]]["content"]
+        if gold is None:
+            gold = ""
         new_possible = build_possible_sentences(gold)
         data["possibleSentences"] = new_possible
         valid_choices = {item["value"] for item in new_possible}
@@ -183,6 +201,11 @@ def fix_quotes(s: str) -> str:
         s = s.replace(bad, good)
     return s
 
+# One pattern that matches any corrupted sequence, used only to decide which
+# strings need fix_quotes (which keeps the exact replacement order above).
+_BAD_SEQUENCES = re.compile("|".join(re.escape(bad) for bad in replacement_map))
+
+
 def recurse_clean(obj):
     """Recursively walk any JSON-like structure and clean strings."""
     if isinstance(obj, dict):
@@ -193,14 +216,63 @@ def recurse_clean(obj):
         return fix_quotes(obj)
 
 
+def clean_in_place(obj):
+    """
+    Same result as recurse_clean, but walks the structure in place with an
+    explicit stack and only rewrites strings containing a bad sequence.
+    """
+    if isinstance(obj, str):
+        return fix_quotes(obj) if _BAD_SEQUENCES.search(obj) else obj
+    stack = [obj]
+    while stack:
+        node = stack.pop()
+        for key, value in (node.items() if isinstance(node, dict) else enumerate(node)):
+            if isinstance(value, str):
+                if _BAD_SEQUENCES.search(value):
+                    node[key] = fix_quotes(value)
+            elif isinstance(value, (dict, list)):
+                stack.append(value)
+    return obj
+
+
+def _clean_shard(tasks: list, stories: Optional[Dict[str, dict]] = None) -> Tuple[list, list]:
+    clean_in_place(tasks)
+    return tasks, transform_tasks(tasks, stories)
+
+
+def load_stories(registry_path: Optional[str]) -> Optional[Dict[str, dict]]:
+    """The "stories" mapping of a story registry JSON file (see storyRegistry.py)."""
+    if not registry_path:
+        return None
+    with open(registry_path, "r", encoding="utf-8") as f:
+        return json.load(f)["stories"]
+
+
+def clean_tasks(tasks: list, workers: int = 1, shard_size: int = 500,
+                stories: Optional[Dict[str, dict]] = None) -> Tuple[list, list]:
+    """
+    Repair mojibake and invalid choices for all tasks; returns (tasks, bad_ids).
+    With workers > 1, shards of *shard_size* tasks are processed in worker
+    processes and reassembled in the original order. *stories* is needed
+    for tasks built with a story registry (see load_stories).
+    """
+    if workers <= 1 or len(tasks) <= shard_size:
+        return _clean_shard(tasks, stories)
+
+    shards = [tasks[i:i + shard_size] for i in range(0, len(tasks), shard_size)]
+    cleaned, bad_ids = [], []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for shard_tasks, shard_bad_ids in pool.map(partial(_clean_shard, stories=stories), shards):
+            cleaned.extend(shard_tasks)
+            bad_ids.extend(shard_bad_ids)
+    return cleaned, bad_ids
+
+
 ###############################################################################
 # 4. Entry point / CLI
 ###############################################################################
-def main() -> None:
-
-
-    in_path = "../processed_data/label_studio_audio_tasks.json"
-    out_path = "cleaned.json"
+def main(in_path: str = "../processed_data/label_studio_audio_tasks.json",
+         out_path: str = "cleaned.json", workers: int = 1, story_registry: Optional[str] = None) -> None:
     in_path = Path(in_path).expanduser()
     out_path = Path(out_path).expanduser()
     bad_ids_path = out_path.with_suffix(".bad_ids.json")
@@ -208,9 +280,7 @@ def main() -> None:
     with in_path.open("r", encoding="utf-8") as f:
         tasks = json.load(f)
 
-    tasks=recurse_clean(tasks)
-
-    bad_ids = transform_tasks(tasks)
+    tasks, bad_ids = clean_tasks(tasks, workers=workers, stories=load_stories(story_registry))
 
     with out_path.open("w", encoding="utf-8") as f:
         json.dump(tasks, f, ensure_ascii=False, indent=2)